@@ -2,25 +2,46 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..db import db_query, db_execute, db_query_one, db_execute_returning
 from ..authz import is_member, is_owner_or_manager
+from ..services.risk import risk_engine
+from ..response_cache import cached, current_user_id, response_cache
 
 bp = Blueprint("accounts", __name__)
 
 
+_LIST_ACCOUNTS_SQL = """
+SELECT a.id, a.account_type, a.name, a.starting_cash::float8 AS starting_cash, a.created_at, am.role
+FROM account_memberships am
+JOIN accounts a ON a.id = am.account_id
+WHERE am.user_id = %(uid)s
+ORDER BY a.id
+"""
+
+# Owner/Manager pending approvals in accounts where user has such role
+_PENDING_APPROVALS_SQL = """
+SELECT t.* FROM transactions t
+WHERE t.status = 'PENDING_APPROVAL'
+  AND t.kind = 'ORDER'
+  AND EXISTS (
+    SELECT 1 FROM account_memberships am
+    WHERE am.account_id = t.account_id
+      AND am.user_id = %(uid)s
+      AND am.role IN ('owner','manager')
+  )
+ORDER BY t.time DESC
+"""
+
+
+def _accounts_tags(**_):
+    return ["accounts", f"user:{current_user_id()}:accounts"]
+
+
 @bp.get("")
 @jwt_required()
+@cached(ttl=60, tags=_accounts_tags, per_user=True)
 def list_accounts():
     ident = get_jwt_identity() or {}
     user_id = ident.get("id")
-    rows = db_query(
-        """
-        SELECT a.id, a.account_type, a.name, a.starting_cash::float8 AS starting_cash, a.created_at, am.role
-        FROM account_memberships am
-        JOIN accounts a ON a.id = am.account_id
-        WHERE am.user_id = %(uid)s
-        ORDER BY a.id
-        """,
-        {"uid": user_id},
-    )
+    rows = db_query(_LIST_ACCOUNTS_SQL, {"uid": user_id})
     for r in rows:
         if r.get("created_at"):
             r["created_at"] = r["created_at"].isoformat()
@@ -53,6 +74,7 @@ def create_account():
         """,
         {"aid": row["id"], "uid": user_id},
     )
+    response_cache.invalidate([f"user:{user_id}:accounts"])
     # Shape response
     out = {
         "id": row["id"],
@@ -69,22 +91,7 @@ def create_account():
 def pending_approvals():
     ident = get_jwt_identity() or {}
     user_id = ident.get("id")
-    # Owner/Manager pending approvals in accounts where user has such role
-    rows = db_query(
-        """
-        SELECT t.* FROM transactions t
-        WHERE t.status = 'PENDING_APPROVAL'
-          AND t.kind = 'ORDER'
-          AND EXISTS (
-            SELECT 1 FROM account_memberships am
-            WHERE am.account_id = t.account_id
-              AND am.user_id = %(uid)s
-              AND am.role IN ('owner','manager')
-          )
-        ORDER BY t.time DESC
-        """,
-        {"uid": user_id},
-    )
+    rows = db_query(_PENDING_APPROVALS_SQL, {"uid": user_id})
     for r in rows:
         if r.get("time"):
             r["time"] = r["time"].isoformat()
@@ -152,6 +159,7 @@ def update_risk(account_id: int):
         f"UPDATE accounts SET {', '.join(set_clauses)} WHERE id = %(aid)s",
         params,
     )
+    risk_engine.on_limits_changed(account_id)
     # Return updated row
     row = db_query_one(
         """
@@ -1,12 +1,21 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token
-from ..extensions import bcrypt
+from ..extensions import hasher, HasherBusy
 from ..db import db_query_one, db_execute_returning, db_execute
+from ..rate_limit import rate_class
+from ..response_cache import response_cache
 
 bp = Blueprint("auth", __name__)
 
 
+def _busy():
+    resp = jsonify({"error": "server busy, retry shortly"})
+    resp.headers["Retry-After"] = "1"
+    return resp, 503
+
+
 @bp.post("/register")
+@rate_class("auth")
 def register():
     data = request.get_json() or {}
     email = data.get("email", "").strip().lower()
@@ -16,7 +25,10 @@ def register():
     existing = db_query_one("SELECT id FROM users WHERE email = %(email)s", {"email": email})
     if existing:
         return jsonify({"error": "email already registered"}), 400
-    pw_hash = bcrypt.generate_password_hash(password).decode("utf-8")
+    try:
+        pw_hash = hasher.hash(password)
+    except HasherBusy:
+        return _busy()
     row = db_execute_returning(
         """
         INSERT INTO users (email, password_hash)
@@ -36,6 +48,7 @@ def register():
             "INSERT INTO account_memberships (account_id, user_id, role) VALUES (%(aid)s, %(uid)s, 'owner') ON CONFLICT DO NOTHING",
             {"aid": acct["id"], "uid": row["id"]},
         )
+        response_cache.invalidate([f"user:{row['id']}:accounts"])
     token = create_access_token(identity={"id": row["id"], "email": row["email"]})
     user = {
         "id": row["id"],
@@ -47,13 +60,28 @@ def register():
 
 
 @bp.post("/login")
+@rate_class("auth")
 def login():
     data = request.get_json() or {}
     email = data.get("email", "").strip().lower()
     password = data.get("password", "")
     row = db_query_one("SELECT * FROM users WHERE email = %(email)s", {"email": email})
-    if not row or not bcrypt.check_password_hash(row["password_hash"], password):
+    try:
+        ok = bool(row) and hasher.check(row["password_hash"], password)
+    except HasherBusy:
+        return _busy()
+    if not ok:
         return jsonify({"error": "invalid credentials"}), 401
+    # Transparently upgrade hashes created under a different cost; best effort,
+    # a busy hasher just leaves it for the next login
+    if hasher.needs_rehash(row["password_hash"]):
+        try:
+            db_execute(
+                "UPDATE users SET password_hash = %(pw)s WHERE id = %(id)s",
+                {"pw": hasher.hash(password), "id": row["id"]},
+            )
+        except HasherBusy:
+            pass
     # Auto-provision an individual account if user has none
     cnt = db_query_one("SELECT COUNT(*) AS c FROM account_memberships WHERE user_id = %(u)s", {"u": row["id"]})
     if not cnt or int(cnt.get("c") or 0) == 0:
@@ -65,6 +93,7 @@ def login():
             "INSERT INTO account_memberships (account_id, user_id, role) VALUES (%(aid)s, %(uid)s, 'owner') ON CONFLICT DO NOTHING",
             {"aid": acct["id"], "uid": row["id"]},
         )
+        response_cache.invalidate([f"user:{row['id']}:accounts"])
     token = create_access_token(identity={"id": row["id"], "email": row["email"]})
     user = {
         "id": row["id"],
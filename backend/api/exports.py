@@ -3,13 +3,15 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from io import StringIO
 import csv
 from datetime import datetime
-from ..db import db_query
+from ..db import db_query, db_query_rows
 from ..authz import is_member
+from ..rate_limit import rate_class
 
 bp = Blueprint("exports", __name__)
 
 
 @bp.get("/trades")
+@rate_class("heavy_read")
 @jwt_required()
 def export_trades_csv():
     ident = get_jwt_identity() or {}
@@ -38,17 +40,21 @@ def export_trades_csv():
         params["end"] = end
 
     where_sql = " AND ".join(clauses)
-    rows = db_query(
-        f"""
+    sql = f"""
         SELECT id, account_id, group_id, ticker, time, side,
                qty::float8 AS qty, price::float8 AS price,
                kind, status, requested_by, approved_by
         FROM transactions t
         WHERE {where_sql}
         ORDER BY time ASC
-        """,
-        params,
-    )
+    """
+
+    # format=compact: JSON {"columns": [...], "data": [[...], ...]} straight from the cursor
+    if request.args.get("format") == "compact":
+        columns, data = db_query_rows(sql, params, readonly=True)
+        return jsonify({"columns": columns, "data": data})
+
+    rows = db_query(sql, params, readonly=True)
 
     # Build CSV
     output = StringIO()
@@ -2,9 +2,30 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..db import db_query, db_execute, db_execute_returning, db_query_one
 from ..authz import is_group_member, is_group_owner_or_manager
+from ..response_cache import cached, response_cache
+from .transactions import OPEN_ORDERS_FILTER
 
 bp = Blueprint("groups", __name__)
 
+_GROUP_ORDERS_SQL = """
+SELECT t.id, t.account_id, t.group_id, t.ticker, t.time, t.side,
+       t.qty::float8 AS qty, t.price::float8 AS price,
+       t.kind, t.status, t.requested_by, t.approved_by
+FROM transactions t
+WHERE t.group_id = %(gid)s AND t.kind = 'ORDER'{open_filter}
+ORDER BY t.time DESC
+LIMIT 200
+"""
+
+
+@bp.after_request
+def _invalidate_on_write(resp):
+    # Group writes are rare; they can change any member's group list and,
+    # via group accounts, account lists, so drop both wholesale
+    if request.method != "GET" and resp.status_code < 400:
+        response_cache.invalidate(["groups", "accounts"])
+    return resp
+
 
 def _iso(d: dict, key: str):
     if d.get(key):
@@ -26,6 +47,7 @@ def _user_role_in_group(user_id: int, group_id: int):
 
 @bp.get("")
 @jwt_required()
+@cached(ttl=60, tags=["groups"], per_user=True)
 def list_groups():
     ident = get_jwt_identity() or {}
     uid = ident.get("id")
@@ -249,19 +271,8 @@ def group_orders(group_id: int):
     if not is_group_member(uid, group_id):
         return jsonify({"error": "forbidden"}), 403
     status = request.args.get("status")
-    where = "WHERE t.group_id = %(gid)s AND t.kind = 'ORDER'"
-    if status == "open":
-        where += " AND t.status IN ('NEW','PENDING_APPROVAL','APPROVED','PARTIAL_FILL')"
     rows = db_query(
-        f"""
-        SELECT t.id, t.account_id, t.group_id, t.ticker, t.time, t.side,
-               t.qty::float8 AS qty, t.price::float8 AS price,
-               t.kind, t.status, t.requested_by, t.approved_by
-        FROM transactions t
-        {where}
-        ORDER BY t.time DESC
-        LIMIT 200
-        """,
+        _GROUP_ORDERS_SQL.format(open_filter=OPEN_ORDERS_FILTER if status == "open" else ""),
         {"gid": group_id},
     )
     for r in rows:
@@ -269,6 +280,56 @@ def group_orders(group_id: int):
     return jsonify(rows)
 
 
+@bp.get("/<int:group_id>/portfolio")
+@jwt_required()
+def group_portfolio(group_id: int):
+    ident = get_jwt_identity() or {}
+    uid = ident.get("id")
+    if not is_group_member(uid, group_id):
+        return jsonify({"error": "forbidden"}), 403
+    # group_member_positions is kept current by a trigger on fills, so this is O(positions)
+    rows = db_query(
+        """
+        SELECT gp.user_id, u.email, gp.ticker,
+               gp.qty::float8 AS qty,
+               gp.net_cost::float8 AS net_cost,
+               COALESCE(l.close, 0)::float8 AS last
+        FROM group_member_positions gp
+        JOIN users u ON u.id = gp.user_id
+        LEFT JOIN LATERAL (
+          SELECT close FROM price_bars p WHERE p.ticker = gp.ticker ORDER BY time DESC LIMIT 1
+        ) l ON true
+        WHERE gp.group_id = %(gid)s
+        ORDER BY gp.user_id, gp.ticker
+        """,
+        {"gid": group_id},
+    )
+    positions = {}
+    members = {}
+    for r in rows:
+        mv = r["qty"] * r["last"]
+        pos = positions.setdefault(r["ticker"], {"ticker": r["ticker"], "qty": 0.0, "last": r["last"], "market_value": 0.0, "net_cost": 0.0})
+        pos["qty"] += r["qty"]
+        pos["market_value"] += mv
+        pos["net_cost"] += r["net_cost"]
+        m = members.setdefault(r["user_id"], {"user_id": r["user_id"], "email": r["email"], "market_value": 0.0, "net_cost": 0.0, "positions": []})
+        m["market_value"] += mv
+        m["net_cost"] += r["net_cost"]
+        m["positions"].append({"ticker": r["ticker"], "qty": r["qty"], "market_value": mv, "pnl": mv - r["net_cost"]})
+    total_mv = sum(p["market_value"] for p in positions.values())
+    for p in positions.values():
+        p["pnl"] = p["market_value"] - p["net_cost"]
+    for m in members.values():
+        m["pnl"] = m["market_value"] - m["net_cost"]
+        m["weight"] = (m["market_value"] / total_mv) if total_mv else None
+    return jsonify({
+        "group_id": group_id,
+        "market_value": total_mv,
+        "positions": [p for p in positions.values() if p["qty"] != 0],
+        "members": list(members.values()),
+    })
+
+
 @bp.delete("/<int:group_id>")
 @jwt_required()
 def delete_group(group_id: int):
@@ -286,6 +347,7 @@ def delete_group(group_id: int):
 
 @bp.get("/discover")
 @jwt_required()
+@cached(ttl=30, tags=["groups"], per_user=True)
 def discover_groups():
     ident = get_jwt_identity() or {}
     uid = ident.get("id")
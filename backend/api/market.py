@@ -1,35 +1,80 @@
-from flask import Blueprint, jsonify, request
+import struct
+from array import array
+
+from flask import Blueprint, Response, jsonify, request
 from flask_jwt_extended import jwt_required
-from ..db import db_query, db_query_one, db_execute_returning
-from datetime import datetime
-import random
-import threading
-import time
-import os
+from ..db import db_query, db_query_one, db_query_rows
+from ..services.bar_store import bar_store, from_epoch_us
+from ..services.simulator import simulator
+from ..services.snapshot import MAX_SNAPSHOT_SYMBOLS, market_snapshots, parse_symbols
+from ..http_cache import conditional
+from ..rate_limit import rate_class
+from ..response_cache import cached
 
 bp = Blueprint("market", __name__)
 
+# format=compact: {"columns": [...], "data": [[...], ...]} with time as epoch milliseconds
+COMPACT_OHLCV_COLUMNS = ["time_ms", "open", "high", "low", "close", "volume"]
+
+# Binary bars (Accept: application/vnd.paper-trading.bars, or format=binary).
+# Little-endian, 8-byte aligned so clients can view columns as Float64Arrays:
+#   0  4s   magic b"BAR1"
+#   4  u32  n (bar count)
+#   8  u32  column count (6)
+#   12 u32  reserved (0)
+#   16 f64[n] x 6 columns, in COMPACT_OHLCV_COLUMNS order: time_ms, open, high,
+#             low, close, volume (time and volume are integral values)
+# Longest /ohlcv window served; beyond the bar store's capacity it is a DB read
+MAX_OHLCV_LIMIT = 10_000
+
+BARS_MIME = "application/vnd.paper-trading.bars"
+_BARS_HEADER = struct.Struct("<4sIII")
+
+
+def _pack_bars(time_us, o, h, l, c, v) -> bytes:
+    """Header + six float64 columns, built from typed buffers without per-row objects."""
+    import numpy as np
+
+    n = len(o)
+    cols = np.empty((6, n), dtype="<f8")  # explicit byte order, whatever the host's
+    for i, col in enumerate((time_us, o, h, l, c, v)):
+        cols[i] = np.frombuffer(col, dtype=col.typecode) if isinstance(col, array) else col
+    cols[0] //= 1000
+    return _BARS_HEADER.pack(b"BAR1", n, 6, 0) + cols.tobytes()
+
+
+def _wants_binary() -> bool:
+    if request.args.get("format") == "binary":
+        return True
+    best = request.accept_mimetypes.best_match(["application/json", BARS_MIME])
+    return best == BARS_MIME
+
+
+def _bars_response(body: bytes) -> Response:
+    return Response(body, mimetype=BARS_MIME)
+
+
+def _tickers_version():
+    row = db_query_one(
+        "SELECT md5(string_agg(symbol || '|' || COALESCE(name, '') || '|' || COALESCE(asset_type, ''), ',' ORDER BY symbol)) AS v FROM tickers"
+    )
+    return (row or {}).get("v"), None
+
+
+def _ohlcv_version(symbol: str):
+    sym = symbol.upper()
+    t = bar_store.latest_time(sym)
+    if t is not None:
+        return t, from_epoch_us(t)
+    row = db_query_one("SELECT max(time) AS t FROM price_bars WHERE ticker = %(sym)s", {"sym": sym})
+    last = row["t"] if row else None
+    return last, last
 
-def _sim_profile(sym: str):
-    s = sym.upper()
-    from ..db import db_query_one
-    row = db_query_one("SELECT asset_type FROM tickers WHERE symbol = %(s)s", {"s": s})
-    asset = (row.get("asset_type") or "").upper() if row else ""
-    base = {"step": 0.007, "volume": 1_500_000}
-    if asset == "ETF":
-        base = {"step": 0.003, "volume": 5_000_000}
-    overrides = {
-        "SPY": {"step": 0.0025, "volume": 50_000_000},
-        "QQQ": {"step": 0.0030, "volume": 35_000_000},
-        "IWM": {"step": 0.0035, "volume": 20_000_000},
-        "GLD": {"step": 0.0018, "volume": 10_000_000},
-        "TLT": {"step": 0.0015, "volume": 12_000_000},
-    }
-    prof = overrides.get(s, base)
-    return prof
 
 @bp.get("/tickers")
 @jwt_required(optional=True)
+@conditional(_tickers_version, max_age=60)
+@cached(ttl=300, tags=["tickers"], when=lambda: not request.args.get("q", "").strip())
 def list_tickers():
     q = request.args.get("q", "").strip()
     if q:
@@ -61,7 +106,7 @@ def latest_close(symbol: str):
                high::float8 AS high,
                low::float8 AS low,
                close::float8 AS close,
-               volume,
+               COALESCE(volume, 0) AS volume,
                source
         FROM price_bars
         WHERE ticker = %(sym)s
@@ -72,16 +117,90 @@ def latest_close(symbol: str):
     )
     if not row:
         return jsonify({"error": "not found"}), 404
-    row["volume"] = int(row.get("volume") or 0)
-    if row.get("time"):
-        row["time"] = row["time"].isoformat()
     return jsonify(row)
 
 
+@bp.get("/snapshot")
+@jwt_required(optional=True)
+def snapshot():
+    """Latest bar, day change and day volume for ?symbols=AAPL,MSFT,... in one call."""
+    syms = parse_symbols(request.args.get("symbols", ""))
+    if not syms:
+        return jsonify({"error": "symbols required"}), 400
+    if len(syms) > MAX_SNAPSHOT_SYMBOLS:
+        return jsonify({"error": f"at most {MAX_SNAPSHOT_SYMBOLS} symbols"}), 400
+    return jsonify(market_snapshots.get(syms))
+
+
+def _ohlcv_rate_class() -> str:
+    limit = request.args.get("limit", "500")
+    return "heavy_read" if not limit.isdigit() or int(limit) > bar_store.capacity else "read"
+
+
 @bp.get("/tickers/<symbol>/ohlcv")
+@rate_class(_ohlcv_rate_class)
 @jwt_required(optional=True)
+@conditional(_ohlcv_version, max_age=1)
 def ohlcv(symbol: str):
-    limit = int(request.args.get("limit", 500))
+    sym = symbol.upper()
+    limit = max(1, min(int(request.args.get("limit", 500)), MAX_OHLCV_LIMIT))
+    fmt = request.args.get("format", "rows")
+    binary = _wants_binary()
+    win = bar_store.window(sym, limit)
+    if win is not None:
+        if binary:
+            return _bars_response(_pack_bars(win.time, win.open, win.high, win.low, win.close, win.volume))
+        if fmt == "compact":
+            return jsonify({
+                "columns": COMPACT_OHLCV_COLUMNS,
+                "data": list(zip([t // 1000 for t in win.time], win.open, win.high, win.low, win.close, win.volume)),
+            })
+        if fmt == "columns":
+            return jsonify({
+                "time": [from_epoch_us(t) for t in win.time],
+                "open": win.open,
+                "high": win.high,
+                "low": win.low,
+                "close": win.close,
+                "volume": win.volume,
+            })
+        src = bar_store.source_name
+        return jsonify([
+            {"time": from_epoch_us(t), "open": o, "high": h, "low": l, "close": c, "volume": v, "source": src(sc)}
+            for t, o, h, l, c, v, sc in zip(win.time, win.open, win.high, win.low, win.close, win.volume, win.source)
+        ])
+
+    # Older history than the in-memory window holds: read from Postgres
+    if binary:
+        _, rows = db_query_rows(
+            """
+            SELECT (EXTRACT(EPOCH FROM time) * 1000000)::bigint,
+                   open::float8, high::float8, low::float8, close::float8,
+                   COALESCE(volume, 0)
+            FROM price_bars WHERE ticker = %(sym)s
+            ORDER BY time DESC
+            LIMIT %(lim)s
+            """,
+            {"sym": sym, "lim": limit},
+        )
+        import numpy as np
+
+        cols = np.array(rows[::-1], dtype=np.float64).reshape(-1, 6).T
+        return _bars_response(_pack_bars(*cols))
+    if fmt == "compact":
+        _, rows = db_query_rows(
+            """
+            SELECT (EXTRACT(EPOCH FROM time) * 1000)::bigint,
+                   open::float8, high::float8, low::float8, close::float8,
+                   COALESCE(volume, 0)
+            FROM price_bars WHERE ticker = %(sym)s
+            ORDER BY time DESC
+            LIMIT %(lim)s
+            """,
+            {"sym": sym, "lim": limit},
+        )
+        rows.reverse()
+        return jsonify({"columns": COMPACT_OHLCV_COLUMNS, "data": rows})
     rows = db_query(
         """
         SELECT time,
@@ -89,90 +208,73 @@ def ohlcv(symbol: str):
                high::float8 AS high,
                low::float8 AS low,
                close::float8 AS close,
-               volume,
+               COALESCE(volume, 0) AS volume,
                source
         FROM price_bars WHERE ticker = %(sym)s
         ORDER BY time DESC
         LIMIT %(lim)s
         """,
-        {"sym": symbol.upper(), "lim": limit},
+        {"sym": sym, "lim": limit},
     )
     # return ascending order for charts
-    out = []
-    for r in rows[::-1]:
-        r["volume"] = int(r.get("volume") or 0)
-        r["time"] = r["time"].isoformat()
-        out.append(r)
-    return jsonify(out)
+    rows.reverse()
+    if fmt == "columns":
+        return jsonify({k: [r[k] for r in rows] for k in ("time", "open", "high", "low", "close", "volume")})
+    return jsonify(rows)
 
 
-@bp.post("/tickers/<symbol>/simulate")
+@bp.get("/tickers/<symbol>/indicators")
 @jwt_required(optional=True)
-def simulate_tick(symbol: str):
+@conditional(_ohlcv_version, max_age=1)
+def indicators(symbol: str):
+    """?indicator=sma|ema|rsi|vwap|bbands&period=&k=&limit= -> {"time_ms": [...], <series>: [...]}"""
+    from ..services.indicators import INDICATORS, BarWindow, compute as compute_indicator, indicator_cache
+
     sym = symbol.upper()
-    row = _simulate_once(sym)
-    return jsonify(row)
+    name = request.args.get("indicator", "sma").lower()
+    if name not in INDICATORS:
+        return jsonify({"error": f"indicator must be one of {', '.join(INDICATORS)}"}), 400
+    params = dict(INDICATORS[name][2])
+    try:
+        if "period" in params:
+            params["period"] = int(request.args.get("period", params["period"]))
+        if "k" in params:
+            params["k"] = float(request.args.get("k", params["k"]))
+        limit = int(request.args.get("limit", 200))
+    except ValueError:
+        return jsonify({"error": "period, k and limit must be numeric"}), 400
+    if not 1 <= limit <= 5000 or not 1 <= params.get("period", 1) <= 500:
+        return jsonify({"error": "limit must be 1..5000 and period 1..500"}), 400
 
+    out = indicator_cache.get(sym, name, params, limit)
+    if out is None:
+        # Longer than the in-memory window: compute once from Postgres, uncached
+        need = limit + INDICATORS[name][3](params)
+        _, rows = db_query_rows(
+            """
+            SELECT (EXTRACT(EPOCH FROM time) * 1000000)::bigint,
+                   open::float8, high::float8, low::float8, close::float8,
+                   COALESCE(volume, 0), 0
+            FROM price_bars WHERE ticker = %(sym)s
+            ORDER BY time DESC
+            LIMIT %(lim)s
+            """,
+            {"sym": sym, "lim": need},
+            readonly=True,
+        )
+        if not rows:
+            return jsonify({"error": "not found"}), 404
+        rows.reverse()
+        out = compute_indicator(BarWindow(*zip(*rows)), name, params, limit)
+    out.update({"ticker": sym, "indicator": name, "params": params})
+    return jsonify(out)
 
-def _simulate_once(sym: str) -> dict:
-    last = db_query_one(
-        """
-        SELECT close::float8 AS close
-        FROM price_bars WHERE ticker = %(sym)s
-        ORDER BY time DESC
-        LIMIT 1
-        """,
-        {"sym": sym},
-    )
-    last_close = float(last["close"]) if last else 100.0
-    prof = _sim_profile(sym)
-    step = random.uniform(-prof["step"], prof["step"])
-    open_px = last_close
-    close_px = max(0.01, open_px * (1 + step))
-    high_px = max(open_px, close_px) * (1 + abs(step) * 0.5)
-    low_px = min(open_px, close_px) * (1 - abs(step) * 0.5)
-    row = db_execute_returning(
-        """
-        INSERT INTO price_bars (ticker, time, open, high, low, close, volume, source)
-        VALUES (%(sym)s, %(ts)s, %(o)s, %(h)s, %(l)s, %(c)s, %(v)s, 'SIM')
-        RETURNING ticker, time, open::float8 AS open, high::float8 AS high, low::float8 AS low, close::float8 AS close, volume, source
-        """,
-        {
-            "sym": sym,
-            "ts": datetime.utcnow(),
-            "o": open_px,
-            "h": high_px,
-            "l": low_px,
-            "c": close_px,
-            "v": int(prof["volume"] * (1 + random.uniform(-0.2, 0.2))),
-        },
-    )
-    row["volume"] = int(row.get("volume") or 0)
-    if row.get("time"):
-        row["time"] = row["time"].isoformat()
-    return row
-
-
-def start_simulator(app=None):
-    """Start a background thread that continuously simulates all known tickers.
-    Set SIM_DISABLED=1 to disable. Configure SIM_INTERVAL_SECONDS for cadence.
-    """
-    if os.getenv("SIM_DISABLED") == "1":
-        return
-
-    interval_sec = int(os.getenv("SIM_INTERVAL_SECONDS", "2"))
-
-    def _loop():
-        while True:
-            try:
-                # Pull a modest set of symbols to simulate
-                syms = [r["symbol"] for r in db_query("SELECT symbol FROM tickers ORDER BY symbol LIMIT 50")]
-                for s in syms:
-                    _simulate_once(s)
-            except Exception:
-                # swallow to keep the loop alive in dev
-                pass
-            time.sleep(interval_sec)
-
-    t = threading.Thread(target=_loop, name="price-sim", daemon=True)
-    t.start()
+
+@bp.post("/tickers/<symbol>/simulate")
+@rate_class("simulate")
+@jwt_required(optional=True)
+def simulate_tick(symbol: str):
+    rows = simulator.tick([symbol.upper()])
+    if not rows:
+        return jsonify({"error": "unknown ticker"}), 404
+    return jsonify(rows[0])
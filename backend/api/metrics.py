@@ -1,10 +1,32 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..db import db_query
+from ..db import db_query, db_query_one
 from ..authz import is_member
+from ..http_cache import conditional
+from ..rate_limit import rate_class
+from ..response_cache import cached
 
 bp = Blueprint("metrics", __name__)
 
+_POSITIONS_SQL = """
+WITH latest AS (
+  SELECT DISTINCT ON (ticker) ticker, close::float8 AS close
+  FROM price_bars
+  ORDER BY ticker, time DESC
+)
+SELECT p.ticker,
+       p.group_id,
+       g.name AS group_name,
+       p.position_qty::float8 AS qty,
+       COALESCE(l.close, 0) AS last,
+       (p.position_qty::float8) * COALESCE(l.close, 0) AS market_value
+FROM account_positions_view p
+LEFT JOIN latest l ON l.ticker = p.ticker
+LEFT JOIN groups g ON g.id = p.group_id
+WHERE p.account_id = %(aid)s
+ORDER BY p.group_id NULLS FIRST, ABS(p.position_qty) DESC
+"""
+
 
 @bp.get("/positions/<int:account_id>")
 @jwt_required()
@@ -13,28 +35,44 @@ def positions(account_id: int):
     user_id = ident.get("id")
     if not is_member(user_id, account_id):
         return jsonify({"error": "forbidden"}), 403
+    rows = db_query(_POSITIONS_SQL, {"aid": account_id})
+    return jsonify(rows)
+
+
+@bp.get("/risk/<int:account_id>")
+@rate_class("heavy_read")
+@jwt_required()
+def risk(account_id: int):
+    """Portfolio volatility, VaR and beta to SPY/QQQ for the account's positions.
+    ?interval=minute|hour|day (default day) &periods=N buckets (default 250)."""
+    from ..services.analytics import INTERVALS, MAX_PERIODS, portfolio_risk
+
+    ident = get_jwt_identity() or {}
+    user_id = ident.get("id")
+    if not is_member(user_id, account_id):
+        return jsonify({"error": "forbidden"}), 403
+    unit = request.args.get("interval", "day")
+    if unit not in INTERVALS:
+        return jsonify({"error": f"interval must be one of {', '.join(INTERVALS)}"}), 400
+    try:
+        periods = int(request.args.get("periods", 250))
+    except ValueError:
+        return jsonify({"error": "periods must be an integer"}), 400
+    if not 2 <= periods <= MAX_PERIODS:
+        return jsonify({"error": f"periods must be 2..{MAX_PERIODS}"}), 400
     rows = db_query(
         """
-        WITH latest AS (
-          SELECT DISTINCT ON (ticker) ticker, close::float8 AS close
-          FROM price_bars
-          ORDER BY ticker, time DESC
-        )
-        SELECT p.ticker,
-               p.group_id,
-               g.name AS group_name,
-               p.position_qty::float8 AS qty,
-               COALESCE(l.close, 0) AS last,
-               (p.position_qty::float8) * COALESCE(l.close, 0) AS market_value
-        FROM account_positions_view p
-        LEFT JOIN latest l ON l.ticker = p.ticker
-        LEFT JOIN groups g ON g.id = p.group_id
-        WHERE p.account_id = %(aid)s
-        ORDER BY p.group_id NULLS FIRST, ABS(p.position_qty) DESC
+        SELECT ticker, SUM(position_qty)::float8 AS qty
+        FROM account_positions_view
+        WHERE account_id = %(aid)s
+        GROUP BY ticker
         """,
         {"aid": account_id},
+        readonly=True,
     )
-    return jsonify(rows)
+    out = portfolio_risk({r["ticker"]: r["qty"] for r in rows}, unit, periods)
+    out["account_id"] = account_id
+    return jsonify(out)
 
 
 @bp.get("/pnl/<int:account_id>")
@@ -60,6 +98,7 @@ def pnl(account_id: int):
         WHERE a.id = %(aid)s
         """,
         {"aid": account_id},
+        readonly=True,
     )
     return jsonify(rows[0] if rows else {
         "account_id": account_id,
@@ -74,26 +113,34 @@ def pnl(account_id: int):
     })
 
 
+def _leaderboard_version():
+    # Snapshot id: the leaderboard only changes when the refresh job rebuilds it
+    row = db_query_one("SELECT taken_at FROM leaderboard_snapshot LIMIT 1", readonly=True) or {}
+    return row.get("taken_at"), row.get("taken_at")
+
+
 @bp.get("/leaderboard")
 @jwt_required(optional=True)
+@conditional(_leaderboard_version, max_age=2)
+@cached(ttl=30, tags=["leaderboard"])
 def leaderboard():
     limit = int(request.args.get("limit", 10))
     rows = db_query(
         """
-        SELECT a.id AS account_id,
-               a.name,
-               p.starting_cash::float8 AS starting_cash,
-               p.current_cash::float8 AS current_cash,
-               COALESCE(p.account_value::float8, 0) AS account_value,
-               COALESCE(p.basic_pnl::float8, 0) AS pnl,
-               CASE WHEN p.starting_cash::float8 = 0 THEN NULL
-                    ELSE COALESCE(p.basic_pnl::float8, 0) / p.starting_cash::float8
+        SELECT s.account_id,
+               s.name,
+               s.starting_cash::float8 AS starting_cash,
+               s.current_cash::float8 AS current_cash,
+               COALESCE(s.account_value::float8, 0) AS account_value,
+               COALESCE(s.basic_pnl::float8, 0) AS pnl,
+               CASE WHEN s.starting_cash::float8 = 0 THEN NULL
+                    ELSE COALESCE(s.basic_pnl::float8, 0) / s.starting_cash::float8
                END AS return
-        FROM accounts a
-        LEFT JOIN account_pnl_basic p ON p.account_id = a.id
+        FROM leaderboard_snapshot s
         ORDER BY pnl DESC
         LIMIT %(lim)s
         """,
         {"lim": limit},
+        readonly=True,
     )
     return jsonify(rows)
@@ -1,38 +1,194 @@
+from datetime import datetime, timedelta, timezone
+
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required
-from ..db import db_query
+from ..db import db_query, db_query_one
+from ..http_cache import conditional
+from ..rate_limit import rate_class
+from ..response_cache import cached
+from ..services.sentiment import GRANULARITIES, sentiment_series, top_movers
 
 bp = Blueprint("news", __name__)
 
+# Article columns shaped for the API (impact_tags split in SQL, not per row in Python)
+NEWS_COLUMNS = (
+    "n.id, n.published_at, n.source, n.title, n.url, n.sentiment, "
+    "string_to_array(NULLIF(n.impact_tags, ''), ',') AS impact_tags"
+)
+
+
+def _news_version():
+    row = db_query_one("SELECT max(id) AS v FROM news_articles", readonly=True) or {}
+    return row.get("v"), None
+
+
+def _query_news_sql(symbol: bool, sentiment: bool) -> str:
+    clauses = []
+    if symbol:
+        clauses.append("EXISTS (SELECT 1 FROM news_ticker_map m WHERE m.article_id = n.id AND m.ticker = %(sym)s)")
+    if sentiment:
+        clauses.append("n.sentiment = %(sent)s")
+    where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return f"""
+        SELECT {NEWS_COLUMNS}
+        FROM news_articles n {where_sql}
+        ORDER BY n.published_at DESC
+        LIMIT %(lim)s
+    """
+
 
 @bp.get("")
 @jwt_required(optional=True)
+@conditional(_news_version, max_age=15)
+@cached(ttl=60, tags=["news"], when=lambda: bool(request.args.get("symbol")))
 def query_news():
     symbol = request.args.get("symbol")
     sentiment = request.args.get("sentiment")
     limit = int(request.args.get("limit", 50))
 
-    clauses = []
     params = {"lim": limit}
+    if symbol:
+        params["sym"] = symbol.upper()
+    if sentiment:
+        params["sent"] = sentiment
+    rows = db_query(_query_news_sql(bool(symbol), bool(sentiment)), params, readonly=True)
+    return jsonify(rows)
+
+
+# Matches ranked per request; older matches beyond this are only reachable via sort=recent
+SEARCH_CANDIDATES = 5000
+_HEADLINE_OPTS = "StartSel=<mark>, StopSel=</mark>, HighlightAll=true"
 
+
+@bp.get("/search")
+@rate_class("heavy_read")
+@jwt_required(optional=True)
+@conditional(_news_version, max_age=15)
+def search_news():
+    """Full-text search: ?q=<websearch syntax>&symbol=&sentiment=&sort=relevance|recent&limit=&offset=
+
+    Matches come from the GIN index on search_tsv. For relevance, only the
+    SEARCH_CANDIDATES most recent matches are ranked, which keeps common
+    terms cheap on a large archive. title_highlight wraps hits in <mark>.
+    """
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return jsonify({"error": "q required"}), 400
+    sort = request.args.get("sort", "relevance")
+    if sort not in ("relevance", "recent"):
+        return jsonify({"error": "sort must be relevance or recent"}), 400
+    limit = max(1, min(int(request.args.get("limit", 20)), 100))
+    offset = max(0, int(request.args.get("offset", 0)))
+
+    clauses = ["n.search_tsv @@ query"]
+    params = {"q": q, "lim": limit + 1, "off": offset, "cand": SEARCH_CANDIDATES, "opts": _HEADLINE_OPTS}
+    symbol = request.args.get("symbol")
     if symbol:
         clauses.append(
             "EXISTS (SELECT 1 FROM news_ticker_map m WHERE m.article_id = n.id AND m.ticker = %(sym)s)"
         )
         params["sym"] = symbol.upper()
+    sentiment = request.args.get("sentiment")
     if sentiment:
         clauses.append("n.sentiment = %(sent)s")
         params["sent"] = sentiment
+    where_sql = " AND ".join(clauses)
 
-    where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
-    sql = f"SELECT n.* FROM news_articles n {where_sql} ORDER BY n.published_at DESC LIMIT %(lim)s"
-    rows = db_query(sql, params)
-
-    out = []
-    for r in rows:
-        if r.get("impact_tags"):
-            r["impact_tags"] = r["impact_tags"].split(",")
-        if r.get("published_at"):
-            r["published_at"] = r["published_at"].isoformat()
-        out.append(r)
+    if sort == "recent":
+        hits_sql = f"""
+            SELECT n.id, ts_rank_cd(n.search_tsv, query) AS rank
+            FROM news_articles n, websearch_to_tsquery('english', %(q)s) query
+            WHERE {where_sql}
+            ORDER BY n.published_at DESC, n.id DESC
+            LIMIT %(lim)s OFFSET %(off)s
+        """
+    else:
+        hits_sql = f"""
+            SELECT c.id, ts_rank_cd(c.search_tsv, c.query) AS rank
+            FROM (
+              SELECT n.id, n.published_at, n.search_tsv, query
+              FROM news_articles n, websearch_to_tsquery('english', %(q)s) query
+              WHERE {where_sql}
+              ORDER BY n.published_at DESC
+              LIMIT %(cand)s
+            ) c
+            ORDER BY rank DESC, c.published_at DESC, c.id DESC
+            LIMIT %(lim)s OFFSET %(off)s
+        """
+    # Highlight only the page being returned
+    rows = db_query(
+        f"""
+        WITH hits AS ({hits_sql})
+        SELECT {NEWS_COLUMNS},
+               h.rank::float8 AS rank,
+               ts_headline('english', n.title, websearch_to_tsquery('english', %(q)s), %(opts)s) AS title_highlight
+        FROM hits h
+        JOIN news_articles n ON n.id = h.id
+        ORDER BY {"n.published_at DESC, n.id DESC" if sort == "recent" else "h.rank DESC, n.published_at DESC, n.id DESC"}
+        """,
+        params,
+        readonly=True,
+    )
+    has_more = len(rows) > limit
+    return jsonify({
+        "results": rows[:limit],
+        "offset": offset,
+        "next_offset": offset + limit if has_more else None,
+    })
+
+
+def _sentiment_version(**_):
+    # New articles or a new hour (the window slides) change the response
+    v, _ = _news_version()
+    return f"{v}:{datetime.now(timezone.utc):%Y%m%d%H}", None
+
+
+def _sentiment_window():
+    """(granularity, periods, since) from ?granularity=hour|day&periods=N, or an error response."""
+    g = request.args.get("granularity", "day")
+    if g not in GRANULARITIES:
+        return None, (jsonify({"error": f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400)
+    try:
+        periods = int(request.args.get("periods", 48 if g == "hour" else 30))
+    except ValueError:
+        return None, (jsonify({"error": "periods must be an integer"}), 400)
+    periods = max(1, min(periods, 24 * 90 if g == "hour" else 365 * 2))
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if g == "day":
+        now = now.replace(hour=0)
+    step = timedelta(hours=1) if g == "hour" else timedelta(days=1)
+    return (g, periods, now - step * (periods - 1)), None
+
+
+@bp.get("/sentiment/<symbol>")
+@jwt_required(optional=True)
+@conditional(_sentiment_version, max_age=15)
+def sentiment_trend(symbol: str):
+    """Per-bucket sentiment counts and net score for one ticker, from the rollup table."""
+    win, err = _sentiment_window()
+    if err:
+        return err
+    g, periods, since = win
+    sym = symbol.upper()
+    return jsonify({
+        "ticker": sym,
+        "granularity": g,
+        "since": since,
+        "buckets": sentiment_series(sym, g, since),
+    })
+
+
+@bp.get("/sentiment/movers")
+@jwt_required(optional=True)
+@conditional(_sentiment_version, max_age=15)
+def sentiment_movers():
+    """Most bullish / bearish tickers by net sentiment over the window."""
+    win, err = _sentiment_window()
+    if err:
+        return err
+    g, periods, since = win
+    limit = min(int(request.args.get("limit", 10)), 100)
+    min_articles = int(request.args.get("min_articles", 3))
+    out = top_movers(g, since, limit, min_articles)
+    out.update({"granularity": g, "since": since})
     return jsonify(out)
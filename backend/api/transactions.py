@@ -1,40 +1,37 @@
 from datetime import datetime
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..db import db_query, db_query_one, get_conn_cursor
+from ..db import db_query, db_query_one, db_query_one_prepared, prepared, get_conn_cursor, run_in_transaction
 from ..authz import is_owner_or_manager, is_trader_or_higher, is_member, is_group_member
+from ..services.order_events import OrderEventBatch, parse_offset, read_events
+from ..services.risk import risk_engine
 
 bp = Blueprint("transactions", __name__)
 
 
-APPROVAL_NOTIONAL_THRESHOLD = 10000  # simplistic rule
-MAX_POSITION_ABS_QTY = 1000  # require approval if exceeded
+_LATEST_PRICE = prepared(
+    "tx_latest_price",
+    "SELECT close::float8 AS close FROM price_bars WHERE ticker = $1 ORDER BY time DESC LIMIT 1",
+)
 
 
-def _latest_price(symbol: str):
-    row = db_query_one(
-        "SELECT close::float8 AS close FROM price_bars WHERE ticker = %(sym)s ORDER BY time DESC LIMIT 1",
-        {"sym": symbol},
-    )
-    return float(row["close"]) if row else None
-
+# Shared with groups.group_orders; both queries are EXPLAINed by query_plans
+OPEN_ORDERS_FILTER = " AND t.status IN ('NEW','PENDING_APPROVAL','APPROVED','PARTIAL_FILL')"
 
-def _iso_time(d: dict, key: str = "time") -> dict:
-    if d.get(key):
-        d[key] = d[key].isoformat()
-    return d
+_LIST_ORDERS_SQL = """
+SELECT t.id, t.account_id, t.ticker, t.time, t.side,
+       t.qty::float8 AS qty, t.price::float8 AS price,
+       t.kind, t.status, t.requested_by, t.approved_by
+FROM transactions t
+WHERE t.account_id = %(aid)s AND t.kind = 'ORDER'{open_filter}
+ORDER BY time DESC
+LIMIT 200
+"""
 
 
-def _net_position(account_id: int, symbol: str) -> float:
-    row = db_query_one(
-        """
-        SELECT COALESCE(SUM(CASE WHEN side='BUY' THEN qty ELSE -qty END), 0)::float8 AS qty
-        FROM transactions
-        WHERE account_id = %(aid)s AND ticker = %(sym)s AND kind = 'FILL' AND status IN ('EXECUTED','FILLED')
-        """,
-        {"aid": account_id, "sym": symbol},
-    )
-    return float(row["qty"]) if row else 0.0
+def _latest_price(symbol: str):
+    row = db_query_one_prepared(_LATEST_PRICE, (symbol,))
+    return float(row["close"]) if row else None
 
 
 def _insert_fill(cur, account_id: int, symbol: str, side: str, qty: float, price: float, requested_by: int, approved_by: int, group_id=None):
@@ -65,26 +62,29 @@ def list_orders(account_id: int):
     if not is_member(user_id, account_id):
         return jsonify({"error": "forbidden"}), 403
     status = request.args.get("status")
-    params = {"aid": account_id}
-    where = "WHERE t.account_id = %(aid)s AND t.kind = 'ORDER'"
-    if status == "open":
-        where += " AND t.status IN ('NEW','PENDING_APPROVAL','APPROVED','PARTIAL_FILL')"
     rows = db_query(
-        f"""
-        SELECT t.id, t.account_id, t.ticker, t.time, t.side,
-               t.qty::float8 AS qty, t.price::float8 AS price,
-               t.kind, t.status, t.requested_by, t.approved_by
-        FROM transactions t {where}
-        ORDER BY time DESC
-        LIMIT 200
-        """,
-        params,
+        _LIST_ORDERS_SQL.format(open_filter=OPEN_ORDERS_FILTER if status == "open" else ""),
+        {"aid": account_id},
     )
-    for r in rows:
-        _iso_time(r)
     return jsonify(rows)
 
 
+@bp.get("/accounts/<int:account_id>/order-events")
+@jwt_required()
+def list_order_events(account_id: int):
+    """Incremental tail of the account's order event log: pass the previous
+    response's next_offset as ?offset= to receive only newer events."""
+    ident = get_jwt_identity() or {}
+    if not is_member(ident.get("id"), account_id):
+        return jsonify({"error": "forbidden"}), 403
+    try:
+        after = parse_offset(request.args.get("offset"))
+    except ValueError:
+        return jsonify({"error": "invalid offset"}), 400
+    limit = max(1, min(int(request.args.get("limit", 500)), 5000))
+    return jsonify(read_events(after, limit, account_id=account_id))
+
+
 @bp.post("/accounts/<int:account_id>/orders")
 @jwt_required()
 def create_order(account_id: int):
@@ -108,35 +108,9 @@ def create_order(account_id: int):
     if not mkt_px:
         return jsonify({"error": "no price available"}), 400
 
-    notional = qty * (float(limit_price) if limit_price else mkt_px)
-    # Risk checks
-    current_pos = _net_position(account_id, symbol)
-    new_pos = current_pos + qty if side == "BUY" else current_pos - qty
-    risky_position = abs(new_pos) > MAX_POSITION_ABS_QTY
-    # Account-level limits
-    acct_cfg = db_query_one(
-        """
-        SELECT
-          max_order_notional::float8 AS max_order_notional,
-          max_position_abs_qty::float8 AS max_position_abs_qty,
-          COALESCE(earnings_lockout, false) AS earnings_lockout
-        FROM accounts WHERE id = %(aid)s
-        """,
-        {"aid": account_id},
-    ) or {}
-    over_notional_cfg = False
-    over_position_cfg = False
-    if acct_cfg.get("max_order_notional") is not None:
-        over_notional_cfg = notional > float(acct_cfg["max_order_notional"])
-    if acct_cfg.get("max_position_abs_qty") is not None:
-        over_position_cfg = abs(new_pos) > float(acct_cfg["max_position_abs_qty"])
-    needs_approval = (
-        notional > APPROVAL_NOTIONAL_THRESHOLD
-        or risky_position
-        or over_notional_cfg
-        or over_position_cfg
-        or bool(acct_cfg.get("earnings_lockout"))
-    )
+    # Risk checks (global thresholds + account limits) from the in-process engine
+    reasons = risk_engine.evaluate(account_id, symbol, side, qty, float(limit_price) if limit_price else mkt_px)
+    needs_approval = bool(reasons)
 
     # If provided, verify group membership (convert empty string to None)
     if group_id == '':
@@ -150,7 +124,7 @@ def create_order(account_id: int):
             """
             INSERT INTO transactions (account_id, group_id, ticker, time, side, qty, price, kind, status, requested_by)
             VALUES (%(aid)s, %(gid)s, %(sym)s, %(ts)s, %(side)s, %(qty)s, %(price)s, 'ORDER', %(status)s, %(uid)s)
-            RETURNING id
+            RETURNING id, account_id, ticker, side, qty, price, status
             """,
             {
                 "aid": account_id,
@@ -165,7 +139,10 @@ def create_order(account_id: int):
                 "uid": user_id,
             },
         )
-        order_id = cur.fetchone()["id"]
+        order = cur.fetchone()
+        order_id = order["id"]
+        events = OrderEventBatch()
+        events.add("created", order, order["status"], user_id)
 
         # Auto-approve and fill simple MARKET orders
         if not needs_approval and kind == "MARKET":
@@ -173,6 +150,7 @@ def create_order(account_id: int):
                 "UPDATE transactions SET status = 'FILLED', approved_by = %(uid)s WHERE id = %(id)s",
                 {"id": order_id, "uid": user_id},
             )
+            events.add("filled", order, "FILLED", user_id, price=mkt_px)
             _insert_fill(
                 cur,
                 account_id=account_id,
@@ -184,6 +162,7 @@ def create_order(account_id: int):
                 approved_by=user_id,
                 group_id=int(group_id) if group_id is not None else None,
             )
+        events.flush(cur)
 
         cur.execute(
             """
@@ -195,7 +174,8 @@ def create_order(account_id: int):
             {"id": order_id},
         )
         created = cur.fetchone()
-    created = _iso_time(dict(created))
+    if created["status"] == "FILLED":
+        risk_engine.on_fill(account_id, symbol)
     return jsonify(created), 201
 
 
@@ -224,9 +204,12 @@ def cancel_order(order_id: int):
             {"id": order_id},
         )
         res = cur.fetchone()
+        if res:
+            events = OrderEventBatch()
+            events.add("canceled", res, "CANCELED", user_id)
+            events.flush(cur)
     if not res:
         return jsonify({"error": "cannot cancel"}), 400
-    res = _iso_time(dict(res))
     return jsonify(res)
 
 
@@ -243,9 +226,13 @@ def approve_order(order_id: int):
         return jsonify({"error": "forbidden"}), 403
 
     mkt_px = _latest_price(row["ticker"]) or float(row["price"])
-    with get_conn_cursor(True, isolation_level="REPEATABLE READ") as (_, cur):
+
+    def _approve(cur):
         # Lock the order row to prevent concurrent approvals
-        cur.execute("SELECT id FROM transactions WHERE id = %(id)s AND kind = 'ORDER' FOR UPDATE", {"id": order_id})
+        cur.execute("SELECT status FROM transactions WHERE id = %(id)s AND kind = 'ORDER' FOR UPDATE", {"id": order_id})
+        locked = cur.fetchone()
+        if not locked or locked["status"] not in ("NEW", "PENDING_APPROVAL"):
+            return False
         # Approve
         cur.execute(
             "UPDATE transactions SET status = 'APPROVED', approved_by = %(uid)s WHERE id = %(id)s",
@@ -264,18 +251,141 @@ def approve_order(order_id: int):
             group_id=row.get("group_id"),
         )
         cur.execute("UPDATE transactions SET status = 'FILLED' WHERE id = %(id)s", {"id": order_id})
+        events = OrderEventBatch()
+        events.add("approved", row, "APPROVED", user_id)
+        events.add("filled", row, "FILLED", user_id, price=mkt_px)
+        events.flush(cur)
+        return True
+
+    if not run_in_transaction(_approve, isolation_level="REPEATABLE READ"):
+        return jsonify({"error": "order no longer pending"}), 409
+    risk_engine.on_fill(row["account_id"], row["ticker"])
     return jsonify({"ok": True})
 
 
+@bp.post("/approvals/claim")
+@jwt_required()
+def claim_approvals():
+    """Work-queue approval: claim up to `limit` open orders in accounts the caller
+    manages and process them in one transaction. Rows another manager is
+    already working on are skipped (SKIP LOCKED) instead of waited on.
+    action=approve takes PENDING_APPROVAL orders (approve + fill);
+    action=fill takes already APPROVED orders (fill only).
+    """
+    ident = get_jwt_identity() or {}
+    user_id = ident.get("id")
+    data = request.get_json() or {}
+    action = (data.get("action") or "approve").lower()
+    if action not in ("approve", "fill"):
+        return jsonify({"error": "action must be approve or fill"}), 400
+    limit = max(1, min(int(data.get("limit") or 10), 100))
+    account_id = data.get("account_id")
+    params = {
+        "uid": user_id,
+        "lim": limit,
+        "status": "PENDING_APPROVAL" if action == "approve" else "APPROVED",
+        "aid": int(account_id) if account_id else None,
+    }
+
+    def _claim(cur):
+        cur.execute(
+            """
+            SELECT t.id, t.account_id, t.group_id, t.ticker, t.side,
+                   t.qty::float8 AS qty, t.price::float8 AS price, t.requested_by
+            FROM transactions t
+            WHERE t.kind = 'ORDER'
+              AND t.status = %(status)s
+              AND (%(aid)s::int IS NULL OR t.account_id = %(aid)s::int)
+              AND t.account_id IN (
+                SELECT am.account_id FROM account_memberships am
+                WHERE am.user_id = %(uid)s AND am.role IN ('owner','manager')
+              )
+            ORDER BY t.time
+            LIMIT %(lim)s
+            FOR UPDATE OF t SKIP LOCKED
+            """,
+            params,
+        )
+        orders = cur.fetchall()
+        if not orders:
+            return []
+        cur.execute(
+            """
+            SELECT k.ticker,
+                   (SELECT close::float8 FROM price_bars p WHERE p.ticker = k.ticker ORDER BY time DESC LIMIT 1) AS close
+            FROM unnest(%(syms)s::varchar[]) AS k(ticker)
+            """,
+            {"syms": list({o["ticker"] for o in orders})},
+        )
+        prices = {r["ticker"]: r["close"] for r in cur.fetchall()}
+        done = []
+        events = OrderEventBatch()
+        for o in orders:
+            px = prices.get(o["ticker"]) or o["price"]
+            if action == "approve":
+                cur.execute(
+                    "UPDATE transactions SET status = 'APPROVED', approved_by = %(uid)s WHERE id = %(id)s",
+                    {"id": o["id"], "uid": user_id},
+                )
+                events.add("approved", o, "APPROVED", user_id)
+            _insert_fill(
+                cur,
+                account_id=o["account_id"],
+                symbol=o["ticker"],
+                side=o["side"],
+                qty=o["qty"],
+                price=px,
+                requested_by=o["requested_by"],
+                approved_by=user_id,
+                group_id=o["group_id"],
+            )
+            cur.execute("UPDATE transactions SET status = 'FILLED' WHERE id = %(id)s", {"id": o["id"]})
+            events.add("filled", o, "FILLED", user_id, price=px)
+            done.append({"id": o["id"], "account_id": o["account_id"], "ticker": o["ticker"], "fill_price": px, "status": "FILLED"})
+        events.flush(cur)
+        return done
+
+    done = run_in_transaction(_claim)
+    for key in {(d["account_id"], d["ticker"]) for d in done}:
+        risk_engine.on_fill(*key)
+    return jsonify({"processed": done, "count": len(done)})
+
+
 @bp.post("/orders/<int:order_id>/process")
 @jwt_required()
 def process_order_endpoint(order_id: int):
     ident = get_jwt_identity() or {}
     user_id = ident.get("id")
+    order = db_query_one(
+        "SELECT account_id, ticker, side, qty::float8 AS qty, price::float8 AS price FROM transactions WHERE id = %(id)s AND kind = 'ORDER'",
+        {"id": order_id},
+    )
+    mkt_px = None
+    if order and is_owner_or_manager(user_id, order["account_id"]):
+        # Fast reject from cached state; re-checked from fresh reads under the lock below
+        mkt_px = _latest_price(order["ticker"]) or order["price"]
+        if risk_engine.evaluate(order["account_id"], order["ticker"], order["side"], order["qty"], mkt_px, tiers=("account",)):
+            return jsonify({"error": "order blocked by risk constraints"}), 400
     # Execute stored procedure within a transaction using REPEATABLE READ
     try:
         with get_conn_cursor(True, isolation_level="REPEATABLE READ") as (_, cur):
-            cur.execute("CALL process_order(%s, %s)", (order_id, user_id))
+            # Lock first so the status seen here is the one the procedure transitions from
+            cur.execute(
+                """
+                SELECT status, account_id, ticker, side, qty::float8 AS qty
+                FROM transactions WHERE id = %(id)s AND kind = 'ORDER' FOR UPDATE
+                """,
+                {"id": order_id},
+            )
+            before = cur.fetchone()
+            # The procedure only locks, authorizes and fills, so the account
+            # limits are enforced here against this transaction's view
+            if before and mkt_px is not None and risk_engine.evaluate(
+                before["account_id"], before["ticker"], before["side"], before["qty"], mkt_px,
+                tiers=("account",), cur=cur,
+            ):
+                return jsonify({"error": "order blocked by risk constraints"}), 400
+            cur.execute("CALL process_order(%s, %s, %s)", (order_id, user_id, mkt_px))
             # Return the updated order row
             cur.execute(
                 """
@@ -287,8 +397,14 @@ def process_order_endpoint(order_id: int):
                 {"id": order_id},
             )
             res = cur.fetchone()
-        if res and res.get("time"):
-            res["time"] = res["time"].isoformat()
+            if res and before and res["status"] == "FILLED":
+                events = OrderEventBatch()
+                if before["status"] != "APPROVED":
+                    events.add("approved", res, "APPROVED", user_id)
+                events.add("filled", res, "FILLED", user_id, price=mkt_px or res["price"])
+                events.flush(cur)
+        if res and order:
+            risk_engine.on_fill(order["account_id"], order["ticker"])
         return jsonify(res or {"error": "not found"}), (200 if res else 404)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -1,6 +1,10 @@
+from datetime import datetime
+
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..db import db_query, db_execute, db_execute_returning
+from ..db import db_query, db_execute, db_execute_returning, get_conn_cursor
+from ..services.snapshot import market_snapshots
+from .news import NEWS_COLUMNS
 
 bp = Blueprint("watchlist", __name__)
 
@@ -25,6 +29,19 @@ def list_watchlist():
     return jsonify(rows)
 
 
+@bp.get("/snapshot")
+@jwt_required()
+def watchlist_snapshot():
+    """Market snapshot (see /api/market/snapshot) for every ticker on the watchlist."""
+    ident = get_jwt_identity() or {}
+    uid = ident.get("id")
+    rows = db_query(
+        "SELECT ticker FROM user_watchlist WHERE user_id = %(uid)s ORDER BY added_at DESC",
+        {"uid": uid},
+    )
+    return jsonify(market_snapshots.get([r["ticker"] for r in rows]))
+
+
 @bp.post("")
 @jwt_required()
 def add_watch():
@@ -65,6 +82,36 @@ def delete_watch(symbol: str):
     return jsonify({"deleted": rc > 0})
 
 
+# Read state = explicit exception row if any, else "published at or before the
+# user's high-water mark"; the mark is one row per user, so this is a compare.
+_READ_MARK_CTE = """
+rs AS (
+  SELECT COALESCE(max(read_through_at), '-infinity'::timestamptz) AS t
+  FROM user_news_read_state WHERE user_id = %(uid)s
+)
+"""
+
+
+def _news_feed_sql(sentiment: bool, unread: bool) -> str:
+    clauses = ["EXISTS (SELECT 1 FROM user_watchlist w WHERE w.user_id = %(uid)s AND w.ticker = m.ticker)"]
+    if sentiment:
+        clauses.append("n.sentiment = %(sent)s")
+    if unread:
+        clauses.append("NOT COALESCE(f.is_read, n.published_at <= rs.t)")
+    return f"""
+        WITH {_READ_MARK_CTE}
+        SELECT {NEWS_COLUMNS}, m.ticker,
+               COALESCE(f.is_read, n.published_at <= rs.t) AS is_read,
+               f.seen_at
+        FROM rs, news_articles n
+        JOIN news_ticker_map m ON m.article_id = n.id
+        LEFT JOIN users_news_feed f ON f.article_id = n.id AND f.user_id = %(uid)s
+        WHERE {" AND ".join(clauses)}
+        ORDER BY n.published_at DESC
+        LIMIT %(lim)s
+    """
+
+
 @bp.get("/news/feed")
 @jwt_required()
 def news_feed():
@@ -72,53 +119,95 @@ def news_feed():
     uid = ident.get("id")
     sentiment = request.args.get("sentiment")
     limit = int(request.args.get("limit", 50))
-    clauses = ["EXISTS (SELECT 1 FROM user_watchlist w WHERE w.user_id = %(uid)s AND w.ticker = m.ticker)"]
     params = {"uid": uid, "lim": limit}
     if sentiment:
-        clauses.append("n.sentiment = %(sent)s")
         params["sent"] = sentiment
-    where_sql = " AND ".join(clauses)
-    rows = db_query(
-        f"""
-        SELECT n.*, m.ticker,
-               COALESCE(f.is_read, false) AS is_read,
-               f.seen_at
-        FROM news_articles n
-        JOIN news_ticker_map m ON m.article_id = n.id
-        LEFT JOIN users_news_feed f ON f.article_id = n.id AND f.user_id = %(uid)s
-        WHERE {where_sql}
-        ORDER BY n.published_at DESC
-        LIMIT %(lim)s
-        """,
-        params,
-    )
-    out = []
-    for r in rows:
-        if r.get("impact_tags"):
-            r["impact_tags"] = r["impact_tags"].split(",")
-        if r.get("published_at"):
-            r["published_at"] = r["published_at"].isoformat()
-        if r.get("seen_at"):
-            r["seen_at"] = r["seen_at"].isoformat()
-        out.append(r)
-    return jsonify(out)
+    unread = request.args.get("unread") in ("1", "true")
+    # On the primary: read state must reflect the user's own mark-read just made
+    rows = db_query(_news_feed_sql(bool(sentiment), unread), params)
+    return jsonify(rows)
+
+
+# Set explicit read/unread state for specific articles: an exception row is
+# kept only where it differs from what the high-water mark implies.
+_MARK_ARTICLES_SQL = f"""
+WITH {_READ_MARK_CTE},
+arts AS (
+  SELECT n.id, n.published_at <= rs.t AS covered
+  FROM rs, news_articles n
+  WHERE n.id = ANY(%(ids)s)
+),
+dropped AS (
+  DELETE FROM users_news_feed f
+  USING arts a
+  WHERE f.user_id = %(uid)s AND f.article_id = a.id AND a.covered = %(read)s
+)
+INSERT INTO users_news_feed (user_id, article_id, seen_at, is_read)
+SELECT %(uid)s, a.id, now(), %(read)s FROM arts a WHERE a.covered <> %(read)s
+ON CONFLICT (user_id, article_id) DO UPDATE SET is_read = EXCLUDED.is_read, seen_at = EXCLUDED.seen_at
+"""
 
 
 @bp.post("/news/mark-read")
 @jwt_required()
 def mark_read():
+    """Body: {"article_id": id} or {"article_ids": [...]} (optional "read": false to
+    mark unread), or {"through": iso-time | "through_article_id": id | "all": true}
+    to advance the read high-water mark."""
     ident = get_jwt_identity() or {}
     uid = ident.get("id")
     data = request.get_json() or {}
-    article_id = data.get("article_id")
-    if not article_id:
-        return jsonify({"error": "article_id required"}), 400
-    db_execute(
-        """
-        INSERT INTO users_news_feed (user_id, article_id, seen_at, is_read)
-        VALUES (%(uid)s, %(aid)s, now(), true)
-        ON CONFLICT (user_id, article_id) DO UPDATE SET is_read = EXCLUDED.is_read, seen_at = EXCLUDED.seen_at
-        """,
-        {"uid": uid, "aid": int(article_id)},
-    )
+
+    if data.get("all") or data.get("through") or data.get("through_article_id"):
+        params = {"uid": uid}
+        if data.get("through_article_id"):
+            through_sql = "(SELECT published_at FROM news_articles WHERE id = %(aid)s)"
+            params["aid"] = int(data["through_article_id"])
+        elif data.get("through"):
+            try:
+                params["t"] = datetime.fromisoformat(str(data["through"]).replace("Z", "+00:00"))
+            except ValueError:
+                return jsonify({"error": "through must be an ISO timestamp"}), 400
+            through_sql = "%(t)s::timestamptz"
+        else:
+            through_sql = "now()"
+        with get_conn_cursor(True) as (_, cur):
+            cur.execute(
+                f"""
+                INSERT INTO user_news_read_state (user_id, read_through_at)
+                -- Never past now: a future mark would hide articles not yet published
+                SELECT %(uid)s, LEAST(x.t, now()) FROM (SELECT {through_sql} AS t) x WHERE x.t IS NOT NULL
+                ON CONFLICT (user_id) DO UPDATE
+                  SET read_through_at = GREATEST(user_news_read_state.read_through_at, EXCLUDED.read_through_at),
+                      updated_at = now()
+                RETURNING read_through_at
+                """,
+                params,
+            )
+            row = cur.fetchone()
+            if not row:
+                return jsonify({"error": "article not found"}), 404
+            # Exceptions at or before the mark are now redundant
+            cur.execute(
+                """
+                DELETE FROM users_news_feed f
+                USING news_articles n
+                WHERE f.user_id = %(uid)s AND n.id = f.article_id AND n.published_at <= %(t)s
+                """,
+                {"uid": uid, "t": row["read_through_at"]},
+            )
+            pruned = cur.rowcount
+        return jsonify({"ok": True, "read_through_at": row["read_through_at"], "pruned": pruned})
+
+    ids = data.get("article_ids") or ([data["article_id"]] if data.get("article_id") else [])
+    if not ids:
+        return jsonify({"error": "article_id, article_ids or through required"}), 400
+    try:
+        ids = [int(i) for i in ids][:1000]
+    except (TypeError, ValueError):
+        return jsonify({"error": "article ids must be integers"}), 400
+    read = data.get("read", True)
+    if not isinstance(read, bool):
+        return jsonify({"error": "read must be true or false"}), 400
+    db_execute(_MARK_ARTICLES_SQL, {"uid": uid, "ids": ids, "read": read})
     return jsonify({"ok": True})
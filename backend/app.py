@@ -1,23 +1,60 @@
+import time
+
+_imports_started = time.perf_counter()
+
+import importlib
 import os
+import sys
+import click
 from flask import Flask, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
 
 from .config import Config
-from .extensions import bcrypt, jwt
+from .extensions import bcrypt, jwt, hasher
 from .db import run_sql_script
+from .json_provider import FastJSONProvider
+from .startup import ROLES, StartupProfile, detect_role
+
+_imports_ms = (time.perf_counter() - _imports_started) * 1000
+
+# Blueprint modules under api/ and their URL prefixes
+BLUEPRINTS = [
+    ("auth", "/api/auth"),
+    ("accounts", "/api/accounts"),
+    ("market", "/api/market"),
+    ("news", "/api/news"),
+    ("transactions", "/api"),
+    ("metrics", "/api/metrics"),
+    ("watchlist", "/api/watchlist"),
+    ("exports", "/api/exports"),
+    ("groups", "/api/groups"),
+]
 
 
-def create_app() -> Flask:
+def create_app(role: str = None) -> Flask:
+    """Build the app. `role` (default: APP_ROLE or inferred, see startup.py)
+    decides whether this process runs background jobs and the tick listener."""
     # Load env from backend/.env to work when running from project root
     env_path = os.path.join(os.path.dirname(__file__), ".env")
     load_dotenv(env_path)
-    app = Flask(__name__)
-    app.config.from_object(Config)
+    role = role or detect_role()
+    run_jobs, run_listener = ROLES[role]
+    profile = StartupProfile(role)
+    profile.add("core imports", _imports_ms)
 
-    # Extensions (bcrypt, jwt)
-    bcrypt.init_app(app)
-    jwt.init_app(app)
+    with profile.step("flask + extensions"):
+        app = Flask(__name__)
+        app.config.from_object(Config)
+        app.config["APP_ROLE"] = role
+        app.extensions["startup_profile"] = profile
+        # Serializes datetimes/Decimals natively so endpoints can skip per-row conversion
+        app.json = FastJSONProvider(app)
+
+        # Extensions (bcrypt, jwt, password hashing pool)
+        bcrypt.init_app(app)
+        jwt.init_app(app)
+        hasher.init_app(app)
 
     # CORS
     origins_env = app.config.get("CORS_ORIGINS", "*")
@@ -37,36 +74,131 @@ def create_app() -> Flask:
         },
     )
 
-    # Register API blueprints
-    from .api.auth import bp as auth_bp
-    from .api.accounts import bp as accounts_bp
-    from .api.market import bp as market_bp
-    from .api.news import bp as news_bp
-    from .api.transactions import bp as tx_bp
-    from .api.metrics import bp as metrics_bp
-    from .api.watchlist import bp as watchlist_bp
-    from .api.exports import bp as exports_bp
-    from .api.groups import bp as groups_bp
-
-    app.register_blueprint(auth_bp, url_prefix="/api/auth")
-    app.register_blueprint(accounts_bp, url_prefix="/api/accounts")
-    app.register_blueprint(market_bp, url_prefix="/api/market")
-    app.register_blueprint(news_bp, url_prefix="/api/news")
-    app.register_blueprint(tx_bp, url_prefix="/api")
-    app.register_blueprint(metrics_bp, url_prefix="/api/metrics")
-    app.register_blueprint(watchlist_bp, url_prefix="/api/watchlist")
-    app.register_blueprint(exports_bp, url_prefix="/api/exports")
-    app.register_blueprint(groups_bp, url_prefix="/api/groups")
-
-    # Start background price simulator so prices advance continuously for all users
-    from .api.market import start_simulator
-    start_simulator(app)
+    # Register API blueprints. Modules keep NumPy-backed services (indicators,
+    # risk analytics) out of their imports until a request needs them.
+    for name, prefix in BLUEPRINTS:
+        with profile.step(f"blueprint {name}"):
+            app.register_blueprint(importlib.import_module(f".api.{name}", __package__).bp, url_prefix=prefix)
+
+    # Per-client token buckets by endpoint class, and shedding of reads under pool pressure
+    with profile.step("rate limits"):
+        from .rate_limit import init_rate_limits
+        init_rate_limits(app)
+
+    # Background jobs (price simulator, leaderboard refresh, snapshots, retention).
+    # Each job runs in exactly one process across workers via Postgres advisory locks.
+    if run_jobs:
+        with profile.step("jobs"):
+            from .services.jobs import start_jobs
+            start_jobs(app)
+
+    # Cross-process price fan-out: apply ticks NOTIFYed by whichever worker produced them
+    if run_listener and os.getenv("TICK_LISTENER_DISABLED") != "1":
+        with profile.step("tick listener"):
+            from .services.ticks import listener
+            from .services.risk import risk_engine, INVALIDATE_CHANNEL
+            from .services.snapshot import market_snapshots
+            from .response_cache import response_cache, INVALIDATE_CHANNEL as CACHE_CHANNEL
+            listener.subscribe(market_snapshots.on_bar)
+            listener.on(INVALIDATE_CHANNEL, risk_engine.handle_notification)
+            listener.on(CACHE_CHANNEL, response_cache.handle_notification)
+            listener.start()
 
     @app.get("/api/health")
     def health():
         return jsonify({"status": "ok"})
 
+    @app.get("/api/health/jobs")
+    def health_jobs():
+        from .services.jobs import runner
+
+        return jsonify(runner.stats())
+
+    @app.get("/api/health/cache")
+    def health_cache():
+        from .response_cache import response_cache
+
+        return jsonify(response_cache.summary())
+
+    @app.get("/api/health/limits")
+    def health_limits():
+        from .rate_limit import rate_limiter
+
+        return jsonify(rate_limiter.summary())
+
     # CLI helpers
+    @app.cli.command("worker")
+    def worker_cmd():
+        """Run the background jobs (simulator, leaderboard, snapshots, retention) until interrupted."""
+        from .services.jobs import runner
+
+        if not runner.jobs:
+            raise SystemExit("No jobs registered (JOBS_DISABLED=1, or APP_ROLE is not worker/all)")
+        print(f"Running jobs: {', '.join(runner.jobs)}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            runner.stop()
+
+    @app.cli.command("check-sentiment-rollup")
+    def check_sentiment_rollup_cmd():
+        """Verify news_sentiment_rollup counts new (incl. title-mapped) articles and matches a recount."""
+        from .services.sentiment import check_rollups
+
+        problems = check_rollups()
+        for msg in problems:
+            print(f"FAIL {msg}")
+        if problems:
+            raise SystemExit(1)
+        print("ok   news_sentiment_rollup")
+
+    @app.cli.command("simulate")
+    @click.option("--seed", default=None, help="Seed for reproducible runs (default SIM_SEED, else random)")
+    @click.option("--ticks", default=100, help="Ticks to run")
+    @click.option("--rate", default=1.0, help="Ticks per second (0 = as fast as possible)")
+    @click.option("--symbols", default="", help="Comma-separated tickers (default: first 50)")
+    @click.option("--scenario", type=click.Choice(["crash", "rally"]), default=None, help="Built-in scenario to play")
+    @click.option("--replay", default=None, help="Replay this ticker's recorded returns between --start and --end")
+    @click.option("--start", type=click.DateTime(), default=None)
+    @click.option("--end", type=click.DateTime(), default=None)
+    @click.option("--speed", default=1, help="Scenario steps per tick")
+    @click.option("--dry-run", is_flag=True, help="Generate bars without writing them")
+    def simulate_cmd(seed, ticks, rate, symbols, scenario, replay, start, end, speed, dry_run):
+        """Drive the price simulator at a controlled tick rate, optionally through a scenario."""
+        from .db import db_query
+        from .services.simulator import Simulator, recorded_scenario
+
+        sim = Simulator(seed or os.getenv("SIM_SEED") or None)
+        syms = [s.strip().upper() for s in symbols.split(",") if s.strip()] or [
+            r["symbol"] for r in db_query("SELECT symbol FROM tickers ORDER BY symbol LIMIT 50")
+        ]
+        if replay:
+            if not (start and end):
+                raise SystemExit("--replay needs --start and --end")
+            steps = recorded_scenario(replay, start, end)
+            if not steps:
+                raise SystemExit(f"no bars for {replay} in that window")
+            sim.play(steps, speed)
+        elif scenario:
+            sim.play(scenario, speed)
+        interval = 1.0 / rate if rate > 0 else 0.0
+        started = time.perf_counter()
+        bars = []
+        for i in range(ticks):
+            bars = sim.next_bars(syms) if dry_run else sim.tick(syms)
+            if interval:
+                time.sleep(max(0.0, started + (i + 1) * interval - time.perf_counter()))
+        elapsed = time.perf_counter() - started
+        print(f"{ticks} ticks x {len(syms)} tickers in {elapsed:.2f}s ({ticks / elapsed:.1f} ticks/s)")
+        for b in bars:
+            print(f"  {b['ticker']:8} {b['close']:12.2f}")
+
+    @app.cli.command("startup-profile")
+    def startup_profile_cmd():
+        """Show how long this process spent building the app, per component."""
+        print(app.extensions["startup_profile"].report())
+
     @app.cli.command("create-db")
     def create_db():
         """Create all core tables using raw SQL."""
@@ -89,6 +221,37 @@ def create_app() -> Flask:
             run_sql_script(f.read())
         print("Applied schema.")
 
+    @app.cli.command("migrate")
+    @click.option("--dry-run", is_flag=True, help="List pending steps without running them")
+    @click.option("--lock-timeout", default=None, help="lock_timeout for transactional steps (default MIGRATION_LOCK_TIMEOUT or 3s)")
+    def migrate_cmd(dry_run, lock_timeout):
+        """Apply pending files from db/migrations, timing each step."""
+        from .migrations import migrate
+
+        def report(r):
+            ms = "" if r.ms is None else f"{r.ms:10.1f} ms"
+            print(f"{r.version:32} {r.index:>3} {r.kind:10} {ms:>13}  {r.summary}")
+
+        applied = migrate(dry_run=dry_run, lock_timeout=lock_timeout, on_step=report)
+        verb = "Pending" if dry_run else "Applied"
+        print(f"{verb}: {', '.join(applied) if applied else 'nothing'}")
+
+    @app.cli.command("migrate-status")
+    def migrate_status_cmd():
+        """List migration files and whether each has been applied."""
+        from .db import db_query
+        from .migrations import discover, pending
+
+        todo = {v for v, _ in pending()}
+        done = {r["version"]: r for r in db_query("SELECT version, applied_at, duration_ms FROM schema_migrations")}
+        for version, _ in discover():
+            r = done.get(version)
+            if version in todo or r is None:
+                print(f"{version:32} pending")
+            else:
+                ms = f"{r['duration_ms']:.0f} ms" if r["duration_ms"] is not None else ""
+                print(f"{version:32} applied {r['applied_at']:%Y-%m-%d %H:%M} {ms}")
+
     @app.cli.command("seed")
     def seed():
         from .db_seed import run_seed
@@ -96,6 +259,42 @@ def create_app() -> Flask:
         run_seed()
         print("Seed completed.")
 
+    @app.cli.command("bench-prepared")
+    @click.option("--n", default=2000, help="Calls per statement")
+    def bench_prepared_cmd(n):
+        """Compare plain SQL vs prepared statements on the hot paths."""
+        from .bench import bench_prepared
+
+        print(f"{'statement':32} {'plain us':>10} {'prepared us':>12} {'saved':>7}")
+        for name, adhoc, prep in bench_prepared(n):
+            print(f"{name:32} {adhoc:10.1f} {prep:12.1f} {(1 - prep / adhoc) * 100:6.1f}%")
+
+    @app.cli.command("bench-risk")
+    @click.option("--n", default=200_000, help="Checks to evaluate")
+    def bench_risk_cmd(n):
+        """Micro-benchmark the in-process risk engine."""
+        from .bench import bench_risk
+
+        per_sec, us = bench_risk(n)
+        print(f"{per_sec:,.0f} checks/sec ({us:.2f} us/check)")
+
+    @app.cli.command("check-query-plans")
+    @click.option("--scale", default=1.0, help="Multiplier for the synthetic dataset size")
+    def check_query_plans_cmd(scale):
+        """EXPLAIN the hot queries on synthetic data; fail on sequential scans."""
+        from .query_plans import check_query_plans
+
+        failed = 0
+        for r in check_query_plans(scale):
+            failed += not r["ok"]
+            print(f"{'ok  ' if r['ok'] else 'FAIL'} {r['name']}")
+            for node, rel, index in r["scans"]:
+                print(f"       {node} on {rel}{' using ' + index if index else ''}")
+        if failed:
+            raise SystemExit(f"{failed} hot queries lost their index")
+
+    if os.getenv("STARTUP_PROFILE") == "1":
+        print(profile.report(), file=sys.stderr)
     return app
 
 
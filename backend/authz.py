@@ -1,64 +1,66 @@
 from typing import Optional
-from .db import db_query_one
+from .db import db_query_one_prepared, prepared
+
+# Hot on every request that touches an account or group, so prepared per connection
+_IS_OWNER_OR_MANAGER = prepared(
+    "authz_owner_or_manager",
+    """
+    SELECT 1
+    FROM account_memberships
+    WHERE user_id = $1 AND account_id = $2 AND role IN ('owner','manager')
+    LIMIT 1
+    """,
+)
+_IS_GROUP_MEMBER = prepared(
+    "authz_group_member",
+    """
+    SELECT 1 FROM group_memberships
+    WHERE user_id = $1 AND group_id = $2
+    LIMIT 1
+    """,
+)
+_IS_GROUP_OWNER_OR_MANAGER = prepared(
+    "authz_group_owner_or_manager",
+    """
+    SELECT 1 FROM group_memberships
+    WHERE user_id = $1 AND group_id = $2 AND role IN ('owner','manager')
+    LIMIT 1
+    """,
+)
+_IS_TRADER_OR_HIGHER = prepared(
+    "authz_trader_or_higher",
+    """
+    SELECT 1
+    FROM account_memberships
+    WHERE user_id = $1 AND account_id = $2 AND role IN ('owner','manager','trader')
+    LIMIT 1
+    """,
+)
+_IS_MEMBER = prepared(
+    "authz_member",
+    """
+    SELECT 1 FROM account_memberships
+    WHERE user_id = $1 AND account_id = $2
+    LIMIT 1
+    """,
+)
 
 
 def is_owner_or_manager(user_id: int, account_id: int) -> bool:
-    row = db_query_one(
-        """
-        SELECT 1
-        FROM account_memberships
-        WHERE user_id = %(uid)s AND account_id = %(aid)s AND role IN ('owner','manager')
-        LIMIT 1
-        """,
-        {"uid": user_id, "aid": account_id},
-    )
-    return bool(row)
+    return bool(db_query_one_prepared(_IS_OWNER_OR_MANAGER, (user_id, account_id)))
 
 
 def is_group_member(user_id: int, group_id: int) -> bool:
-    row = db_query_one(
-        """
-        SELECT 1 FROM group_memberships
-        WHERE user_id = %(uid)s AND group_id = %(gid)s
-        LIMIT 1
-        """,
-        {"uid": user_id, "gid": group_id},
-    )
-    return bool(row)
+    return bool(db_query_one_prepared(_IS_GROUP_MEMBER, (user_id, group_id)))
 
 
 def is_group_owner_or_manager(user_id: int, group_id: int) -> bool:
-    row = db_query_one(
-        """
-        SELECT 1 FROM group_memberships
-        WHERE user_id = %(uid)s AND group_id = %(gid)s AND role IN ('owner','manager')
-        LIMIT 1
-        """,
-        {"uid": user_id, "gid": group_id},
-    )
-    return bool(row)
+    return bool(db_query_one_prepared(_IS_GROUP_OWNER_OR_MANAGER, (user_id, group_id)))
 
 
 def is_trader_or_higher(user_id: int, account_id: int) -> bool:
-    row = db_query_one(
-        """
-        SELECT 1
-        FROM account_memberships
-        WHERE user_id = %(uid)s AND account_id = %(aid)s AND role IN ('owner','manager','trader')
-        LIMIT 1
-        """,
-        {"uid": user_id, "aid": account_id},
-    )
-    return bool(row)
+    return bool(db_query_one_prepared(_IS_TRADER_OR_HIGHER, (user_id, account_id)))
 
 
 def is_member(user_id: int, account_id: int) -> bool:
-    row = db_query_one(
-        """
-        SELECT 1 FROM account_memberships
-        WHERE user_id = %(uid)s AND account_id = %(aid)s
-        LIMIT 1
-        """,
-        {"uid": user_id, "aid": account_id},
-    )
-    return bool(row)
+    return bool(db_query_one_prepared(_IS_MEMBER, (user_id, account_id)))
@@ -0,0 +1,61 @@
+"""Micro-benchmarks run against the configured database (see `flask bench-*`)."""
+import re
+import time
+
+from .db import PREPARED_STATEMENTS, db_query_one, db_query_one_prepared
+
+
+def _timed(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def bench_prepared(n: int = 2000):
+    """Per-call latency of the hot statements sent as plain SQL vs EXECUTE of a
+    prepared statement. Returns rows of (name, adhoc_us, prepared_us)."""
+    # Importing registers the statements
+    from . import authz  # noqa: F401
+    from .api import transactions  # noqa: F401
+    from .services import risk  # noqa: F401
+
+    sample = db_query_one(
+        """
+        SELECT am.user_id, am.account_id, p.ticker
+        FROM account_memberships am
+        CROSS JOIN LATERAL (SELECT ticker FROM price_bars LIMIT 1) p
+        LIMIT 1
+        """
+    )
+    if not sample:
+        raise RuntimeError("seed the database first (flask seed)")
+    args_for = {
+        "tx_latest_price": (sample["ticker"],),
+        "risk_net_position": (sample["account_id"], sample["ticker"]),
+        "risk_account_limits": (sample["account_id"],),
+    }
+    results = []
+    for name, sql in PREPARED_STATEMENTS.items():
+        args = args_for.get(name, (sample["user_id"], sample["account_id"]))
+        adhoc_sql = re.sub(r"\$\d+", "%s", sql)
+        db_query_one_prepared(name, args)  # warm: prepare on this connection
+        adhoc = _timed(lambda: db_query_one(adhoc_sql, args), n)
+        prep = _timed(lambda: db_query_one_prepared(name, args), n)
+        results.append((name, adhoc, prep))
+    return results
+
+
+def bench_risk(n: int = 200_000, positions: int = 100):
+    """Risk checks/sec against warm in-memory state (no DB round trips)."""
+    from .services.risk import RiskEngine, RULES
+
+    engine = RiskEngine(list(RULES))
+    syms = [f"SYM{i}" for i in range(positions)]
+    engine.prime(1, {"max_order_notional": 50_000.0, "max_position_abs_qty": 5_000.0, "earnings_lockout": False},
+                 {s: float(i) for i, s in enumerate(syms)})
+    start = time.perf_counter()
+    for i in range(n):
+        engine.evaluate(1, syms[i % positions], "BUY" if i & 1 else "SELL", 10.0, 101.5)
+    elapsed = time.perf_counter() - start
+    return n / elapsed, elapsed / n * 1e6
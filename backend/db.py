@@ -1,11 +1,59 @@
 import os
+import random
+import threading
+import time
+import weakref
 from contextlib import contextmanager
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 import psycopg2
+import psycopg2.errors
 from psycopg2 import pool
 from psycopg2.extras import RealDictCursor
 
 _pool: Optional[pool.SimpleConnectionPool] = None
+_replica_pool: Optional[pool.SimpleConnectionPool] = None
+
+class PoolPressure:
+    """Checkout latency of the primary pool as a time-decayed moving average,
+    plus its in-use share; read by the load shedder (rate_limit.py). A checkout
+    that fails because the pool is exhausted counts as EXHAUSTED_WAIT_MS."""
+
+    EXHAUSTED_WAIT_MS = 1000.0
+
+    def __init__(self, alpha: float = 0.2, half_life: float = 2.0):
+        self.alpha = alpha
+        self.half_life = half_life
+        self._wait_ms = 0.0
+        self._at = time.monotonic()
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def observe(self, ms: float):
+        with self._lock:
+            self._wait_ms = self._decayed() * (1 - self.alpha) + ms * self.alpha
+            self._at = time.monotonic()
+
+    def _decayed(self) -> float:
+        # Idle periods pull the average back down, so shedding can't keep it pinned
+        return self._wait_ms * 0.5 ** ((time.monotonic() - self._at) / self.half_life)
+
+    @property
+    def wait_ms(self) -> float:
+        with self._lock:
+            return self._decayed()
+
+    @staticmethod
+    def utilization() -> float:
+        if _pool is None:
+            return 0.0
+        return len(_pool._used) / _pool.maxconn
+
+
+pool_pressure = PoolPressure()
+
+# Replica health, refreshed at most every REPLICA_LAG_CHECK_SECONDS
+_replica_state = {"checked_at": 0.0, "usable": False, "lag": None}
+_replica_lock = threading.Lock()
 
 
 def _normalize_dsn(url: str) -> str:
@@ -26,38 +74,246 @@ def get_pool() -> pool.SimpleConnectionPool:
     return _pool
 
 
-@contextmanager
-def get_conn_cursor(dict_cursor: bool = True, isolation_level: Optional[str] = None):
-    p = get_pool()
+def get_replica_pool() -> Optional[pool.SimpleConnectionPool]:
+    """Pool for DATABASE_REPLICA_URL, or None when no replica is configured."""
+    global _replica_pool
+    if _replica_pool is None:
+        dsn = os.getenv("DATABASE_REPLICA_URL")
+        if not dsn:
+            return None
+        _replica_pool = psycopg2.pool.SimpleConnectionPool(1, 10, dsn=_normalize_dsn(dsn))
+    return _replica_pool
+
+
+def _measure_replica_lag(p: pool.SimpleConnectionPool) -> float:
     conn = p.getconn()
+    try:
+        with conn.cursor() as cur:
+            # Caught-up standbys report 0 even when the primary has been idle;
+            # a non-standby stand-in (pg_is_in_recovery() = false) is always 0.
+            cur.execute(
+                """
+                SELECT CASE
+                  WHEN NOT pg_is_in_recovery() THEN 0
+                  WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                  ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                END::float8
+                """
+            )
+            lag = cur.fetchone()[0]
+        conn.rollback()
+        return float(lag)
+    finally:
+        p.putconn(conn)
+
+
+def replica_usable() -> bool:
+    """True when a replica is configured, reachable and within REPLICA_MAX_LAG_SECONDS."""
+    if not os.getenv("DATABASE_REPLICA_URL"):
+        return False
+    ttl = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "5"))
+    now = time.monotonic()
+    with _replica_lock:
+        if now - _replica_state["checked_at"] < ttl:
+            return _replica_state["usable"]
+        _replica_state["checked_at"] = now
+    try:
+        # The pool connects eagerly, so creating it is part of the check
+        lag = _measure_replica_lag(get_replica_pool())
+        usable = lag <= float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+    except psycopg2.Error:
+        lag, usable = None, False
+    with _replica_lock:
+        _replica_state.update(usable=usable, lag=lag)
+    return usable
+
+
+def _mark_replica_down():
+    # Route reads to the primary until the next health check
+    with _replica_lock:
+        _replica_state.update(checked_at=time.monotonic(), usable=False, lag=None)
+
+
+def _replica_conn():
+    """(pool, connection) on the replica, or None when it isn't usable right now."""
+    if not replica_usable():
+        return None
+    p = get_replica_pool()
+    try:
+        return p, p.getconn()
+    except psycopg2.Error:
+        _mark_replica_down()
+        return None
+
+
+def _primary_conn():
+    p = get_pool()
+    started = time.perf_counter()
+    try:
+        conn = p.getconn()
+    except pool.PoolError:
+        pool_pressure.exhausted += 1
+        pool_pressure.observe(PoolPressure.EXHAUSTED_WAIT_MS)
+        raise
+    pool_pressure.observe((time.perf_counter() - started) * 1000)
+    return p, conn
+
+
+@contextmanager
+def _cursor(p: pool.SimpleConnectionPool, conn, dict_cursor: bool, isolation_level: Optional[str] = None):
     try:
         cur = conn.cursor(cursor_factory=RealDictCursor if dict_cursor else None)
+    except Exception:
+        p.putconn(conn, close=True)
+        raise
+    try:
         if isolation_level:
             cur.execute(f"SET LOCAL TRANSACTION ISOLATION LEVEL {isolation_level}")
         yield conn, cur
         conn.commit()
     except Exception:
-        conn.rollback()
+        if not conn.closed:
+            conn.rollback()
         raise
     finally:
         cur.close()
-        p.putconn(conn)
+        # A connection the server dropped is discarded rather than pooled
+        p.putconn(conn, close=bool(conn.closed))
+
+
+@contextmanager
+def get_conn_cursor(dict_cursor: bool = True, isolation_level: Optional[str] = None, readonly: bool = False):
+    # readonly=True routes to the replica when it is healthy, else to the primary
+    p, conn = (_replica_conn() if readonly else None) or _primary_conn()
+    with _cursor(p, conn, dict_cursor, isolation_level) as pair:
+        yield pair
+
+
+def run_readonly(fn: Callable[[Any], Any], dict_cursor: bool = True):
+    """Run the read fn(cur) on the replica when it is healthy. If it fails
+    there (dropped connection, recovery conflict, ...) fn is run again on the
+    primary, and a dropped connection marks the replica unusable until the
+    next health check. fn must be safe to re-run."""
+    got = _replica_conn()
+    if got is not None:
+        p, conn = got
+        try:
+            with _cursor(p, conn, dict_cursor) as (_, cur):
+                return fn(cur)
+        except psycopg2.Error:
+            if conn.closed:
+                _mark_replica_down()
+    with get_conn_cursor(dict_cursor) as (_, cur):
+        return fn(cur)
+
+
+# Errors that mean "run the whole transaction again"
+RETRYABLE_ERRORS = (psycopg2.errors.SerializationFailure, psycopg2.errors.DeadlockDetected)
 
 
-def db_query(sql: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+def run_in_transaction(
+    fn: Callable[[Any], Any],
+    dict_cursor: bool = True,
+    isolation_level: Optional[str] = None,
+    retries: int = 5,
+    base_delay: float = 0.02,
+    max_delay: float = 0.5,
+):
+    """Run fn(cur) in its own transaction, retrying serialization failures and
+    deadlocks with jittered exponential backoff. fn must be safe to re-run."""
+    attempt = 0
+    while True:
+        try:
+            with get_conn_cursor(dict_cursor, isolation_level=isolation_level) as (_, cur):
+                return fn(cur)
+        except RETRYABLE_ERRORS:
+            attempt += 1
+            if attempt > retries:
+                raise
+            time.sleep(min(max_delay, base_delay * (2 ** (attempt - 1))) * random.uniform(0.5, 1.0))
+
+
+def _fetch_dicts(sql: str, params: Optional[Dict[str, Any]]):
+    def fn(cur):
+        cur.execute(sql, params or {})
+        return [dict(r) for r in cur.fetchall()]
+
+    return fn
+
+
+def db_query(sql: str, params: Optional[Dict[str, Any]] = None, readonly: bool = False) -> List[Dict[str, Any]]:
+    if readonly:
+        return run_readonly(_fetch_dicts(sql, params))
     with get_conn_cursor(True) as (_, cur):
         cur.execute(sql, params or {})
         rows = cur.fetchall()
         return [dict(r) for r in rows]
 
 
-def db_query_one(sql: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+def db_query_one(sql: str, params: Optional[Dict[str, Any]] = None, readonly: bool = False) -> Optional[Dict[str, Any]]:
+    if readonly:
+        rows = run_readonly(_fetch_dicts(sql, params))
+        return rows[0] if rows else None
     with get_conn_cursor(True) as (_, cur):
         cur.execute(sql, params or {})
         row = cur.fetchone()
         return dict(row) if row else None
 
 
+def db_query_rows(
+    sql: str, params: Optional[Dict[str, Any]] = None, readonly: bool = False
+) -> Tuple[List[str], List[tuple]]:
+    """Column names plus plain tuples, for compact array-of-arrays responses."""
+
+    def fn(cur):
+        cur.execute(sql, params or {})
+        return [d[0] for d in cur.description], cur.fetchall()
+
+    if readonly:
+        return run_readonly(fn, dict_cursor=False)
+    with get_conn_cursor(False) as (_, cur):
+        return fn(cur)
+
+
+# Fixed-shape hot-path statements, PREPAREd lazily on each pooled connection.
+# SQL uses positional $1..$n placeholders.
+PREPARED_STATEMENTS: Dict[str, str] = {}
+_prepared_on: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def prepared(name: str, sql: str) -> str:
+    """Register a named server-side prepared statement; returns the name."""
+    PREPARED_STATEMENTS[name] = sql
+    return name
+
+
+def _execute_prepared(conn, cur, name: str, args: tuple):
+    names = _prepared_on.setdefault(conn, set())
+    if name not in names:
+        cur.execute(f"PREPARE {name} AS {PREPARED_STATEMENTS[name]}")
+        names.add(name)
+    placeholders = ", ".join(["%s"] * len(args))
+    cur.execute(f"EXECUTE {name} ({placeholders})" if args else f"EXECUTE {name}", args)
+
+
+def execute_prepared(cur, name: str, args: tuple = ()):
+    """EXECUTE a registered statement on `cur`, inside the caller's transaction."""
+    _execute_prepared(cur.connection, cur, name, args)
+
+
+def db_query_one_prepared(name: str, args: tuple = ()) -> Optional[Dict[str, Any]]:
+    with get_conn_cursor(True) as (conn, cur):
+        try:
+            _execute_prepared(conn, cur, name, args)
+        except psycopg2.errors.InvalidSqlStatementName:
+            # Session lost its statements (e.g. DISCARD ALL); prepare again
+            conn.rollback()
+            _prepared_on.pop(conn, None)
+            _execute_prepared(conn, cur, name, args)
+        row = cur.fetchone()
+        return dict(row) if row else None
+
+
 def db_execute(sql: str, params: Optional[Dict[str, Any]] = None) -> int:
     with get_conn_cursor(False) as (conn, cur):
         cur.execute(sql, params or {})
@@ -82,7 +338,8 @@ def ensure_schema_migrations_table():
         CREATE TABLE IF NOT EXISTS schema_migrations (
             version text PRIMARY KEY,
             applied_at timestamptz NOT NULL DEFAULT now()
-        )
+        );
+        ALTER TABLE schema_migrations ADD COLUMN IF NOT EXISTS duration_ms double precision;
         """
     )
 
@@ -93,5 +350,9 @@ def applied_versions() -> set:
     return {r["version"] for r in rows}
 
 
-def record_applied(version: str):
-    db_execute("INSERT INTO schema_migrations(version) VALUES (%(v)s) ON CONFLICT DO NOTHING", {"v": version})
+def record_applied(version: str, duration_ms: Optional[float] = None):
+    db_execute(
+        "INSERT INTO schema_migrations(version, duration_ms) VALUES (%(v)s, %(d)s) ON CONFLICT DO NOTHING",
+        {"v": version, "d": duration_ms},
+    )
+
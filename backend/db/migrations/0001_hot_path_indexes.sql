@@ -0,0 +1,32 @@
+-- Partial/composite indexes matching the hot query shapes.
+-- Built CONCURRENTLY (each outside a transaction) by `flask migrate`.
+-- (verify with: python -m flask --app backend.app check-query-plans)
+
+-- Open orders per account (transactions.list_orders?status=open)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_open_orders
+  ON transactions (account_id, time DESC)
+  WHERE kind = 'ORDER' AND status IN ('NEW','PENDING_APPROVAL','APPROVED','PARTIAL_FILL');
+
+-- Pending approvals / approval work queue
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_pending_approval
+  ON transactions (account_id, time)
+  WHERE kind = 'ORDER' AND status = 'PENDING_APPROVAL';
+
+-- Net position per (account, ticker): index-only for the risk engine and positions view
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_fills_account_ticker
+  ON transactions (account_id, ticker) INCLUDE (side, qty, price, group_id)
+  WHERE kind = 'FILL' AND status IN ('EXECUTED','FILLED');
+
+-- Group order lists and group roll-ups
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_group_time
+  ON transactions (group_id, time DESC)
+  WHERE group_id IS NOT NULL;
+
+-- News by ticker (symbol filter, watchlist feed); the PK leads with article_id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_news_ticker_map_ticker ON news_ticker_map (ticker, article_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_news_articles_published_at ON news_articles (published_at DESC);
+
+-- Membership lookups by user (account/group lists); PKs lead with the account/group id.
+-- users_news_feed(user_id) is already served by its (user_id, article_id) PK.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_account_memberships_user ON account_memberships (user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_group_memberships_user ON group_memberships (user_id);
@@ -0,0 +1,33 @@
+-- Article counts per ticker x time bucket x sentiment, maintained by the trigger
+-- on news_ticker_map from migration 0007; granularity is 'hour' or 'day'
+CREATE TABLE IF NOT EXISTS news_sentiment_rollup (
+    granularity VARCHAR(10) NOT NULL,
+    ticker VARCHAR(10) NOT NULL REFERENCES tickers(symbol) ON DELETE CASCADE,
+    bucket TIMESTAMPTZ NOT NULL,
+    sentiment VARCHAR(20) NOT NULL,
+    article_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, ticker, bucket, sentiment)
+);
+
+CREATE INDEX IF NOT EXISTS ix_news_sentiment_rollup_bucket ON news_sentiment_rollup (granularity, bucket);
+
+-- Backfill from existing articles (counts only start accruing on ingest from here on)
+INSERT INTO news_sentiment_rollup (granularity, ticker, bucket, sentiment, article_count)
+SELECT gr.g,
+       m.ticker,
+       date_trunc(gr.g, n.published_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+       COALESCE(NULLIF(lower(n.sentiment), ''), 'unknown'),
+       COUNT(*)
+FROM news_articles n
+JOIN news_ticker_map m ON m.article_id = n.id
+CROSS JOIN (VALUES ('hour'), ('day')) AS gr(g)
+GROUP BY 1, 2, 3, 4
+ON CONFLICT (granularity, ticker, bucket, sentiment) DO NOTHING;
+
+CREATE OR REPLACE VIEW news_sentiment_view AS
+SELECT ticker,
+       sentiment,
+       SUM(article_count)::bigint AS article_count
+FROM news_sentiment_rollup
+WHERE granularity = 'day'
+GROUP BY ticker, sentiment;
@@ -0,0 +1,29 @@
+-- Full-text search over news: weighted tsvector kept current by a trigger,
+-- GIN-indexed. Added as a plain column + trigger (not GENERATED ... STORED)
+-- so the ALTER doesn't rewrite the table under an exclusive lock.
+ALTER TABLE news_articles ADD COLUMN IF NOT EXISTS search_tsv tsvector;
+
+CREATE OR REPLACE FUNCTION news_articles_search_tsv() RETURNS trigger AS $$
+BEGIN
+  NEW.search_tsv :=
+    setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+    setweight(to_tsvector('english', replace(coalesce(NEW.impact_tags, ''), ',', ' ')), 'B') ||
+    setweight(to_tsvector('english', coalesce(NEW.source, '')), 'C');
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_news_articles_search_tsv ON news_articles;
+CREATE TRIGGER trg_news_articles_search_tsv
+  BEFORE INSERT OR UPDATE OF title, impact_tags, source ON news_articles
+  FOR EACH ROW EXECUTE FUNCTION news_articles_search_tsv();
+
+-- Backfill existing rows in batches (the runner repeats this until no rows
+-- are left, each batch in its own short transaction)
+UPDATE news_articles SET search_tsv =
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', replace(coalesce(impact_tags, ''), ',', ' ')), 'B') ||
+    setweight(to_tsvector('english', coalesce(source, '')), 'C')
+WHERE id IN (SELECT id FROM news_articles WHERE search_tsv IS NULL LIMIT 5000);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_news_articles_search_tsv ON news_articles USING GIN (search_tsv);
@@ -0,0 +1,9 @@
+-- Per-user news read high-water mark: articles published at or before
+-- read_through_at are read. users_news_feed becomes the sparse exception set
+-- (explicitly read articles after the mark, explicitly unread ones before it),
+-- and is pruned whenever the mark advances.
+CREATE TABLE IF NOT EXISTS user_news_read_state (
+    user_id INT PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    read_through_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,49 @@
+-- Append-only order lifecycle log (created, approved, filled, canceled),
+-- written in the same transaction as each transition in api/transactions.py.
+-- No foreign keys: the log outlives deleted accounts and users. xid records
+-- the writing transaction so readers can tail it without skipping rows that
+-- commit out of id order (services/order_events.read_events).
+CREATE TABLE IF NOT EXISTS order_events (
+    id BIGSERIAL PRIMARY KEY,
+    xid xid8 NOT NULL DEFAULT pg_current_xact_id(),
+    order_id INT NOT NULL,
+    account_id INT NOT NULL,
+    event VARCHAR(20) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    ticker VARCHAR(10) NOT NULL,
+    side VARCHAR(10) NOT NULL,
+    qty NUMERIC(12,4) NOT NULL,
+    price NUMERIC(12,2),
+    actor_id INT,
+    at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_order_events_xid ON order_events (xid, id);
+CREATE INDEX IF NOT EXISTS ix_order_events_account_xid ON order_events (account_id, xid, id);
+CREATE INDEX IF NOT EXISTS ix_order_events_order ON order_events (order_id, id);
+
+CREATE OR REPLACE FUNCTION order_events_append_only() RETURNS trigger AS $$
+BEGIN
+  RAISE EXCEPTION 'order_events is append-only';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_order_events_append_only ON order_events;
+CREATE TRIGGER trg_order_events_append_only
+  BEFORE UPDATE OR DELETE ON order_events
+  FOR EACH ROW EXECUTE FUNCTION order_events_append_only();
+
+-- Seed the log with the history implied by existing orders' current status
+INSERT INTO order_events (order_id, account_id, event, status, ticker, side, qty, price, actor_id, at)
+SELECT t.id, t.account_id, e.event, e.status, t.ticker, t.side, t.qty, t.price, e.actor, t.time
+FROM transactions t
+CROSS JOIN LATERAL (
+  VALUES
+    (1, 'created', CASE WHEN t.status = 'NEW' THEN 'NEW' ELSE 'PENDING_APPROVAL' END, t.requested_by, true),
+    (2, 'approved', 'APPROVED', t.approved_by, t.status IN ('APPROVED', 'PARTIAL_FILL', 'FILLED')),
+    (3, 'filled', 'FILLED', t.approved_by, t.status = 'FILLED'),
+    (4, 'canceled', 'CANCELED', NULL::int, t.status = 'CANCELED')
+) AS e(n, event, status, actor, applies)
+WHERE t.kind = 'ORDER' AND e.applies
+  AND NOT EXISTS (SELECT 1 FROM order_events)
+ORDER BY t.id, e.n;
@@ -0,0 +1,29 @@
+-- Shared token buckets for RATE_LIMIT_BACKEND=postgres (rate_limit.py).
+-- UNLOGGED: losing the buckets on a crash only resets limits, and skipping
+-- WAL keeps the per-request write cheap.
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+    key TEXT PRIMARY KEY,
+    tokens FLOAT8 NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL
+);
+
+-- Refill the bucket for the time elapsed, then take p_cost tokens if there are
+-- enough. Returns 0 when allowed, else the seconds until the tokens will be there.
+CREATE OR REPLACE FUNCTION rate_limit_take(p_key text, p_rate float8, p_burst float8, p_cost float8 DEFAULT 1)
+RETURNS float8 AS $$
+DECLARE
+  v_tokens float8;
+BEGIN
+  INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+  VALUES (p_key, p_burst, clock_timestamp())
+  ON CONFLICT (key) DO UPDATE
+    SET tokens = LEAST(p_burst, b.tokens + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) * p_rate),
+        updated_at = clock_timestamp()
+  RETURNING tokens INTO v_tokens;
+  IF v_tokens >= p_cost THEN
+    UPDATE rate_limit_buckets SET tokens = v_tokens - p_cost WHERE key = p_key;
+    RETURN 0;
+  END IF;
+  RETURN (p_cost - v_tokens) / p_rate;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,40 @@
+-- Maintain news_sentiment_rollup from news_ticker_map itself, so every mapping
+-- counts: those inserted by loaders and those added by trg_populate_news_tickers
+-- from the title (which the loaders' own ON CONFLICT DO NOTHING never saw).
+-- Statement-level with a transition table: one upsert per INSERT statement.
+CREATE OR REPLACE FUNCTION bump_news_sentiment_rollup() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO news_sentiment_rollup (granularity, ticker, bucket, sentiment, article_count)
+  SELECT gr.g,
+         m.ticker,
+         date_trunc(gr.g, n.published_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+         COALESCE(NULLIF(lower(n.sentiment), ''), 'unknown'),
+         COUNT(*)
+  FROM new_mappings m
+  JOIN news_articles n ON n.id = m.article_id
+  CROSS JOIN (VALUES ('hour'), ('day')) AS gr(g)
+  GROUP BY 1, 2, 3, 4
+  ON CONFLICT (granularity, ticker, bucket, sentiment)
+  DO UPDATE SET article_count = news_sentiment_rollup.article_count + EXCLUDED.article_count;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_news_sentiment_rollup ON news_ticker_map;
+CREATE TRIGGER trg_news_sentiment_rollup
+  AFTER INSERT ON news_ticker_map
+  REFERENCING NEW TABLE AS new_mappings
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_news_sentiment_rollup();
+
+-- Rebuild: counts written by the old loader path missed title-mapped articles
+DELETE FROM news_sentiment_rollup;
+INSERT INTO news_sentiment_rollup (granularity, ticker, bucket, sentiment, article_count)
+SELECT gr.g,
+       m.ticker,
+       date_trunc(gr.g, n.published_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+       COALESCE(NULLIF(lower(n.sentiment), ''), 'unknown'),
+       COUNT(*)
+FROM news_articles n
+JOIN news_ticker_map m ON m.article_id = n.id
+CROSS JOIN (VALUES ('hour'), ('day')) AS gr(g)
+GROUP BY 1, 2, 3, 4;
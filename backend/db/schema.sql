@@ -41,13 +41,14 @@ SELECT n.*, m.ticker
 FROM news_articles n
 JOIN news_ticker_map m ON m.article_id = n.id;
 
+-- All-time counts, summed from the daily rollup instead of scanning every article
 CREATE OR REPLACE VIEW news_sentiment_view AS
-SELECT m.ticker,
-       n.sentiment,
-       COUNT(*) AS article_count
-FROM news_articles n
-JOIN news_ticker_map m ON m.article_id = n.id
-GROUP BY m.ticker, n.sentiment;
+SELECT ticker,
+       sentiment,
+       SUM(article_count)::bigint AS article_count
+FROM news_sentiment_rollup
+WHERE granularity = 'day'
+GROUP BY ticker, sentiment;
 
 -- Link each group to a dedicated trading account (for shared group portfolio)
 ALTER TABLE groups ADD COLUMN IF NOT EXISTS account_id INT REFERENCES accounts(id) ON DELETE SET NULL;
@@ -113,10 +114,35 @@ FROM accounts a
 LEFT JOIN cash_flow cf ON cf.account_id = a.id
 LEFT JOIN position_values pv ON pv.account_id = a.id;
 
+-- Leaderboard snapshot, refreshed by the leaderboard-refresh job (services/jobs.py)
+-- (recreated here because DROP VIEW account_pnl_basic CASCADE drops it)
+CREATE MATERIALIZED VIEW IF NOT EXISTS leaderboard_snapshot AS
+SELECT a.id AS account_id,
+       a.name,
+       p.starting_cash,
+       p.current_cash,
+       p.account_value,
+       p.basic_pnl,
+       now() AS taken_at
+FROM accounts a
+LEFT JOIN account_pnl_basic p ON p.account_id = a.id;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_leaderboard_snapshot_account ON leaderboard_snapshot (account_id);
+
+-- Periodic account value history, written by the account-snapshots job
+CREATE TABLE IF NOT EXISTS account_value_snapshots (
+  account_id INT NOT NULL REFERENCES accounts(id) ON DELETE CASCADE,
+  taken_at TIMESTAMPTZ NOT NULL,
+  account_value NUMERIC(18,2),
+  pnl NUMERIC(18,2),
+  PRIMARY KEY (account_id, taken_at)
+);
+CREATE INDEX IF NOT EXISTS ix_account_value_snapshots_taken_at ON account_value_snapshots (taken_at);
+
 -- Indexes
 CREATE INDEX IF NOT EXISTS ix_price_bars_ticker_time ON price_bars (ticker, time);
 CREATE UNIQUE INDEX IF NOT EXISTS ux_users_email ON users (email);
 CREATE UNIQUE INDEX IF NOT EXISTS ux_groups_name_lower ON groups (LOWER(name));
+CREATE INDEX IF NOT EXISTS ix_transactions_group_time ON transactions (group_id, time DESC) WHERE group_id IS NOT NULL;
 
 -- Role validation constraints (example using check constraints already exist in ORM)
 
@@ -145,6 +171,56 @@ CREATE TRIGGER trg_enforce_order_status
 BEFORE UPDATE ON transactions
 FOR EACH ROW EXECUTE FUNCTION enforce_order_status_transition();
 
+-- Group portfolio roll-up: fold each group fill into group_member_positions
+-- so /api/groups/<id>/portfolio reads O(positions) rows instead of scanning transactions
+CREATE TABLE IF NOT EXISTS group_member_positions (
+  group_id INT NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+  user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  ticker VARCHAR(10) NOT NULL REFERENCES tickers(symbol) ON DELETE CASCADE,
+  qty NUMERIC(14,4) NOT NULL DEFAULT 0,
+  net_cost NUMERIC(18,2) NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (group_id, user_id, ticker)
+);
+
+CREATE OR REPLACE FUNCTION rollup_group_member_position()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.group_id IS NOT NULL AND NEW.kind = 'FILL' AND NEW.status IN ('EXECUTED','FILLED') THEN
+    INSERT INTO group_member_positions (group_id, user_id, ticker, qty, net_cost, updated_at)
+    VALUES (
+      NEW.group_id,
+      NEW.requested_by,
+      NEW.ticker,
+      CASE WHEN NEW.side = 'BUY' THEN NEW.qty ELSE -NEW.qty END,
+      CASE WHEN NEW.side = 'BUY' THEN NEW.qty * NEW.price ELSE -NEW.qty * NEW.price END,
+      now()
+    )
+    ON CONFLICT (group_id, user_id, ticker) DO UPDATE
+      SET qty = group_member_positions.qty + EXCLUDED.qty,
+          net_cost = group_member_positions.net_cost + EXCLUDED.net_cost,
+          updated_at = EXCLUDED.updated_at;
+  END IF;
+  RETURN NEW;
+END;$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_rollup_group_member_position ON transactions;
+CREATE TRIGGER trg_rollup_group_member_position
+AFTER INSERT ON transactions
+FOR EACH ROW EXECUTE FUNCTION rollup_group_member_position();
+
+-- One-time backfill for fills recorded before the trigger existed
+INSERT INTO group_member_positions (group_id, user_id, ticker, qty, net_cost)
+SELECT t.group_id,
+       t.requested_by,
+       t.ticker,
+       SUM(CASE WHEN t.side = 'BUY' THEN t.qty ELSE -t.qty END),
+       SUM(CASE WHEN t.side = 'BUY' THEN t.qty * t.price ELSE -t.qty * t.price END)
+FROM transactions t
+WHERE t.group_id IS NOT NULL AND t.kind = 'FILL' AND t.status IN ('EXECUTED','FILLED')
+  AND NOT EXISTS (SELECT 1 FROM group_member_positions)
+GROUP BY t.group_id, t.requested_by, t.ticker;
+
 -- Auto-populate news_ticker_map using simple uppercase ticker detection
 CREATE OR REPLACE FUNCTION populate_news_tickers()
 RETURNS TRIGGER AS $$
@@ -166,20 +242,18 @@ CREATE TRIGGER trg_populate_news_tickers
 AFTER INSERT ON news_articles
 FOR EACH ROW EXECUTE FUNCTION populate_news_tickers();
 
--- Stored procedure to process an order: authorization, risk checks, and fill
-CREATE OR REPLACE PROCEDURE process_order(p_order_id int, p_user_id int)
+-- Stored procedure to process an order: lock, authorization and fill.
+-- Account limits are checked by the caller (/process) with the Python risk
+-- engine (services/risk.py), from fresh reads in this same transaction after
+-- locking the order row; the caller also passes the market price it has in hand.
+DROP PROCEDURE IF EXISTS process_order(int, int);
+CREATE OR REPLACE PROCEDURE process_order(p_order_id int, p_user_id int, p_mkt_price numeric DEFAULT NULL)
 LANGUAGE plpgsql
 AS $$
 DECLARE
   v_order RECORD;
   v_allowed boolean;
-  v_latest_price numeric(12,4);
-  v_current_pos numeric(12,4);
-  v_notional numeric(14,4);
   v_mkt_price numeric(12,4);
-  v_over_notional_cfg boolean;
-  v_over_position_cfg boolean;
-  v_account_cfg RECORD;
 BEGIN
   -- Lock the order row and ensure it's an open ORDER
   SELECT *
@@ -207,53 +281,7 @@ BEGIN
     RAISE EXCEPTION 'forbidden';
   END IF;
 
-  -- Latest market price via CTE with DISTINCT ON
-  WITH latest AS (
-    SELECT DISTINCT ON (ticker) ticker, close::numeric AS close
-    FROM price_bars
-    WHERE ticker = v_order.ticker
-    ORDER BY ticker, time DESC
-  )
-  SELECT close INTO v_latest_price FROM latest;
-
-  v_mkt_price := COALESCE(v_latest_price, v_order.price::numeric);
-
-  -- Aggregate current net position (advanced query)
-  SELECT COALESCE(SUM(CASE WHEN side='BUY' THEN qty ELSE -qty END), 0)::numeric
-  INTO v_current_pos
-  FROM transactions
-  WHERE account_id = v_order.account_id
-    AND ticker = v_order.ticker
-    AND kind = 'FILL'
-    AND status IN ('EXECUTED','FILLED');
-
-  v_notional := (v_order.qty::numeric) * v_mkt_price;
-
-  -- Account risk configuration
-  SELECT
-    max_order_notional::numeric AS max_order_notional,
-    max_position_abs_qty::numeric AS max_position_abs_qty,
-    COALESCE(earnings_lockout, false) AS earnings_lockout
-  INTO v_account_cfg
-  FROM accounts WHERE id = v_order.account_id;
-
-  v_over_notional_cfg := (v_account_cfg.max_order_notional IS NOT NULL AND v_notional > v_account_cfg.max_order_notional);
-  v_over_position_cfg := (v_account_cfg.max_position_abs_qty IS NOT NULL AND
-                          ABS((v_current_pos + CASE WHEN v_order.side='BUY' THEN v_order.qty ELSE -v_order.qty END)::numeric) > v_account_cfg.max_position_abs_qty);
-
-  -- Example EXISTS subquery for demonstrating advanced query usage
-  IF EXISTS (
-    SELECT 1
-    FROM news_ticker_map m
-    WHERE m.ticker = v_order.ticker
-  ) THEN
-    PERFORM 1;
-  END IF;
-
-  -- Enforce risk constraints
-  IF v_account_cfg.earnings_lockout OR v_over_notional_cfg OR v_over_position_cfg THEN
-    RAISE EXCEPTION 'order blocked by risk constraints';
-  END IF;
+  v_mkt_price := COALESCE(p_mkt_price, v_order.price::numeric);
 
   -- Approve then fill at market in same transaction
   UPDATE transactions
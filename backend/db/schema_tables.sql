@@ -105,7 +105,31 @@ CREATE TABLE IF NOT EXISTS transactions (
     approved_by INT REFERENCES users(id) ON DELETE SET NULL
 );
 
+-- Per-group, per-member position roll-up maintained by trg_rollup_group_member_position (schema.sql)
+CREATE TABLE IF NOT EXISTS group_member_positions (
+    group_id INT NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    ticker VARCHAR(10) NOT NULL REFERENCES tickers(symbol) ON DELETE CASCADE,
+    qty NUMERIC(14,4) NOT NULL DEFAULT 0,
+    net_cost NUMERIC(18,2) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (group_id, user_id, ticker)
+);
+
+-- Article counts per ticker x time bucket x sentiment, maintained on insert
+-- (trg_news_sentiment_rollup on news_ticker_map, migration 0007); granularity is 'hour' or 'day'
+CREATE TABLE IF NOT EXISTS news_sentiment_rollup (
+    granularity VARCHAR(10) NOT NULL,
+    ticker VARCHAR(10) NOT NULL REFERENCES tickers(symbol) ON DELETE CASCADE,
+    bucket TIMESTAMPTZ NOT NULL,
+    sentiment VARCHAR(20) NOT NULL,
+    article_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, ticker, bucket, sentiment)
+);
+
 -- Helpful indexes
 CREATE INDEX IF NOT EXISTS ix_price_bars_ticker_time ON price_bars (ticker, time);
 CREATE INDEX IF NOT EXISTS ix_transactions_account_time ON transactions (account_id, time DESC);
+CREATE INDEX IF NOT EXISTS ix_transactions_group_time ON transactions (group_id, time DESC) WHERE group_id IS NOT NULL;
 CREATE UNIQUE INDEX IF NOT EXISTS ux_users_email ON users (email);
+CREATE INDEX IF NOT EXISTS ix_news_sentiment_rollup_bucket ON news_sentiment_rollup (granularity, bucket);
@@ -1,5 +1,97 @@
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import bcrypt as _bcrypt
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
 
 bcrypt = Bcrypt()
 jwt = JWTManager()
+
+
+class HasherBusy(Exception):
+    """Raised when the password hasher has no free slot within the queue timeout."""
+
+
+def _hash_password(password: str, rounds: int) -> str:
+    # Runs in a worker process; must stay importable at module level
+    return _bcrypt.hashpw(password.encode("utf-8"), _bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check_password(pw_hash: str, password: str) -> bool:
+    try:
+        return _bcrypt.checkpw(password.encode("utf-8"), pw_hash.encode("utf-8"))
+    except ValueError:
+        return False
+
+
+class PasswordHasher:
+    """bcrypt hashing off the request thread.
+
+    Work runs in a small process pool so password checks don't hold the GIL
+    that market-data requests need. A semaphore caps in-flight hashes; callers
+    that can't get a slot within PASSWORD_HASH_QUEUE_TIMEOUT get HasherBusy
+    instead of queueing behind a login storm. PASSWORD_HASH_WORKERS=0 hashes
+    inline (handy for CLI and tests).
+    """
+
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.workers = 2
+        self.queue_timeout = 0.5
+        self._slots = threading.BoundedSemaphore(4)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = int(app.config.get("BCRYPT_LOG_ROUNDS", 12))
+        self.workers = int(app.config.get("PASSWORD_HASH_WORKERS", 2))
+        self.queue_timeout = float(app.config.get("PASSWORD_HASH_QUEUE_TIMEOUT", 0.5))
+        max_inflight = int(app.config.get("PASSWORD_HASH_MAX_INFLIGHT", max(1, self.workers) * 2))
+        self._slots = threading.BoundedSemaphore(max_inflight)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that already runs the simulator thread is unsafe
+                ctx = multiprocessing.get_context("spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+                atexit.register(self.shutdown)
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HasherBusy("password hasher saturated")
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash_password, password, self.rounds)
+
+    def check(self, pw_hash: str, password: str) -> bool:
+        return self._run(_check_password, pw_hash, password)
+
+    def needs_rehash(self, pw_hash: str) -> bool:
+        # bcrypt hashes look like $2b$<cost>$<salt+digest>
+        try:
+            return int(pw_hash.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+hasher = PasswordHasher()
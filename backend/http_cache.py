@@ -0,0 +1,56 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Callable, Optional, Tuple
+
+from flask import Response, make_response, request
+
+# A version function receives the view's kwargs and returns (token, last_modified).
+# It should be far cheaper than the view itself: a max(id), the latest bar time, etc.
+VersionFn = Callable[..., Tuple[object, Optional[datetime]]]
+
+
+def _not_modified(tag: str, last_modified: Optional[datetime]) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains(tag)
+    ims = request.if_modified_since
+    if ims and last_modified:
+        return last_modified.replace(microsecond=0) <= ims
+    return False
+
+
+def conditional(version: VersionFn, max_age: int = 0):
+    """ETag / Last-Modified support for read endpoints.
+
+    The ETag is derived from the request path + query, the Accept header (some
+    views negotiate their representation) and the resource version, so a
+    matching If-None-Match (or a fresh If-Modified-Since) gets a 304 without
+    running the view's main query. Responses carry public Cache-Control so a
+    reverse proxy can absorb repeated polls.
+    """
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            token, last_modified = version(**kwargs)
+            if last_modified is not None and last_modified.tzinfo is None:
+                last_modified = last_modified.replace(tzinfo=timezone.utc)
+            accept = request.headers.get("Accept", "")
+            tag = hashlib.sha1(f"{request.full_path}|{accept}|{token}".encode("utf-8")).hexdigest()
+            if _not_modified(tag, last_modified):
+                resp = Response(status=304)
+            else:
+                resp = make_response(fn(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(tag)
+            if last_modified is not None:
+                resp.last_modified = last_modified
+            resp.vary.add("Accept")
+            resp.cache_control.public = True
+            resp.cache_control.max_age = max_age
+            return resp
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,47 @@
+from array import array
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
+
+
+def _default(o):
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    if isinstance(o, Decimal):
+        return float(o)
+    if isinstance(o, (memoryview, array)):
+        return o.tolist()
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that serializes datetimes (ISO 8601), Decimals and typed
+    array views natively, so endpoints can hand DB rows straight to jsonify.
+    Uses orjson when installed."""
+
+    sort_keys = False
+
+    if orjson is not None:
+        _options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, default=_default, option=self._options).decode("utf-8")
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            body = orjson.dumps(obj, default=_default, option=self._options)
+            return self._app.response_class(body, mimetype=self.mimetype)
+
+    else:
+        default = staticmethod(_default)
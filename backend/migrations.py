@@ -0,0 +1,206 @@
+"""Migration runner for backend/db/migrations (see `flask migrate`).
+
+Files are applied in numeric-prefix order and recorded in schema_migrations.
+Each file is split into statements: ordinary statements run together in one
+transaction with a short lock_timeout (retried if it trips, so a busy table
+delays the migration rather than queueing order entry behind it), while
+CONCURRENTLY statements run on their own in autocommit, as Postgres requires.
+
+An UPDATE or DELETE whose target rows come from a LIMIT subquery is a batch
+(e.g. a backfill): it runs on its own, each batch in a short transaction,
+repeated until it touches no rows, so no single transaction locks the table.
+"""
+import os
+import re
+import time
+from collections import namedtuple
+from typing import Callable, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.errors
+
+from .db import applied_versions, get_pool, record_applied
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "db", "migrations")
+
+# kind is "tx", "concurrent" or "batch"
+Step = namedtuple("Step", ["kind", "statements"])
+StepResult = namedtuple("StepResult", ["version", "index", "kind", "summary", "ms"])
+
+_CONCURRENT = re.compile(r"^\s*(CREATE\s+(UNIQUE\s+)?INDEX|DROP\s+INDEX|REINDEX)\b[^;]*\bCONCURRENTLY\b", re.I)
+_BATCH = re.compile(r"^\s*(UPDATE|DELETE)\b.*\(\s*SELECT\b.*\bLIMIT\s+\d+\s*\)", re.I | re.S)
+_INDEX_NAME = re.compile(r"CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.I)
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> List[Tuple[str, str]]:
+    """(version, path) for every NNNN_name.sql file, ordered by its number."""
+    files = [f for f in os.listdir(directory) if re.match(r"^\d+_.*\.sql$", f)]
+    files.sort(key=lambda f: (int(f.split("_", 1)[0]), f))
+    return [(f[:-4], os.path.join(directory, f)) for f in files]
+
+
+def pending(directory: str = MIGRATIONS_DIR) -> List[Tuple[str, str]]:
+    done = applied_versions()
+    return [(v, p) for v, p in discover(directory) if v not in done]
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split on top-level semicolons, respecting quotes, dollar quotes and comments."""
+    out, buf, i, n = [], [], 0, len(sql)
+    while i < n:
+        c = sql[i]
+        if c == "-" and sql.startswith("--", i):
+            j = sql.find("\n", i)
+            i = n if j < 0 else j + 1
+            continue
+        if c == "/" and sql.startswith("/*", i):
+            j = sql.find("*/", i + 2)
+            i = n if j < 0 else j + 2
+            continue
+        if c in ("'", '"'):
+            j = i + 1
+            while j < n:
+                if sql[j] == c:
+                    if j + 1 < n and sql[j + 1] == c:  # doubled quote
+                        j += 2
+                        continue
+                    break
+                j += 1
+            buf.append(sql[i:j + 1])
+            i = j + 1
+            continue
+        if c == "$":
+            m = re.match(r"\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$", sql[i:])
+            if m:
+                tag = m.group(0)
+                j = sql.find(tag, i + len(tag))
+                j = n if j < 0 else j + len(tag)
+                buf.append(sql[i:j])
+                i = j
+                continue
+        if c == ";":
+            stmt = "".join(buf).strip()
+            if stmt:
+                out.append(stmt)
+            buf = []
+        else:
+            buf.append(c)
+        i += 1
+    stmt = "".join(buf).strip()
+    if stmt:
+        out.append(stmt)
+    return out
+
+
+def plan_steps(sql: str) -> List[Step]:
+    """Group consecutive transactional statements; each CONCURRENTLY or batch one stands alone."""
+    steps: List[Step] = []
+    for stmt in split_statements(sql):
+        if _CONCURRENT.match(stmt):
+            steps.append(Step("concurrent", [stmt]))
+        elif _BATCH.match(stmt):
+            steps.append(Step("batch", [stmt]))
+        elif steps and steps[-1].kind == "tx":
+            steps[-1].statements.append(stmt)
+        else:
+            steps.append(Step("tx", [stmt]))
+    return steps
+
+
+def _summary(step: Step) -> str:
+    first = " ".join(step.statements[0].split())
+    first = first if len(first) <= 70 else first[:67] + "..."
+    return first if len(step.statements) == 1 else f"{first} (+{len(step.statements) - 1} more)"
+
+
+def _drop_invalid_index(cur, stmt: str):
+    # A failed/cancelled CREATE INDEX CONCURRENTLY leaves an INVALID index that
+    # IF NOT EXISTS would then skip; drop it so the build is retried.
+    m = _INDEX_NAME.search(stmt)
+    if not m or not stmt.lstrip().upper().startswith("CREATE"):
+        return
+    cur.execute(
+        """
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s AND pg_table_is_visible(c.oid) AND NOT i.indisvalid
+        """,
+        (m.group(1),),
+    )
+    if cur.fetchone():
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {m.group(1)}")
+
+
+def _run_tx(cur, statements: List[str], lock_timeout: str, retries: int) -> int:
+    """Run statements in one transaction; returns the last one's rowcount."""
+    for attempt in range(retries + 1):
+        try:
+            cur.execute("BEGIN")
+            cur.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+            for stmt in statements:
+                cur.execute(stmt)
+            rows = cur.rowcount
+            cur.execute("COMMIT")
+            return rows
+        except psycopg2.errors.LockNotAvailable:
+            cur.execute("ROLLBACK")
+            if attempt == retries:
+                raise
+            time.sleep(min(0.5 * 2 ** attempt, 10.0))
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+
+def _run_step(cur, step: Step, lock_timeout: str, retries: int):
+    if step.kind == "concurrent":
+        _drop_invalid_index(cur, step.statements[0])
+        cur.execute(step.statements[0])
+    elif step.kind == "batch":
+        while _run_tx(cur, step.statements, lock_timeout, retries) > 0:
+            pass
+    else:
+        _run_tx(cur, step.statements, lock_timeout, retries)
+
+
+def migrate(
+    directory: str = MIGRATIONS_DIR,
+    dry_run: bool = False,
+    lock_timeout: Optional[str] = None,
+    retries: int = 5,
+    on_step: Optional[Callable[[StepResult], None]] = None,
+) -> List[str]:
+    """Apply pending migrations in order; returns the versions applied.
+
+    on_step is called after every step with its timing (ms is None on dry runs).
+    """
+    lock_timeout = lock_timeout or os.getenv("MIGRATION_LOCK_TIMEOUT", "3s")
+    todo = pending(directory)
+    if dry_run:
+        for version, path in todo:
+            with open(path, "r", encoding="utf-8") as f:
+                for i, step in enumerate(plan_steps(f.read()), 1):
+                    if on_step:
+                        on_step(StepResult(version, i, step.kind, _summary(step), None))
+        return [v for v, _ in todo]
+
+    applied = []
+    p = get_pool()
+    conn = p.getconn()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for version, path in todo:
+                with open(path, "r", encoding="utf-8") as f:
+                    steps = plan_steps(f.read())
+                started = time.perf_counter()
+                for i, step in enumerate(steps, 1):
+                    t0 = time.perf_counter()
+                    _run_step(cur, step, lock_timeout, retries)
+                    if on_step:
+                        on_step(StepResult(version, i, step.kind, _summary(step), (time.perf_counter() - t0) * 1000))
+                record_applied(version, (time.perf_counter() - started) * 1000)
+                applied.append(version)
+    finally:
+        conn.autocommit = False
+        p.putconn(conn)
+    return applied
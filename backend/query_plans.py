@@ -0,0 +1,151 @@
+"""EXPLAIN-based regression check for the hot queries (see `flask check-query-plans`).
+
+Seeds a realistically sized synthetic dataset, ANALYZEs, EXPLAINs each hot
+query and asserts the listed tables are read through an index, never a
+sequential scan. Everything runs in one transaction that is rolled back, but
+it takes table locks while it runs: point it at a dev/CI database.
+"""
+import json
+import re
+from typing import Dict, List, Tuple
+
+from .api.accounts import _LIST_ACCOUNTS_SQL, _PENDING_APPROVALS_SQL
+from .api.groups import _GROUP_ORDERS_SQL
+from .api.metrics import _POSITIONS_SQL
+from .api.news import _query_news_sql
+from .api.transactions import _LIST_ORDERS_SQL, OPEN_ORDERS_FILTER
+from .api.watchlist import _news_feed_sql
+from .db import PREPARED_STATEMENTS, get_pool
+from .services.risk import _NET_POSITION
+
+
+def _adhoc(name: str, *params: str) -> str:
+    """A registered prepared statement's SQL with $n bound to %(params[n-1])s."""
+    return re.sub(r"\$(\d+)", lambda m: f"%({params[int(m.group(1)) - 1]})s", PREPARED_STATEMENTS[name])
+
+
+# name -> (sql, tables that must be index-scanned). The SQL is the app's own,
+# imported from the views and services that run it, so the check can't drift.
+HOT_QUERIES: Dict[str, Tuple[str, List[str]]] = {
+    "transactions.list_orders(open)": (_LIST_ORDERS_SQL.format(open_filter=OPEN_ORDERS_FILTER), ["transactions"]),
+    "risk.net_position": (_adhoc(_NET_POSITION, "aid", "sym"), ["transactions"]),
+    "metrics.positions": (_POSITIONS_SQL, ["transactions"]),
+    "accounts.list_accounts": (_LIST_ACCOUNTS_SQL, ["account_memberships", "accounts"]),
+    "accounts.pending_approvals": (_PENDING_APPROVALS_SQL, ["transactions", "account_memberships"]),
+    "groups.group_orders": (_GROUP_ORDERS_SQL.format(open_filter=""), ["transactions"]),
+    "news.query_news(symbol)": (_query_news_sql(symbol=True, sentiment=False), ["news_ticker_map"]),
+    "watchlist.news_feed": (_news_feed_sql(sentiment=False, unread=False), ["news_ticker_map", "user_watchlist", "users_news_feed"]),
+}
+
+SEED_SQL = """
+ALTER TABLE news_articles DISABLE TRIGGER USER;
+ALTER TABLE transactions DISABLE TRIGGER USER;
+
+INSERT INTO users (email, password_hash)
+SELECT 'plancheck-' || g || '@example.invalid', 'x' FROM generate_series(1, %(users)s) g;
+CREATE TEMP TABLE _pc_users ON COMMIT DROP AS
+  SELECT array_agg(id ORDER BY id) AS ids FROM users WHERE email LIKE 'plancheck-%%';
+
+INSERT INTO accounts (account_type, name, starting_cash)
+SELECT 'individual', 'plancheck-' || g, 100000 FROM generate_series(1, %(accounts)s) g;
+CREATE TEMP TABLE _pc_accounts ON COMMIT DROP AS
+  SELECT array_agg(id ORDER BY id) AS ids FROM accounts WHERE name LIKE 'plancheck-%%';
+
+INSERT INTO account_memberships (account_id, user_id, role)
+SELECT a.ids[g], u.ids[1 + (g - 1) %% array_length(u.ids, 1)], 'owner'
+FROM _pc_accounts a, _pc_users u, generate_series(1, array_length(a.ids, 1)) g;
+
+INSERT INTO tickers (symbol, name, asset_type)
+SELECT 'PC' || g, 'Plan check ' || g, 'stock' FROM generate_series(1, %(tickers)s) g;
+
+INSERT INTO groups (name, created_by)
+SELECT 'plancheck-' || g, u.ids[1] FROM _pc_users u, generate_series(1, %(groups)s) g;
+CREATE TEMP TABLE _pc_groups ON COMMIT DROP AS
+  SELECT array_agg(id ORDER BY id) AS ids FROM groups WHERE name LIKE 'plancheck-%%';
+
+INSERT INTO transactions (account_id, group_id, ticker, time, side, qty, price, kind, status, requested_by)
+SELECT a.ids[1 + g %% array_length(a.ids, 1)],
+       CASE WHEN g %% 10 = 0 THEN gr.ids[1 + g %% array_length(gr.ids, 1)] END,
+       'PC' || (1 + g %% %(tickers)s),
+       now() - g * interval '1 second',
+       CASE WHEN g %% 2 = 0 THEN 'BUY' ELSE 'SELL' END,
+       1 + g %% 50,
+       100,
+       CASE WHEN g %% 5 = 0 THEN 'ORDER' ELSE 'FILL' END,
+       CASE WHEN g %% 5 <> 0 THEN 'EXECUTED'
+            WHEN (g / 5) %% 50 = 0 THEN 'PENDING_APPROVAL'
+            WHEN (g / 5) %% 50 = 1 THEN 'APPROVED'
+            WHEN (g / 5) %% 50 = 2 THEN 'CANCELED'
+            ELSE 'FILLED' END,
+       u.ids[1 + g %% array_length(u.ids, 1)]
+FROM _pc_accounts a, _pc_users u, _pc_groups gr, generate_series(1, %(transactions)s) g;
+
+INSERT INTO news_articles (published_at, source, title, url, sentiment)
+SELECT now() - g * interval '1 minute', 'PlanCheck', 'plancheck article ' || g, 'https://example.invalid/' || g,
+       (ARRAY['positive','neutral','negative'])[1 + g %% 3]
+FROM generate_series(1, %(news)s) g;
+CREATE TEMP TABLE _pc_news ON COMMIT DROP AS
+  SELECT array_agg(id ORDER BY id) AS ids FROM news_articles WHERE source = 'PlanCheck';
+
+INSERT INTO news_ticker_map (article_id, ticker)
+SELECT n.ids[g], 'PC' || (1 + g %% %(tickers)s) FROM _pc_news n, generate_series(1, array_length(n.ids, 1)) g;
+
+INSERT INTO user_watchlist (user_id, ticker)
+SELECT u.ids[g], 'PC' || (1 + (g * 7 + k) %% %(tickers)s)
+FROM _pc_users u, generate_series(1, array_length(u.ids, 1)) g, generate_series(1, 5) k
+ON CONFLICT DO NOTHING;
+
+INSERT INTO users_news_feed (user_id, article_id, is_read)
+SELECT u.ids[1 + g %% array_length(u.ids, 1)], n.ids[1 + g %% array_length(n.ids, 1)], true
+FROM _pc_users u, _pc_news n, generate_series(1, %(news)s) g
+ON CONFLICT DO NOTHING;
+
+ANALYZE users; ANALYZE accounts; ANALYZE account_memberships; ANALYZE tickers; ANALYZE groups;
+ANALYZE transactions; ANALYZE news_articles; ANALYZE news_ticker_map; ANALYZE user_watchlist; ANALYZE users_news_feed;
+"""
+
+
+def _scans(plan: dict, out: List[Tuple[str, str, str]]):
+    rel = plan.get("Relation Name")
+    if rel:
+        out.append((plan["Node Type"], rel, plan.get("Index Name") or ""))
+    for child in plan.get("Plans", []):
+        _scans(child, out)
+    return out
+
+
+def check_query_plans(scale: float = 1.0) -> List[dict]:
+    """Returns one result per hot query: name, ok, and the (node, table, index) scans."""
+    sizes = {
+        "users": int(2000 * scale),
+        "accounts": int(4000 * scale),
+        "tickers": 300,
+        "groups": int(200 * scale),
+        "transactions": int(300_000 * scale),
+        "news": int(50_000 * scale),
+    }
+    p = get_pool()
+    conn = p.getconn()
+    try:
+        cur = conn.cursor()
+        cur.execute(SEED_SQL, sizes)
+        cur.execute("SELECT (SELECT ids[1] FROM _pc_users), (SELECT ids[1] FROM _pc_accounts), (SELECT ids[1] FROM _pc_groups)")
+        uid, aid, gid = cur.fetchone()
+        params = {"uid": uid, "aid": aid, "gid": gid, "sym": "PC1", "lim": 50}
+        results = []
+        for name, (sql, tables) in HOT_QUERIES.items():
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            raw = cur.fetchone()[0]
+            plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+            scans = _scans(plan, [])
+            ok = all(
+                any(rel == t and "Index" in node for node, rel, _ in scans)
+                and not any(rel == t and node == "Seq Scan" for node, rel, _ in scans)
+                for t in tables
+            )
+            results.append({"name": name, "ok": ok, "scans": scans})
+        cur.close()
+        return results
+    finally:
+        conn.rollback()
+        p.putconn(conn)
@@ -0,0 +1,193 @@
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from flask import Flask, jsonify, request
+from flask_jwt_extended import verify_jwt_in_request
+
+from .db import PoolPressure, db_query_one, pool_pressure
+from .response_cache import current_user_id
+
+# Endpoint class -> (tokens per second, burst). Override one with
+# RATE_LIMIT_<CLASS>=rate,burst (e.g. RATE_LIMIT_SIMULATE=0.5,5).
+DEFAULT_LIMITS: Dict[str, Tuple[float, float]] = {
+    "read": (20.0, 100.0),
+    "heavy_read": (2.0, 10.0),  # DB-bound reads: long /ohlcv windows, risk, search, exports
+    "write": (5.0, 20.0),
+    "simulate": (1.0, 5.0),
+    "auth": (0.5, 10.0),
+}
+
+# Classes the shedder may reject, and the multiple of SHED_POOL_WAIT_MS at
+# which it starts to: heavy reads go first, ordinary reads only under twice
+# the pressure. Writes and auth are never shed.
+SHED_LEVELS = {"heavy_read": 1.0, "read": 2.0}
+
+ClassArg = Union[str, Callable[[], str]]
+
+
+def _limits() -> Dict[str, Tuple[float, float]]:
+    out = dict(DEFAULT_LIMITS)
+    for name in out:
+        raw = os.getenv(f"RATE_LIMIT_{name.upper()}")
+        if raw:
+            rate, _, burst = raw.partition(",")
+            out[name] = (float(rate), float(burst or rate))
+    return out
+
+
+class TokenBuckets:
+    """In-process token buckets keyed by (client, endpoint class).
+
+    Buckets that would be full again are dropped on a periodic sweep, so
+    memory tracks the set of recently active clients rather than all of them.
+    """
+
+    def __init__(self, sweep_every: float = 60.0):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._swept = time.monotonic()
+        self.sweep_every = sweep_every
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """0 if allowed, else seconds until `cost` tokens are available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - at) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (cost - tokens) / rate
+            if now - self._swept > self.sweep_every:
+                self._sweep(now)
+        return wait
+
+    def _sweep(self, now: float):
+        # Anything idle for a full sweep interval has refilled at any sane rate
+        self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < self.sweep_every}
+        self._swept = now
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RateLimiter:
+    """Token-bucket limits per client and endpoint class, plus a load shedder.
+
+    The client is the JWT user when one is presented, else the remote address.
+    With RATE_LIMIT_BACKEND=postgres the buckets live in rate_limit_buckets
+    (migration 0006) so every worker shares one budget; if that call fails the
+    local buckets are used instead. The shedder rejects sheddable classes while
+    the primary pool's checkout wait (or its in-use share) is over threshold.
+    """
+
+    def __init__(self):
+        self.limits = _limits()
+        self.shared = os.getenv("RATE_LIMIT_BACKEND", "memory") == "postgres"
+        self.shed_wait_ms = float(os.getenv("SHED_POOL_WAIT_MS", "50"))
+        self.shed_utilization = float(os.getenv("SHED_POOL_UTILIZATION", "0.9"))
+        self.local = TokenBuckets()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, cls: str, what: str):
+        s = self.stats.setdefault(cls, {"allowed": 0, "limited": 0, "shed": 0, "shared_errors": 0})
+        s[what] += 1
+
+    def take(self, key: str, cls: str) -> float:
+        rate, burst = self.limits[cls]
+        if self.shared:
+            try:
+                row = db_query_one(
+                    "SELECT rate_limit_take(%(k)s, %(r)s, %(b)s) AS wait",
+                    {"k": key, "r": rate, "b": burst},
+                )
+                return float(row["wait"])
+            except Exception:
+                self._count(cls, "shared_errors")
+        return self.local.take(key, rate, burst)
+
+    def shed(self, cls: str) -> bool:
+        level = SHED_LEVELS.get(cls)
+        if level is None:
+            return False
+        if pool_pressure.wait_ms > self.shed_wait_ms * level:
+            return True
+        return level == 1.0 and PoolPressure.utilization() >= self.shed_utilization
+
+    def check(self, key: str, cls: str) -> Optional[Tuple[str, int, float]]:
+        """None if the request may proceed, else (reason, status, retry_after)."""
+        if self.shed(cls):
+            self._count(cls, "shed")
+            return "server busy, retry shortly", 503, 1.0
+        wait = self.take(f"{cls}:{key}", cls)
+        if wait > 0:
+            self._count(cls, "limited")
+            return "rate limit exceeded", 429, wait
+        self._count(cls, "allowed")
+        return None
+
+    def summary(self) -> dict:
+        return {
+            "backend": "postgres" if self.shared else "memory",
+            "limits": {k: {"rate": r, "burst": b} for k, (r, b) in self.limits.items()},
+            "local_buckets": len(self.local),
+            "pool": {
+                "wait_ms": round(pool_pressure.wait_ms, 2),
+                "utilization": PoolPressure.utilization(),
+                "exhausted": pool_pressure.exhausted,
+            },
+            "classes": self.stats,
+        }
+
+
+rate_limiter = RateLimiter()
+
+
+def rate_class(cls: ClassArg):
+    """Assign a view to an endpoint class (a name, or a function of the
+    request returning one). Unmarked views are "read" for GET/HEAD and
+    "write" otherwise."""
+
+    def decorator(fn):
+        fn._rate_class = cls
+        return fn
+
+    return decorator
+
+
+def _client_key() -> str:
+    try:
+        verify_jwt_in_request(optional=True)
+        uid = current_user_id()
+    except Exception:
+        uid = None  # a bad token is the view's problem; limit by address here
+    return f"u{uid}" if uid is not None else f"ip{request.remote_addr}"
+
+
+def init_rate_limits(app: Flask):
+    """Check every /api request against its class's bucket before the view runs."""
+
+    @app.before_request
+    def _limit():
+        if os.getenv("RATE_LIMIT_DISABLED") == "1" or request.method == "OPTIONS":
+            return None
+        view = app.view_functions.get(request.endpoint)
+        if view is None or not request.path.startswith("/api/") or request.path.startswith("/api/health"):
+            return None
+        cls = getattr(view, "_rate_class", None)
+        if callable(cls):
+            cls = cls()
+        cls = cls or ("read" if request.method in ("GET", "HEAD") else "write")
+        denied = rate_limiter.check(_client_key(), cls)
+        if denied is None:
+            return None
+        reason, status, retry_after = denied
+        retry_after = max(1, math.ceil(retry_after))
+        resp = jsonify({"error": reason, "retry_after": retry_after})
+        resp.headers["Retry-After"] = str(retry_after)
+        return resp, status
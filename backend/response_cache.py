@@ -0,0 +1,320 @@
+import hashlib
+import json
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from flask import Response, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+from .db import db_execute
+
+INVALIDATE_CHANNEL = "cache_invalidate"
+# Per-tag invalidation sequences kept before collapsing them to one floor
+_MAX_TAG_SEQ = 10000
+
+# Tags for an entry: a static list, or a function of the view's kwargs
+TagsArg = Union[Iterable[str], Callable[..., Iterable[str]]]
+
+
+def current_user_id() -> Optional[int]:
+    ident = get_jwt_identity() or {}
+    return ident.get("id") if isinstance(ident, dict) else None
+
+
+class _SharedDir:
+    """Optional second level shared by the workers on one host: one file per
+    entry plus one generation file per tag, under e.g. /dev/shm. An entry is
+    valid only while every tag's generation matches what it was stored with,
+    so bumping a tag invalidates it for all local processes at once.
+
+    An entry file's mtime is set to its expiry. Every `sweep_every` seconds a
+    writer deletes expired files (and leftover temp files), then the soonest
+    to expire until the directory is under `max_bytes`, so distinct query
+    strings can't fill the filesystem.
+
+    A file is one line of JSON metadata (expiry, tag generations, status,
+    mimetype) followed by the raw body, so nothing read back is executable.
+    The directory is created 0700 and refused if another user owns it or it
+    is group or world writable.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024, sweep_every: float = 30.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.sweep_every = sweep_every
+        self._swept = time.monotonic()
+        for d in (path, os.path.join(path, "tags")):
+            os.makedirs(d, mode=0o700, exist_ok=True)
+            st = os.lstat(d)
+            if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o022:
+                raise RuntimeError(f"RESPONSE_CACHE_DIR {d} must be a directory owned by this user and not group or world writable")
+
+    @staticmethod
+    def _h(s: str) -> str:
+        return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+    def _gen(self, tag: str) -> str:
+        try:
+            with open(os.path.join(self.path, "tags", self._h(tag)), "r") as f:
+                return f.read()
+        except OSError:
+            return "0"
+
+    def _write(self, name: str, data: bytes, mtime: Optional[float] = None):
+        tmp = f"{name}.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        if mtime is not None:
+            os.utime(tmp, (mtime, mtime))
+        os.replace(tmp, name)
+
+    def get(self, key: str):
+        name = os.path.join(self.path, self._h(key))
+        try:
+            with open(name, "rb") as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+            expires, gens = float(meta["expires"]), meta["gens"]
+            value = (body, int(meta["status"]), meta["mimetype"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if expires < time.time():
+            self._remove(name)
+            return None
+        if any(self._gen(t) != g for t, g in gens.items()):
+            return None
+        return expires, value
+
+    def set(self, key: str, expires: float, tags: List[str], value: tuple):
+        body, status, mimetype = value
+        meta = {"expires": expires, "gens": {t: self._gen(t) for t in tags}, "status": status, "mimetype": mimetype}
+        try:
+            self._write(os.path.join(self.path, self._h(key)), json.dumps(meta).encode() + b"\n" + body, mtime=expires)
+        except OSError:
+            pass
+        if time.monotonic() - self._swept > self.sweep_every:
+            self._swept = time.monotonic()
+            self.sweep()
+
+    @staticmethod
+    def _remove(name: str):
+        try:
+            os.remove(name)
+        except OSError:
+            pass  # another worker got there first
+
+    def sweep(self) -> int:
+        """Delete expired and over-budget entry files; returns how many were removed."""
+        now = time.time()
+        live, removed = [], 0
+        try:
+            it = os.scandir(self.path)
+        except OSError:
+            return 0
+        with it:
+            for e in it:
+                try:
+                    if not e.is_file():
+                        continue
+                    st = e.stat()
+                except OSError:
+                    continue
+                # Temp files are renamed within milliseconds; old ones are from crashed writers
+                stale_tmp = "." in e.name and st.st_mtime < now - 60
+                if stale_tmp or ("." not in e.name and st.st_mtime < now):
+                    self._remove(e.path)
+                    removed += 1
+                elif "." not in e.name:
+                    live.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in live)
+        if total > self.max_bytes:
+            for _, size, path in sorted(live):
+                self._remove(path)
+                removed += 1
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        return removed
+
+    def bump(self, tags: Iterable[str]):
+        stamp = str(time.time_ns()).encode()
+        for t in tags:
+            try:
+                self._write(os.path.join(self.path, "tags", self._h(t)), stamp)
+            except OSError:
+                pass
+
+
+class ResponseCache:
+    """Response cache for read endpoints (see cached()).
+
+    Level 1 is an in-process LRU bounded by total body bytes, with a TTL per
+    entry. Level 2, when RESPONSE_CACHE_DIR is set, is a directory shared by
+    the workers on the host. Entries carry tags ("tickers", "account:7",
+    "user:3:groups", ...); invalidate() drops every entry with a tag locally
+    and NOTIFYs other workers, which apply it via handle_notification.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, shared_dir: Optional[str] = None, shared_max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, List[str], tuple]]" = OrderedDict()
+        self._by_tag: Dict[str, set] = {}
+        self._bytes = 0
+        # Invalidation sequence, so a response computed before an invalidation
+        # of one of its tags isn't stored after it. Tags missing from _tag_seq
+        # count as invalidated at _tag_floor; collapsing the map to the floor
+        # keeps per-user tags from accumulating forever.
+        self._seq = 0
+        self._tag_seq: Dict[str, int] = {}
+        self._tag_floor = 0
+        self._lock = threading.Lock()
+        self.shared = _SharedDir(shared_dir, shared_max_bytes) if shared_dir else None
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, name: str, what: str):
+        s = self.stats.setdefault(name, {"hits": 0, "shared_hits": 0, "misses": 0, "stores": 0, "evictions": 0})
+        s[what] += 1
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(entry[2][0])
+        for t in entry[1]:
+            keys = self._by_tag.get(t)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[t]
+
+    def get(self, name: str, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._count(name, "hits")
+                    return entry[2]
+                self._drop(key)
+        if self.shared is not None:
+            hit = self.shared.get(key)
+            if hit is not None:
+                self._count(name, "shared_hits")
+                return hit[1]
+        self._count(name, "misses")
+        return None
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def set(self, name: str, key: str, ttl: float, tags: List[str], value: tuple, since_seq: Optional[int] = None):
+        if len(value[0]) > self.max_bytes // 8:
+            return  # one response shouldn't evict most of the cache
+        expires = time.time() + ttl
+        with self._lock:
+            if since_seq is not None and any(self._tag_seq.get(t, self._tag_floor) > since_seq for t in tags):
+                return
+            self._drop(key)
+            self._entries[key] = (expires, tags, value)
+            self._bytes += len(value[0])
+            for t in tags:
+                self._by_tag.setdefault(t, set()).add(key)
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self._count(name, "evictions")
+            self._count(name, "stores")
+        if self.shared is not None:
+            self.shared.set(key, expires, tags, value)
+
+    def invalidate(self, tags: Iterable[str], broadcast: bool = True):
+        tags = [t for t in tags if t]
+        if not tags:
+            return
+        with self._lock:
+            self._seq += 1
+            if len(self._tag_seq) + len(tags) > _MAX_TAG_SEQ:
+                self._collapse_tag_seq()
+            for t in tags:
+                self._tag_seq[t] = self._seq
+                for key in list(self._by_tag.get(t, ())):
+                    self._drop(key)
+        if self.shared is not None:
+            self.shared.bump(tags)
+        if broadcast:
+            try:
+                db_execute("SELECT pg_notify(%(ch)s, %(p)s)", {"ch": INVALIDATE_CHANNEL, "p": ",".join(tags)})
+            except Exception:
+                pass  # other workers fall back to TTL expiry
+
+    def handle_notification(self, payload: str):
+        self.invalidate(payload.split(","), broadcast=False)
+
+    def _collapse_tag_seq(self):
+        # Conservative: responses computed before now are refused for every tag
+        self._tag_floor = self._seq
+        self._tag_seq.clear()
+
+    def clear(self):
+        with self._lock:
+            # Also refuse responses computed before the clear
+            self._seq += 1
+            self._collapse_tag_seq()
+            self._entries.clear()
+            self._by_tag.clear()
+            self._bytes = 0
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes, "endpoints": self.stats}
+
+
+response_cache = ResponseCache(
+    int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    os.getenv("RESPONSE_CACHE_DIR") or None,
+    int(os.getenv("RESPONSE_CACHE_DIR_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+
+
+def cached(ttl: float, tags: TagsArg = (), per_user: bool = False, when: Optional[Callable[[], bool]] = None):
+    """Cache a read endpoint's 200 responses.
+
+    The key is the endpoint plus request path and query, and the caller's user
+    id when per_user is set. `when` can limit caching to some requests (e.g.
+    only without a search term). Place it below @jwt_required and
+    @conditional so auth and 304 handling still run on every request.
+    """
+
+    def decorator(fn):
+        name = fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if os.getenv("RESPONSE_CACHE_DISABLED") == "1" or (when is not None and not when()):
+                return fn(*args, **kwargs)
+            key = f"{request.endpoint}|{request.full_path}"
+            if per_user:
+                key += f"|u{current_user_id()}"
+            hit = response_cache.get(name, key)
+            if hit is not None:
+                body, status, mimetype = hit
+                resp = Response(body, status=status, mimetype=mimetype)
+                resp.headers["X-Cache"] = "HIT"
+                return resp
+            seq = response_cache.seq
+            resp = make_response(fn(*args, **kwargs))
+            if resp.status_code == 200 and not resp.direct_passthrough:
+                entry_tags = list(tags(**kwargs) if callable(tags) else tags)
+                response_cache.set(name, key, ttl, entry_tags, (resp.get_data(), resp.status_code, resp.mimetype), seq)
+            resp.headers["X-Cache"] = "MISS"
+            return resp
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..db import run_readonly
+
+BENCHMARKS = ("SPY", "QQQ")
+
+# Bucket size -> (seconds, periods per year used to annualize)
+INTERVALS = {
+    "minute": (60, 252 * 390),
+    "hour": (3600, 252 * 7),
+    "day": (86400, 252),
+}
+
+MAX_PERIODS = 2000
+# Largest ticker set priced per request; smaller positions beyond it are reported as excluded
+MAX_RISK_TICKERS = int(os.getenv("RISK_MAX_TICKERS", "300"))
+RISK_QUERY_TIMEOUT_MS = int(os.getenv("RISK_QUERY_TIMEOUT_MS", "5000"))
+MIN_OBSERVATIONS = 20
+
+Z_SCORES = {"95": 1.6448536269514722, "99": 2.3263478740408408}
+
+# tickers: column order; times: bucket start (epoch s) per price row;
+# returns: (len(times) - 1) x N log returns; last: latest close per column
+ReturnMatrix = namedtuple("ReturnMatrix", ["tickers", "times", "returns", "last"])
+
+# Last close per (ticker, bucket) over the window
+_BUCKET_CLOSES_SQL = """
+SELECT DISTINCT ON (ticker, date_trunc(%(unit)s, time))
+       ticker,
+       EXTRACT(EPOCH FROM date_trunc(%(unit)s, time))::bigint AS bucket,
+       close::float8 AS close
+FROM price_bars
+WHERE ticker = ANY(%(syms)s)
+  AND time >= date_trunc(%(unit)s, now()) - %(periods)s * ('1 ' || %(unit)s)::interval
+ORDER BY ticker, date_trunc(%(unit)s, time), time DESC
+"""
+
+
+def _load_matrix(tickers: Tuple[str, ...], unit: str, periods: int) -> ReturnMatrix:
+    def fetch(cur):
+        # Bound the scan even for hundreds of tickers over a long window
+        cur.execute("SET LOCAL statement_timeout = %s", (RISK_QUERY_TIMEOUT_MS,))
+        cur.execute(_BUCKET_CLOSES_SQL, {"unit": unit, "syms": list(tickers), "periods": periods})
+        return cur.fetchall()
+
+    rows = run_readonly(fetch, dict_cursor=False)
+    n = len(tickers)
+    if not rows:
+        return ReturnMatrix(tickers, np.array([], dtype=np.int64), np.empty((0, n)), np.full(n, np.nan))
+    col = {s: i for i, s in enumerate(tickers)}
+    sym, bucket, close = zip(*rows)
+    bucket = np.asarray(bucket, dtype=np.int64)
+    times = np.unique(bucket)
+    prices = np.full((len(times), n), np.nan)
+    prices[np.searchsorted(times, bucket), [col[s] for s in sym]] = close
+    # Forward-fill gaps (a bucket without a bar is "unchanged")
+    idx = np.where(np.isnan(prices), 0, np.arange(len(times))[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    prices = prices[idx, np.arange(n)]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.diff(np.log(prices), axis=0)
+    return ReturnMatrix(tickers, times, returns, prices[-1])
+
+
+class ReturnMatrixCache:
+    """Aligned return matrices keyed by (ticker set, interval, periods).
+
+    An entry is reused until its bucket rolls over or `ttl` seconds pass, so
+    repeated risk requests for the same book (or the same benchmark basket)
+    cost one Postgres scan per bucket instead of one per request.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Tuple[float, int, ReturnMatrix]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, tickers: Sequence[str], unit: str, periods: int) -> Tuple[ReturnMatrix, bool]:
+        key = (tuple(sorted(set(tickers))), unit, periods)
+        bucket = int(time.time()) // INTERVALS[unit][0]
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit and hit[1] == bucket and now - hit[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return hit[2], True
+        m = _load_matrix(key[0], unit, periods)
+        with self._lock:
+            self.stats["misses"] += 1
+            self._entries[key] = (now, bucket, m)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return m, False
+
+
+matrix_cache = ReturnMatrixCache(float(os.getenv("RISK_MATRIX_TTL_SECONDS", "60")))
+
+
+def _f(x) -> Optional[float]:
+    return None if x is None or not np.isfinite(x) else float(x)
+
+
+def portfolio_risk(positions: Dict[str, float], unit: str = "day", periods: int = 250) -> dict:
+    """Volatility, VaR, and beta to BENCHMARKS for {ticker: qty}.
+
+    Dollar P&L per period is approximated as market value x log return.
+    """
+    started = time.perf_counter()
+    held = [s for s, q in positions.items() if q]
+    # Over the cap, keep the largest |qty| names (prices aren't loaded yet)
+    held.sort(key=lambda s: -abs(positions[s]))
+    excluded = held[MAX_RISK_TICKERS:]
+    held = held[:MAX_RISK_TICKERS]
+    m, cached = matrix_cache.get(held + [b for b in BENCHMARKS if b not in held], unit, periods)
+    col = {s: i for i, s in enumerate(m.tickers)}
+    R = m.returns
+
+    # Drop names without enough history in the window
+    valid = np.sum(np.isfinite(R), axis=0) >= MIN_OBSERVATIONS if len(R) else np.zeros(len(m.tickers), bool)
+    names = [s for s in held if valid[col[s]] and np.isfinite(m.last[col[s]])]
+    excluded += [s for s in held if s not in names]
+    R = np.nan_to_num(R)  # leading gaps before a name's first bar count as flat
+
+    out = {
+        "interval": unit,
+        "periods": periods,
+        "observations": int(len(R)),
+        "cached": cached,
+        "excluded": excluded,
+    }
+    if not names:
+        out.update({"positions": [], "elapsed_ms": (time.perf_counter() - started) * 1000})
+        return out
+
+    cols = np.array([col[s] for s in names])
+    qty = np.array([positions[s] for s in names], dtype=np.float64)
+    last = m.last[cols]
+    mv = qty * last
+    gross = float(np.abs(mv).sum())
+    Rh = R[:, cols]
+    cov = np.atleast_2d(np.cov(Rh, rowvar=False))
+    cov_mv = cov @ mv
+    var_p = float(mv @ cov_mv)
+    sigma = var_p ** 0.5
+    pnl = Rh @ mv
+    ppy = INTERVALS[unit][1]
+
+    betas: Dict[str, Optional[float]] = {}
+    asset_betas: Dict[str, np.ndarray] = {}
+    centered = Rh - Rh.mean(axis=0)
+    for b in BENCHMARKS:
+        if not valid[col[b]]:
+            betas[b] = None
+            continue
+        rb = R[:, col[b]]
+        vb = rb.var(ddof=1)
+        if not vb:
+            betas[b] = None
+            continue
+        asset_betas[b] = centered.T @ (rb - rb.mean()) / (len(rb) - 1) / vb
+        # Portfolio beta: market-value weighted asset betas over gross exposure
+        betas[b] = float(asset_betas[b] @ mv / gross) if gross else None
+
+    out.update({
+        "gross_exposure": gross,
+        "net_exposure": float(mv.sum()),
+        "volatility": {
+            "per_period": sigma,
+            "annualized": sigma * ppy ** 0.5,
+            "annualized_pct": sigma * ppy ** 0.5 / gross * 100 if gross else None,
+        },
+        "var": {
+            level: {
+                "parametric": z * sigma,
+                "historical": _f(-np.percentile(pnl, 100 - float(level))),
+            }
+            for level, z in Z_SCORES.items()
+        },
+        "beta": betas,
+    })
+    vol = Rh.std(axis=0, ddof=1) * ppy ** 0.5
+    contrib = mv * cov_mv / var_p if var_p else np.zeros(len(names))
+    positions_out = []
+    for i, s in enumerate(names):
+        row = {
+            "ticker": s,
+            "qty": float(qty[i]),
+            "last": float(last[i]),
+            "market_value": float(mv[i]),
+            "weight": float(mv[i] / gross) if gross else None,
+            "volatility_annualized": _f(vol[i]),
+            "risk_contribution": _f(contrib[i]),
+        }
+        for b in BENCHMARKS:
+            row[f"beta_{b}"] = _f(asset_betas[b][i]) if b in asset_betas else None
+        positions_out.append(row)
+    positions_out.sort(key=lambda r: -abs(r["market_value"]))
+    out["positions"] = positions_out
+    out["elapsed_ms"] = (time.perf_counter() - started) * 1000
+    return out
@@ -0,0 +1,191 @@
+import os
+import threading
+from array import array
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from ..db import db_query
+
+# Typed-array columns of the most recent bars, oldest first (copies, taken
+# under the store lock, so later appends never show through).
+BarWindow = namedtuple("BarWindow", ["time", "open", "high", "low", "close", "volume", "source"])
+
+_SOURCES = ["SIM", "REAL"]
+
+
+def to_epoch_us(ts: datetime) -> int:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(ts.timestamp() * 1_000_000)
+
+
+def from_epoch_us(us: int) -> datetime:
+    return datetime.fromtimestamp(us / 1_000_000, tz=timezone.utc)
+
+
+def _source_code(src: Optional[str]) -> int:
+    src = (src or "SIM").upper()
+    if src not in _SOURCES:
+        _SOURCES.append(src)
+    return _SOURCES.index(src)
+
+
+class _Ring:
+    """Fixed-capacity ring of bars stored as typed columns.
+
+    Each column is allocated at twice the capacity and every bar is written to
+    slot i and i + capacity, so the newest k bars are always one contiguous
+    range and a window is a single slice copy per column.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.count = 0
+        self.pos = 0
+        n = capacity * 2
+        self.time = array("q", bytes(8 * n))
+        self.open = array("d", bytes(8 * n))
+        self.high = array("d", bytes(8 * n))
+        self.low = array("d", bytes(8 * n))
+        self.close = array("d", bytes(8 * n))
+        self.volume = array("q", bytes(8 * n))
+        self.source = array("b", bytes(n))
+
+    def append(self, t: int, o: float, h: float, l: float, c: float, v: int, src: int):
+        if self.count and t <= self.time[self.pos - 1 + self.capacity]:
+            return  # out-of-order or duplicate bar; the DB stays authoritative
+        for i in (self.pos, self.pos + self.capacity):
+            self.time[i] = t
+            self.open[i] = o
+            self.high[i] = h
+            self.low[i] = l
+            self.close[i] = c
+            self.volume[i] = v
+            self.source[i] = src
+        self.pos = (self.pos + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def window(self, k: int) -> BarWindow:
+        k = min(k, self.count)
+        end = self.pos + self.capacity
+        start = end - k
+        return BarWindow(*(
+            col[start:end]
+            for col in (self.time, self.open, self.high, self.low, self.close, self.volume, self.source)
+        ))
+
+
+class BarStore:
+    """Per-ticker in-memory history of the most recent bars.
+
+    A ticker's ring is primed from Postgres on first use and then kept current
+    by the simulator. Requests for more bars than are held fall back to the DB.
+    At most `max_symbols` rings are kept, least recently read evicted first,
+    and tickers without any bars get none. Bars appended while a ring is being
+    primed are buffered and replayed onto it, so none fall between the
+    priming query and the ring going live.
+    """
+
+    def __init__(self, capacity: int = 2000, max_symbols: int = 500):
+        self.capacity = capacity
+        self.max_symbols = max_symbols
+        self._rings: "OrderedDict[str, _Ring]" = OrderedDict()
+        self._priming: Dict[str, List[Tuple]] = {}
+        self._lock = threading.Lock()
+        self.generation = 0  # bumped by clear(), so derived caches can tell held history was dropped
+
+    def _prime(self, sym: str) -> _Ring:
+        ring = _Ring(self.capacity)
+        rows = db_query(
+            """
+            SELECT time,
+                   open::float8 AS open,
+                   high::float8 AS high,
+                   low::float8 AS low,
+                   close::float8 AS close,
+                   volume,
+                   source
+            FROM price_bars WHERE ticker = %(sym)s
+            ORDER BY time DESC
+            LIMIT %(lim)s
+            """,
+            {"sym": sym, "lim": self.capacity},
+        )
+        for r in reversed(rows):
+            ring.append(
+                to_epoch_us(r["time"]), r["open"], r["high"], r["low"], r["close"],
+                int(r.get("volume") or 0), _source_code(r.get("source")),
+            )
+        return ring
+
+    def _ring(self, sym: str) -> _Ring:
+        with self._lock:
+            ring = self._rings.get(sym)
+            if ring is not None:
+                self._rings.move_to_end(sym)
+                return ring
+            pending = self._priming.setdefault(sym, [])
+        primed = self._prime(sym)
+        with self._lock:
+            ring = self._rings.get(sym)
+            if ring is not None:
+                return ring  # a concurrent reader installed it first
+            for args in pending:
+                primed.append(*args)  # anything the query already had is skipped
+            # Install unless clear() ran meanwhile (its data may be stale)
+            if self._priming.get(sym) is pending:
+                del self._priming[sym]
+                if primed.count:
+                    self._rings[sym] = primed
+                    while len(self._rings) > self.max_symbols:
+                        self._rings.popitem(last=False)
+        return primed
+
+    def append(self, sym: str, bar: dict):
+        """Record a freshly inserted bar. Tickers not held are skipped; their
+        first read loads from the DB and will include this bar."""
+        t = bar["time"]
+        args = (
+            to_epoch_us(t) if isinstance(t, datetime) else int(t),
+            float(bar["open"]), float(bar["high"]), float(bar["low"]), float(bar["close"]),
+            int(bar.get("volume") or 0), _source_code(bar.get("source")),
+        )
+        with self._lock:
+            ring = self._rings.get(sym)
+            if ring is not None:
+                ring.append(*args)
+            elif sym in self._priming:
+                self._priming[sym].append(args)
+
+    def window(self, sym: str, limit: int) -> Optional[BarWindow]:
+        """Newest `limit` bars for `sym`, or None when the ring can't cover it."""
+        ring = self._ring(sym)
+        with self._lock:
+            if limit > ring.count and ring.count == ring.capacity:
+                return None
+            return ring.window(limit)
+
+    def latest_time(self, sym: str) -> Optional[int]:
+        """Epoch-us time of the newest held bar, or None if `sym` isn't primed."""
+        with self._lock:
+            ring = self._rings.get(sym)
+            if ring is None or not ring.count:
+                return None
+            return ring.time[ring.pos - 1 + ring.capacity]
+
+    def source_name(self, code: int) -> str:
+        return _SOURCES[code]
+
+    def clear(self, sym: Optional[str] = None):
+        with self._lock:
+            self.generation += 1
+            if sym is None:
+                self._rings.clear()
+                self._priming.clear()
+            else:
+                self._rings.pop(sym, None)
+                self._priming.pop(sym, None)
+
+
+bar_store = BarStore(int(os.getenv("BAR_STORE_CAPACITY", "2000")), int(os.getenv("BAR_STORE_MAX_SYMBOLS", "500")))
@@ -2,6 +2,8 @@ import csv
 from datetime import datetime
 from typing import Iterable
 from ..db import get_conn_cursor
+from ..response_cache import response_cache
+from .ticks import publish_reprime, reprime
 
 
 def load_tickers_csv(path: str):
@@ -22,11 +24,13 @@ def load_tickers_csv(path: str):
                     """,
                     {"s": sym, "n": name, "a": asset},
                 )
+    response_cache.invalidate(["tickers"])
 
 
 def load_price_bars_csv(path: str, source: str = "REAL"):
     with open(path, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
+        loaded = set()
         with get_conn_cursor(True) as (_, cur):
             for row in reader:
                 sym = (row.get("ticker") or row.get("symbol") or "").upper()
@@ -55,6 +59,11 @@ def load_price_bars_csv(path: str, source: str = "REAL"):
                         "src": source,
                     },
                 )
+                loaded.add(sym)
+            # Rings and snapshots hold a contiguous run of recent bars; rather
+            # than replay the import, every worker reloads these tickers
+            publish_reprime(cur, loaded)
+    reprime(loaded)
 
 
 def load_news_csv(path: str):
@@ -93,3 +102,4 @@ def load_news_csv(path: str):
                             """,
                             {"aid": art_id, "sym": tck},
                         )
+    response_cache.invalidate(["news"])
@@ -0,0 +1,270 @@
+import math
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .bar_store import BarWindow, bar_store
+
+# Weight left on an exponential recurrence's seed once warmed up: small enough
+# that a series computed from any window start agrees with one stepped forward
+_SEED_WEIGHT = 1e-12
+
+
+def _f64(col) -> np.ndarray:
+    # BarWindow columns are typed arrays: wrap their buffers without copying
+    return np.frombuffer(col, dtype=np.float64) if isinstance(col, array) else np.asarray(col, dtype=np.float64)
+
+
+def _i64(col) -> np.ndarray:
+    return np.frombuffer(col, dtype=np.int64) if isinstance(col, array) else np.asarray(col, dtype=np.int64)
+
+
+def _converged(alpha: float) -> int:
+    """Bars after which a seed's weight in x += alpha * (v - x) is below _SEED_WEIGHT."""
+    return 0 if alpha >= 1.0 else math.ceil(math.log(_SEED_WEIGHT) / math.log(1.0 - alpha))
+
+
+# Window reductions use the same per-window sum as the step functions (not a
+# running cumsum), so full and incremental values are bit-for-bit equal.
+def _rolling_mean(x: np.ndarray, n: int) -> np.ndarray:
+    out = np.full(x.shape, np.nan)
+    if len(x) >= n:
+        out[n - 1:] = sliding_window_view(x, n).mean(axis=1)
+    return out
+
+
+def _rolling_sum(x: np.ndarray, n: int) -> np.ndarray:
+    out = np.full(x.shape, np.nan)
+    if len(x) >= n:
+        out[n - 1:] = sliding_window_view(x, n).sum(axis=1)
+    return out
+
+
+def _rolling_std(x: np.ndarray, n: int) -> np.ndarray:
+    out = np.full(x.shape, np.nan)
+    if len(x) >= n:
+        out[n - 1:] = sliding_window_view(x, n).std(axis=1)
+    return out
+
+
+# Each indicator: full(win, p) -> (outputs, state) over the whole window, and
+# step(state, win, p) -> (outputs for the newest bar, state), which only
+# looks at the last `period` bars or the carried state. A step returning
+# None means "can't continue incrementally"; the series is recomputed. EMA and
+# RSI carry state from the window start, so their warm-up runs until the seed
+# no longer matters (see _converged) and both paths give the same series.
+
+def _sma_full(w: BarWindow, p: dict):
+    return {"sma": _rolling_mean(_f64(w.close), p["period"])}, None
+
+
+def _sma_step(state, w: BarWindow, p: dict):
+    c = _f64(w.close)[-p["period"]:]
+    return {"sma": c.mean() if len(c) == p["period"] else np.nan}, state
+
+
+def _ema_full(w: BarWindow, p: dict):
+    c = _f64(w.close)
+    out = np.full(c.shape, np.nan)
+    n = p["period"]
+    if len(c) >= n:
+        alpha = 2.0 / (n + 1)
+        e = c[:n].mean()  # seed with the first SMA
+        out[n - 1] = e
+        for i in range(n, len(c)):
+            e += alpha * (c[i] - e)
+            out[i] = e
+        return {"ema": out}, e
+    return {"ema": out}, None
+
+
+def _ema_step(state, w: BarWindow, p: dict):
+    if state is None:
+        return None, None  # not warmed up yet; caller recomputes
+    c = _f64(w.close)[-1]
+    e = state + 2.0 / (p["period"] + 1) * (c - state)
+    return {"ema": e}, e
+
+
+def _rsi_full(w: BarWindow, p: dict):
+    c = _f64(w.close)
+    n = p["period"]
+    out = np.full(c.shape, np.nan)
+    if len(c) <= n:
+        return {"rsi": out}, None
+    d = np.diff(c)
+    gain, loss = np.clip(d, 0, None), np.clip(-d, 0, None)
+    ag, al = gain[:n].mean(), loss[:n].mean()
+    out[n] = 100.0 if al == 0 else 100.0 - 100.0 / (1 + ag / al)
+    for i in range(n, len(d)):
+        # Wilder smoothing
+        ag = (ag * (n - 1) + gain[i]) / n
+        al = (al * (n - 1) + loss[i]) / n
+        out[i + 1] = 100.0 if al == 0 else 100.0 - 100.0 / (1 + ag / al)
+    return {"rsi": out}, (ag, al)
+
+
+def _rsi_step(state, w: BarWindow, p: dict):
+    if state is None:
+        return None, None
+    n = p["period"]
+    c = _f64(w.close)[-2:]
+    d = c[1] - c[0]
+    ag = (state[0] * (n - 1) + max(d, 0.0)) / n
+    al = (state[1] * (n - 1) + max(-d, 0.0)) / n
+    return {"rsi": 100.0 if al == 0 else 100.0 - 100.0 / (1 + ag / al)}, (ag, al)
+
+
+def _vwap_full(w: BarWindow, p: dict):
+    # Rolling VWAP on typical price over the last `period` bars
+    n = p["period"]
+    tp = (_f64(w.high) + _f64(w.low) + _f64(w.close)) / 3.0
+    v = _i64(w.volume).astype(np.float64)
+    pv, sv = _rolling_sum(tp * v, n), _rolling_sum(v, n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.where(sv > 0, pv / sv, np.where(np.isnan(sv), np.nan, tp))
+    return {"vwap": out}, None
+
+
+def _vwap_step(state, w: BarWindow, p: dict):
+    n = p["period"]
+    if len(w.close) < n:
+        return {"vwap": np.nan}, state
+    tp = (_f64(w.high)[-n:] + _f64(w.low)[-n:] + _f64(w.close)[-n:]) / 3.0
+    v = _i64(w.volume)[-n:].astype(np.float64)
+    sv = v.sum()
+    return {"vwap": (tp * v).sum() / sv if sv > 0 else tp[-1]}, state
+
+
+def _bbands_full(w: BarWindow, p: dict):
+    c = _f64(w.close)
+    mid, sd = _rolling_mean(c, p["period"]), _rolling_std(c, p["period"])
+    return {"middle": mid, "upper": mid + p["k"] * sd, "lower": mid - p["k"] * sd}, None
+
+
+def _bbands_step(state, w: BarWindow, p: dict):
+    c = _f64(w.close)[-p["period"]:]
+    if len(c) < p["period"]:
+        return {"middle": np.nan, "upper": np.nan, "lower": np.nan}, state
+    mid, sd = c.mean(), c.std()
+    return {"middle": mid, "upper": mid + p["k"] * sd, "lower": mid - p["k"] * sd}, state
+
+
+INDICATORS = {
+    # name -> (full, step, default params, warm-up bars needed beyond the output)
+    "sma": (_sma_full, _sma_step, {"period": 20}, lambda p: p["period"]),
+    "ema": (_ema_full, _ema_step, {"period": 20}, lambda p: p["period"] + _converged(2.0 / (p["period"] + 1))),
+    "rsi": (_rsi_full, _rsi_step, {"period": 14}, lambda p: p["period"] + 1 + _converged(1.0 / p["period"])),
+    "vwap": (_vwap_full, _vwap_step, {"period": 20}, lambda p: p["period"]),
+    "bbands": (_bbands_full, _bbands_step, {"period": 20, "k": 2.0}, lambda p: p["period"]),
+}
+
+
+class _Series:
+    __slots__ = ("last_t", "time", "values", "state", "generation")
+
+    def __init__(self, last_t: int, time: np.ndarray, values: Dict[str, np.ndarray], state, generation: int = 0):
+        self.last_t, self.time, self.values, self.state = last_t, time, values, state
+        self.generation = generation
+
+
+class IndicatorCache:
+    """Indicator series per (symbol, indicator, params, limit), computed over
+    the bar store's typed columns.
+
+    A hit requires the cached last-bar time to match the store's, and no
+    bar store clear (a reconnect or bulk reload) since it was built. When newer
+    bars have arrived only those bars are stepped (O(period) or O(1) each)
+    and appended; the series is recomputed in full only on a cold cache or
+    when it has fallen too far behind.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, _Series]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "steps": 0, "full": 0}
+
+    def get(self, sym: str, name: str, params: dict, limit: int) -> Optional[dict]:
+        full, step, _, warmup = INDICATORS[name]
+        need = limit + warmup(params)
+        if need > bar_store.capacity:
+            return None  # more history than the ring holds
+        generation = bar_store.generation  # read first: a clear during window() forces a rebuild next time
+        win = bar_store.window(sym, need)
+        if win is None or not len(win.time):
+            return None
+        last_t = int(win.time[-1])
+        key = (sym, name, tuple(sorted(params.items())), limit)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None and entry.generation != generation:
+            entry = None  # history may have been rewritten under it
+        if entry is not None and entry.last_t == last_t:
+            self.stats["hits"] += 1
+            return self._out(entry)
+        if entry is not None and entry.last_t < last_t:
+            entry = self._advance(entry, win, step, params, limit)
+        else:
+            entry = None
+        if entry is None:
+            values, state = full(win, params)
+            t = _i64(win.time).copy()
+            entry = _Series(last_t, t[-limit:], {k: v[-limit:].copy() for k, v in values.items()}, state, generation)
+            self.stats["full"] += 1
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return self._out(entry)
+
+    def _advance(self, entry: _Series, win: BarWindow, step, params: dict, limit: int) -> Optional[_Series]:
+        times = _i64(win.time)
+        new = np.nonzero(times > entry.last_t)[0]
+        if not len(new) or new[0] == 0 or len(new) > limit:
+            return None
+        # Zero-copy views, so each step's window below is a slice, not a copy
+        cols = [np.frombuffer(c, dtype=c.typecode) if isinstance(c, array) else np.asarray(c) for c in win]
+        state, points = entry.state, []
+        for i in new:
+            # Step with the window ending at bar i so lookbacks see only the past
+            sub = BarWindow(*(col[: i + 1] for col in cols))
+            point, state = step(state, sub, params)
+            if point is None:
+                return None
+            points.append(point)
+        self.stats["steps"] += len(points)
+        values = {
+            k: np.concatenate((v, [pt[k] for pt in points]))[-limit:] for k, v in entry.values.items()
+        }
+        time = np.concatenate((entry.time, times[new]))[-limit:]
+        return _Series(int(times[-1]), time, values, state, entry.generation)
+
+    @staticmethod
+    def _out(entry: _Series) -> dict:
+        out = {"time_ms": (entry.time // 1000).tolist()}
+        for k, v in entry.values.items():
+            out[k] = [None if np.isnan(x) else float(x) for x in v]
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def compute(win: BarWindow, name: str, params: dict, limit: int) -> dict:
+    """Uncached full computation, for windows longer than the bar store holds."""
+    values, _ = INDICATORS[name][0](win, params)
+    out = {"time_ms": (_i64(win.time)[-limit:] // 1000).tolist()}
+    for k, v in values.items():
+        out[k] = [None if np.isnan(x) else float(x) for x in v[-limit:]]
+    return out
+
+
+indicator_cache = IndicatorCache()
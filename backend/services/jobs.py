@@ -0,0 +1,193 @@
+import atexit
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import psycopg2
+
+from ..db import _normalize_dsn
+
+
+class Job:
+    """A periodic job plus its timing/health counters."""
+
+    def __init__(self, name: str, fn: Callable[[], None], interval: float, jitter: float = 0.1, max_backoff: float = 300.0):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.next_run = 0.0
+        self.failures = 0
+        self.is_leader = False
+        self.runs = 0
+        self.errors = 0
+        self.last_duration: Optional[float] = None
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.last_error: Optional[str] = None  # exception class name only
+        self.last_run_at: Optional[float] = None
+
+    def schedule_next(self, now: float):
+        if self.failures:
+            delay = min(self.interval * (2 ** self.failures), self.max_backoff)
+        else:
+            delay = self.interval
+        self.next_run = now + delay + random.uniform(0, self.jitter * self.interval)
+
+    def stats(self) -> dict:
+        """Timings and health for /api/health/jobs. That endpoint is public, so
+        errors are reported by exception class only: messages can carry DSNs,
+        hostnames or SQL."""
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "leader": self.is_leader,
+            "runs": self.runs,
+            "errors": self.errors,
+            "consecutive_failures": self.failures,
+            "last_duration_ms": self.last_duration * 1000 if self.last_duration is not None else None,
+            "avg_duration_ms": (self.total_duration / self.runs * 1000) if self.runs else None,
+            "max_duration_ms": self.max_duration * 1000,
+            "last_error": self.last_error,
+            "last_run_at": self.last_run_at,
+        }
+
+
+class JobRunner:
+    """Runs periodic jobs on one thread, with leader election per job.
+
+    Each job is guarded by a session-level Postgres advisory lock held on a
+    dedicated connection, so across all worker processes exactly one runs a
+    given job. If the leader dies its connection closes, the lock is released
+    and another process picks the job up on its next tick.
+    """
+
+    def __init__(self, dsn: Optional[str] = None):
+        self.dsn = dsn
+        self.jobs: Dict[str, Job] = {}
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, name: str, fn: Callable[[], None], interval: float, **kwargs) -> Job:
+        job = Job(name, fn, interval, **kwargs)
+        self.jobs[name] = job
+        return job
+
+    def _lock_conn(self):
+        if self._conn is None or self._conn.closed:
+            dsn = self.dsn or os.getenv("DATABASE_URL")
+            if not dsn:
+                raise RuntimeError("DATABASE_URL not set (postgres DSN)")
+            # Keepalives so a dead peer fails the next ping instead of hanging it
+            self._conn = psycopg2.connect(
+                _normalize_dsn(dsn), keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3
+            )
+            self._conn.autocommit = True
+            for job in self.jobs.values():
+                job.is_leader = False
+        return self._conn
+
+    def _acquire(self, job: Job) -> bool:
+        """Take, or confirm we still hold, the job's lock. This queries the lock
+        connection every cycle: psycopg2 only notices a dropped connection when
+        it is used, and without the round trip a leader whose session (and so
+        lock) is gone would keep running the job alongside the new leader."""
+        key = "job:" + job.name
+        try:
+            with self._lock_conn().cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (key,))
+                held = bool(cur.fetchone()[0])
+                if held and job.is_leader:
+                    # Session locks stack; drop the extra hold just taken
+                    cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (key,))
+                job.is_leader = held
+        except psycopg2.Error:
+            # Lost the lock connection: drop leadership everywhere and retry next tick
+            self._close()
+        return job.is_leader
+
+    def _run(self, job: Job):
+        start = time.perf_counter()
+        try:
+            job.fn()
+            job.failures = 0
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.errors += 1
+            job.last_error = type(e).__name__
+        elapsed = time.perf_counter() - start
+        job.runs += 1
+        job.last_duration = elapsed
+        job.total_duration += elapsed
+        job.max_duration = max(job.max_duration, elapsed)
+        job.last_run_at = time.time()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for job in self.jobs.values():
+                if self._stop.is_set():
+                    break
+                if now < job.next_run:
+                    continue
+                if self._acquire(job):
+                    self._run(job)
+                job.schedule_next(time.monotonic())
+            pending = [j.next_run for j in self.jobs.values()]
+            wait = (min(pending) - time.monotonic()) if pending else 1.0
+            self._stop.wait(max(0.05, min(wait, 1.0)))
+        self._close()
+
+    def _close(self):
+        for job in self.jobs.values():
+            job.is_leader = False
+        if self._conn is not None:
+            try:
+                self._conn.close()  # releases all advisory locks held by this session
+            except psycopg2.Error:
+                pass
+            self._conn = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="job-runner", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> List[dict]:
+        return [j.stats() for j in self.jobs.values()]
+
+
+runner = JobRunner()
+
+
+def start_jobs(app=None):
+    """Register the periodic jobs and start the runner.
+    Set JOBS_DISABLED=1 to skip entirely, SIM_DISABLED=1 to drop just the simulator.
+    Intervals: SIM_INTERVAL_SECONDS, LEADERBOARD_REFRESH_SECONDS,
+    SNAPSHOT_INTERVAL_SECONDS, RETENTION_INTERVAL_SECONDS.
+    """
+    if os.getenv("JOBS_DISABLED") == "1":
+        return runner
+    from .simulator import simulate_all
+    from .maintenance import refresh_leaderboard, snapshot_account_values, apply_retention
+
+    if os.getenv("SIM_DISABLED") != "1":
+        runner.add("price-sim", simulate_all, float(os.getenv("SIM_INTERVAL_SECONDS", "2")), jitter=0.0)
+    runner.add("leaderboard-refresh", refresh_leaderboard, float(os.getenv("LEADERBOARD_REFRESH_SECONDS", "10")))
+    runner.add("account-snapshots", snapshot_account_values, float(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "300")))
+    runner.add("retention", apply_retention, float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600")))
+    runner.start()
+    return runner
@@ -0,0 +1,50 @@
+import os
+from datetime import datetime, timedelta
+
+from ..db import db_execute
+from ..response_cache import response_cache
+
+
+def refresh_leaderboard():
+    # CONCURRENTLY keeps /leaderboard readable while the snapshot rebuilds
+    db_execute("REFRESH MATERIALIZED VIEW CONCURRENTLY leaderboard_snapshot")
+    response_cache.invalidate(["leaderboard"])
+
+
+def snapshot_account_values():
+    db_execute(
+        """
+        INSERT INTO account_value_snapshots (account_id, taken_at, account_value, pnl)
+        SELECT p.account_id, now(), p.account_value, p.basic_pnl
+        FROM account_pnl_basic p
+        """
+    )
+
+
+def apply_retention():
+    """Trim value snapshots past their retention window, and simulated bars
+    too when SIM_BAR_RETENTION_DAYS is set (they are user-visible history, so
+    that is opt-in). Deletes in batches so a backlog doesn't hold long locks."""
+    snap_cutoff = datetime.utcnow() - timedelta(days=int(os.getenv("SNAPSHOT_RETENTION_DAYS", "90")))
+    bar_days = os.getenv("SIM_BAR_RETENTION_DAYS")
+    if bar_days:
+        _delete_sim_bars(datetime.utcnow() - timedelta(days=int(bar_days)), int(os.getenv("RETENTION_BATCH_SIZE", "5000")))
+    db_execute("DELETE FROM account_value_snapshots WHERE taken_at < %(cutoff)s", {"cutoff": snap_cutoff})
+    if os.getenv("RATE_LIMIT_BACKEND") == "postgres":
+        # Idle buckets are full again; dropping them only forgets that
+        db_execute("DELETE FROM rate_limit_buckets WHERE updated_at < now() - interval '1 hour'")
+
+
+def _delete_sim_bars(bar_cutoff: datetime, batch: int):
+    while db_execute(
+        """
+        DELETE FROM price_bars
+        WHERE (ticker, time) IN (
+          SELECT ticker, time FROM price_bars
+          WHERE source = 'SIM' AND time < %(cutoff)s
+          LIMIT %(lim)s
+        )
+        """,
+        {"cutoff": bar_cutoff, "lim": batch},
+    ) >= batch:
+        pass
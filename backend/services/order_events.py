@@ -0,0 +1,89 @@
+from typing import List, Optional, Tuple
+
+from ..db import db_query
+
+EVENTS = ("created", "approved", "filled", "canceled")
+
+
+class OrderEventBatch:
+    """Order events collected during one transaction and appended with a
+    single INSERT, so approving N orders costs one round trip, not 2N."""
+
+    def __init__(self):
+        self._rows: List[tuple] = []
+
+    def add(self, event: str, order: dict, status: str, actor_id: Optional[int], price: Optional[float] = None):
+        """`order` is a transactions row (id, account_id, ticker, side, qty, price)."""
+        self._rows.append((
+            order["id"],
+            order["account_id"],
+            event,
+            status,
+            order["ticker"],
+            order["side"],
+            float(order["qty"]),
+            float(price if price is not None else order["price"]),
+            actor_id,
+        ))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def flush(self, cur):
+        """Append the collected events on `cur`'s transaction."""
+        if not self._rows:
+            return
+        cols = list(zip(*self._rows))
+        cur.execute(
+            """
+            INSERT INTO order_events (order_id, account_id, event, status, ticker, side, qty, price, actor_id)
+            SELECT order_id, account_id, event, status, ticker, side, qty, price, actor_id
+            FROM unnest(
+                %s::int[], %s::int[], %s::text[], %s::text[], %s::text[],
+                %s::text[], %s::numeric[], %s::numeric[], %s::int[]
+            ) WITH ORDINALITY AS e(order_id, account_id, event, status, ticker, side, qty, price, actor_id, n)
+            ORDER BY n
+            """,
+            [list(c) for c in cols],
+        )
+        self._rows.clear()
+
+
+def parse_offset(raw: Optional[str]) -> Tuple[int, int]:
+    """Offsets are "<xid>:<id>" as returned in `next_offset`; empty means the start."""
+    if not raw:
+        return 0, 0
+    xid, _, eid = raw.partition(":")
+    return int(xid), int(eid or 0)
+
+
+def read_events(after: Tuple[int, int], limit: int = 500, account_id: Optional[int] = None) -> dict:
+    """Events after an offset, oldest first.
+
+    Ids are handed out before commit, so a plain `id > offset` tail could pass
+    over an event whose transaction commits after a later one's. Events are
+    instead ordered by writing transaction, then id, and only returned once
+    their transaction is older than every transaction still running (the
+    snapshot's xmin): nothing can later appear before the returned offset.
+    """
+    rows = db_query(
+        """
+        SELECT e.xid::text::bigint AS xid, e.id, e.order_id, e.account_id, e.event, e.status,
+               e.ticker, e.side, e.qty::float8 AS qty, e.price::float8 AS price,
+               e.actor_id, e.at
+        FROM order_events e
+        WHERE (e.xid, e.id) > (%(xid)s::text::xid8, %(id)s::bigint)
+          AND e.xid < pg_snapshot_xmin(pg_current_snapshot())
+          AND (%(aid)s::int IS NULL OR e.account_id = %(aid)s::int)
+        ORDER BY e.xid, e.id
+        LIMIT %(lim)s
+        """,
+        {"xid": after[0], "id": after[1], "aid": account_id, "lim": limit},
+        readonly=True,
+    )
+    for r in rows:
+        r["offset"] = f"{r.pop('xid')}:{r['id']}"
+    return {
+        "events": rows,
+        "next_offset": rows[-1]["offset"] if rows else (f"{after[0]}:{after[1]}" if any(after) else ""),
+    }
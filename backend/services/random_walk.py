@@ -2,6 +2,7 @@ import math
 import random
 from datetime import datetime, timedelta
 from ..db import get_conn_cursor
+from .ticks import publish_reprime, reprime
 
 
 def generate_random_walk(symbol: str, start_price: float, bars: int = 200, minutes: int = 60):
@@ -37,3 +38,7 @@ def generate_random_walk(symbol: str, start_price: float, bars: int = 200, minut
                 },
             )
             price = new_price
+        if bars:
+            publish_reprime(cur, [symbol])
+    if bars:
+        reprime([symbol])
@@ -0,0 +1,188 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..db import db_execute, db_query_one_prepared, execute_prepared, prepared
+
+APPROVAL_NOTIONAL_THRESHOLD = 10000  # simplistic rule
+MAX_POSITION_ABS_QTY = 1000  # require approval if exceeded
+
+# What a rule sees: the order plus cached account state
+OrderCheck = namedtuple("OrderCheck", ["account_id", "symbol", "side", "qty", "price", "notional", "new_pos", "limits"])
+Rule = Callable[[OrderCheck], Optional[str]]
+
+_ACCOUNT_LIMITS = prepared(
+    "risk_account_limits",
+    """
+    SELECT
+      max_order_notional::float8 AS max_order_notional,
+      max_position_abs_qty::float8 AS max_position_abs_qty,
+      COALESCE(earnings_lockout, false) AS earnings_lockout
+    FROM accounts WHERE id = $1
+    """,
+)
+_NET_POSITION = prepared(
+    "risk_net_position",
+    """
+    SELECT COALESCE(SUM(CASE WHEN side='BUY' THEN qty ELSE -qty END), 0)::float8 AS qty
+    FROM transactions
+    WHERE account_id = $1 AND ticker = $2 AND kind = 'FILL' AND status IN ('EXECUTED','FILLED')
+    """,
+)
+
+INVALIDATE_CHANNEL = "risk_invalidate"
+
+
+def _global_notional(o: OrderCheck) -> Optional[str]:
+    return "notional over approval threshold" if o.notional > APPROVAL_NOTIONAL_THRESHOLD else None
+
+
+def _global_position(o: OrderCheck) -> Optional[str]:
+    return "position over approval threshold" if abs(o.new_pos) > MAX_POSITION_ABS_QTY else None
+
+
+def _earnings_lockout(o: OrderCheck) -> Optional[str]:
+    return "earnings lockout" if o.limits.get("earnings_lockout") else None
+
+
+def _account_notional(o: OrderCheck) -> Optional[str]:
+    cap = o.limits.get("max_order_notional")
+    return "over account max_order_notional" if cap is not None and o.notional > cap else None
+
+
+def _account_position(o: OrderCheck) -> Optional[str]:
+    cap = o.limits.get("max_position_abs_qty")
+    return "over account max_position_abs_qty" if cap is not None and abs(o.new_pos) > cap else None
+
+
+# Tiers: "approval" rules route an order to a manager; "account" rules are the
+# account's own limits, which also hard-block processing (see process_order).
+RULES: Dict[str, Tuple[str, Rule]] = {
+    "notional": ("approval", _global_notional),
+    "position": ("approval", _global_position),
+    "earnings_lockout": ("account", _earnings_lockout),
+    "account_notional": ("account", _account_notional),
+    "account_position": ("account", _account_position),
+}
+
+
+class RiskEngine:
+    """Pre-trade risk checks evaluated from in-process state.
+
+    Account limits and net positions are loaded on first use and cached for
+    up to `ttl` seconds; update_risk and fills invalidate them (and NOTIFY
+    other workers to do the same), so a check is a couple of dict lookups plus
+    the configured rule functions. The TTL bounds staleness where a NOTIFY is
+    missed or no listener runs. Enabled rules come from RISK_RULES
+    (comma-separated names from RULES).
+    """
+
+    def __init__(self, rule_names: Optional[List[str]] = None, ttl: float = 30.0):
+        names = rule_names or [r.strip() for r in os.getenv("RISK_RULES", ",".join(RULES)).split(",") if r.strip()]
+        self.rules = [(n, RULES[n][0], RULES[n][1]) for n in names if n in RULES]
+        self.ttl = ttl
+        # Values with the monotonic time they were loaded
+        self._limits: Dict[int, Tuple[dict, float]] = {}
+        self._positions: Dict[Tuple[int, str], Tuple[float, float]] = {}
+        # Bumped by every invalidation, so a load that raced one isn't stored after it
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def limits(self, account_id: int) -> dict:
+        hit = self._limits.get(account_id)
+        if hit is not None and time.monotonic() - hit[1] < self.ttl:
+            return hit[0]
+        seq = self._seq
+        lim = db_query_one_prepared(_ACCOUNT_LIMITS, (account_id,)) or {}
+        with self._lock:
+            if self._seq == seq:
+                self._limits[account_id] = (lim, time.monotonic())
+        return lim
+
+    def position(self, account_id: int, symbol: str) -> float:
+        key = (account_id, symbol)
+        hit = self._positions.get(key)
+        if hit is not None and time.monotonic() - hit[1] < self.ttl:
+            return hit[0]
+        seq = self._seq
+        row = db_query_one_prepared(_NET_POSITION, (account_id, symbol))
+        qty = float(row["qty"]) if row else 0.0
+        with self._lock:
+            if self._seq == seq:
+                self._positions[key] = (qty, time.monotonic())
+        return qty
+
+    def evaluate(
+        self, account_id: int, symbol: str, side: str, qty: float, price: float,
+        tiers=("approval", "account"), cur=None,
+    ) -> List[str]:
+        """Reasons the order trips any enabled rule in `tiers` (empty = clean).
+        With `cur`, limits and position are read in that transaction rather
+        than from the cache, to re-check under the caller's locks."""
+        if cur is None:
+            pos, lim = self.position(account_id, symbol), self.limits(account_id)
+        else:
+            execute_prepared(cur, _NET_POSITION, (account_id, symbol))
+            row = cur.fetchone()
+            pos = float(row["qty"]) if row else 0.0
+            execute_prepared(cur, _ACCOUNT_LIMITS, (account_id,))
+            lim = dict(cur.fetchone() or {})
+        o = OrderCheck(
+            account_id, symbol, side, qty, price, qty * price,
+            pos + qty if side == "BUY" else pos - qty,
+            lim,
+        )
+        reasons = []
+        for _, tier, rule in self.rules:
+            if tier in tiers:
+                msg = rule(o)
+                if msg:
+                    reasons.append(msg)
+        return reasons
+
+    def invalidate(self, account_id: int, symbol: Optional[str] = None, limits: bool = False, broadcast: bool = True):
+        with self._lock:
+            self._seq += 1
+            if limits:
+                self._limits.pop(account_id, None)
+            if symbol is None:
+                for key in [k for k in self._positions if k[0] == account_id]:
+                    self._positions.pop(key, None)
+            else:
+                self._positions.pop((account_id, symbol), None)
+        if broadcast:
+            payload = f"{account_id}|{symbol or ''}|{1 if limits else 0}"
+            db_execute("SELECT pg_notify(%(ch)s, %(p)s)", {"ch": INVALIDATE_CHANNEL, "p": payload})
+
+    def on_fill(self, account_id: int, symbol: str):
+        self.invalidate(account_id, symbol)
+
+    def on_limits_changed(self, account_id: int):
+        self.invalidate(account_id, limits=True)
+
+    def handle_notification(self, payload: str):
+        try:
+            aid, sym, lim = payload.split("|")
+            self.invalidate(int(aid), sym or None, limits=lim == "1", broadcast=False)
+        except ValueError:
+            pass
+
+    def clear(self):
+        """Drop all cached state (e.g. after invalidations may have been missed)."""
+        with self._lock:
+            self._seq += 1
+            self._limits.clear()
+            self._positions.clear()
+
+    def prime(self, account_id: int, limits: dict, positions: Dict[str, float]):
+        """Seed state directly (benchmarks and warm starts)."""
+        now = time.monotonic()
+        with self._lock:
+            self._limits[account_id] = (limits, now)
+            for sym, q in positions.items():
+                self._positions[(account_id, sym)] = (q, now)
+
+
+risk_engine = RiskEngine(ttl=float(os.getenv("RISK_CACHE_TTL_SECONDS", "30")))
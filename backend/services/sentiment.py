@@ -0,0 +1,128 @@
+from datetime import datetime
+from typing import List
+
+from ..db import db_query, get_pool
+
+GRANULARITIES = ("hour", "day")
+
+# news_sentiment_rollup is maintained by trg_news_sentiment_rollup on
+# news_ticker_map (migration 0007), so mappings from loaders and from the
+# title trigger are all counted, in the transaction that inserts them.
+
+_RECOUNT_SQL = """
+SELECT gr.g AS granularity, m.ticker,
+       date_trunc(gr.g, n.published_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS bucket,
+       COALESCE(NULLIF(lower(n.sentiment), ''), 'unknown') AS sentiment,
+       COUNT(*)::int AS article_count
+FROM news_articles n
+JOIN news_ticker_map m ON m.article_id = n.id
+CROSS JOIN (VALUES ('hour'), ('day')) AS gr(g)
+GROUP BY 1, 2, 3, 4
+"""
+
+
+def check_rollups() -> List[str]:
+    """Insert an article whose ticker is only named in its title (mapped by
+    trg_populate_news_tickers) and confirm the rollup counts it, then compare
+    the whole rollup with a recount. Runs in a rolled-back transaction.
+    Returns the problems found (empty when consistent)."""
+    problems = []
+    p = get_pool()
+    conn = p.getconn()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT symbol FROM tickers ORDER BY length(symbol) DESC, symbol LIMIT 1")
+        row = cur.fetchone()
+        if row is None:
+            return ["no tickers to test with"]
+        sym = row[0]
+        counts = """
+            SELECT granularity, COALESCE(SUM(article_count), 0)::int FROM news_sentiment_rollup
+            WHERE ticker = %(sym)s AND sentiment = 'positive'
+              AND bucket = date_trunc(granularity, now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+            GROUP BY granularity
+        """
+        cur.execute(counts, {"sym": sym})
+        before = dict(cur.fetchall())
+        cur.execute(
+            "INSERT INTO news_articles (published_at, source, title, url, sentiment) "
+            "VALUES (now(), 'rollup-check', %(t)s, 'about:blank', 'positive')",
+            {"t": f"{sym} rollup check"},
+        )
+        cur.execute(counts, {"sym": sym})
+        after = dict(cur.fetchall())
+        for g in GRANULARITIES:
+            if after.get(g, 0) != before.get(g, 0) + 1:
+                problems.append(f"title-mapped {sym} article not counted in the {g} rollup")
+        cur.execute(
+            f"""
+            SELECT COUNT(*) FROM (
+              (SELECT granularity, ticker, bucket, sentiment, article_count FROM news_sentiment_rollup
+               WHERE article_count <> 0
+               EXCEPT {_RECOUNT_SQL})
+              UNION ALL
+              ({_RECOUNT_SQL} EXCEPT
+               SELECT granularity, ticker, bucket, sentiment, article_count FROM news_sentiment_rollup)
+            ) d
+            """
+        )
+        drift = cur.fetchone()[0]
+        if drift:
+            problems.append(f"{drift} rollup rows differ from a recount of news_ticker_map")
+        cur.close()
+        return problems
+    finally:
+        conn.rollback()
+        p.putconn(conn)
+
+
+def sentiment_series(ticker: str, granularity: str, since: datetime) -> list:
+    """One row per bucket with per-sentiment counts and a net score
+    ((positive - negative) / total)."""
+    return db_query(
+        """
+        SELECT bucket,
+               SUM(article_count) FILTER (WHERE sentiment = 'positive')::int AS positive,
+               SUM(article_count) FILTER (WHERE sentiment = 'neutral')::int AS neutral,
+               SUM(article_count) FILTER (WHERE sentiment = 'negative')::int AS negative,
+               SUM(article_count)::int AS total,
+               (COALESCE(SUM(article_count) FILTER (WHERE sentiment = 'positive'), 0)
+                - COALESCE(SUM(article_count) FILTER (WHERE sentiment = 'negative'), 0))::float8
+                 / NULLIF(SUM(article_count), 0) AS score
+        FROM news_sentiment_rollup
+        WHERE granularity = %(g)s AND ticker = %(sym)s AND bucket >= %(since)s
+        GROUP BY bucket
+        ORDER BY bucket
+        """,
+        {"g": granularity, "sym": ticker, "since": since},
+        readonly=True,
+    )
+
+
+def top_movers(granularity: str, since: datetime, limit: int = 10, min_articles: int = 3) -> dict:
+    """Tickers ranked by net sentiment score over the window, most positive
+    and most negative first in their own lists."""
+    rows = db_query(
+        """
+        SELECT ticker,
+               SUM(article_count) FILTER (WHERE sentiment = 'positive')::int AS positive,
+               SUM(article_count) FILTER (WHERE sentiment = 'negative')::int AS negative,
+               SUM(article_count)::int AS total,
+               (COALESCE(SUM(article_count) FILTER (WHERE sentiment = 'positive'), 0)
+                - COALESCE(SUM(article_count) FILTER (WHERE sentiment = 'negative'), 0))::float8
+                 / SUM(article_count) AS score
+        FROM news_sentiment_rollup
+        WHERE granularity = %(g)s AND bucket >= %(since)s
+        GROUP BY ticker
+        HAVING SUM(article_count) >= %(min)s
+        """,
+        {"g": granularity, "since": since, "min": min_articles},
+        readonly=True,
+    )
+    for r in rows:
+        r["positive"] = r["positive"] or 0
+        r["negative"] = r["negative"] or 0
+    rows.sort(key=lambda r: (-r["score"], -r["total"]))
+    bullish = [r for r in rows if r["score"] > 0][:limit]
+    bearish = [r for r in reversed(rows) if r["score"] < 0][:limit]
+    return {"bullish": bullish, "bearish": bearish}
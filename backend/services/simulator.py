@@ -0,0 +1,242 @@
+import math
+import os
+import random
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ..db import db_query, get_conn_cursor
+from .bar_store import bar_store
+from .snapshot import market_snapshots
+from .ticks import publish_tick
+
+# Stochastic model and parameters per tickers.asset_type. vol/drift are per
+# simulator step (log returns); beta scales scenario shocks.
+#   gbm:    drift - vol^2/2 + vol * z
+#   jump:   gbm plus, with probability jump_prob, a N(jump_mean, jump_vol) jump
+#   regime: gbm whose drift/vol switch to stress_* while in the stress regime,
+#           entered with probability p_enter per step and left with p_exit
+ASSET_PROFILES: Dict[str, dict] = {
+    "etf": {"model": "gbm", "drift": 0.0, "vol": 0.0017, "beta": 1.0, "volume": 5_000_000},
+    "stock": {
+        "model": "jump", "drift": 0.0, "vol": 0.004, "beta": 1.2, "volume": 1_500_000,
+        "jump_prob": 0.002, "jump_mean": 0.0, "jump_vol": 0.03,
+    },
+    "crypto": {
+        "model": "regime", "drift": 0.0, "vol": 0.006, "beta": 1.5, "volume": 800_000,
+        "stress_drift": -0.001, "stress_vol": 0.02, "p_enter": 0.01, "p_exit": 0.05,
+    },
+}
+DEFAULT_ASSET = "stock"
+
+# Per-symbol overrides merged over the asset profile
+PROFILE_OVERRIDES: Dict[str, dict] = {
+    "SPY": {"vol": 0.0015, "volume": 50_000_000},
+    "QQQ": {"vol": 0.0017, "volume": 35_000_000, "beta": 1.1},
+    "IWM": {"vol": 0.0020, "volume": 20_000_000, "beta": 1.2},
+    "GLD": {"vol": 0.0010, "volume": 10_000_000, "beta": 0.1},
+    "TLT": {"vol": 0.0009, "volume": 12_000_000, "beta": -0.3},
+}
+
+# Scenario paths as (steps, market log return per step, volatility multiplier)
+# segments, expanded to one entry per step. Shocks reach each ticker scaled by
+# its beta; the multiplier applies to the model noise and volume.
+SCENARIOS: Dict[str, List[Tuple[int, float, float]]] = {
+    "crash": [(30, -0.0005, 1.5), (1, -0.06, 3.0), (40, -0.002, 2.5), (60, 0.0008, 1.8)],
+    "rally": [(20, 0.0005, 1.0), (1, 0.03, 1.5), (80, 0.0015, 1.2), (40, 0.0, 1.0)],
+}
+
+
+def profile_for(sym: str, asset_type: Optional[str]) -> dict:
+    asset = (asset_type or "").lower()
+    prof = dict(ASSET_PROFILES.get(asset, ASSET_PROFILES[DEFAULT_ASSET]))
+    prof.update(PROFILE_OVERRIDES.get(sym.upper(), {}))
+    return prof
+
+
+def expand_scenario(segments: Iterable[Tuple[int, float, float]]) -> List[Tuple[float, float]]:
+    return [(r, m) for steps, r, m in segments for _ in range(steps)]
+
+
+def recorded_scenario(symbol: str, start: datetime, end: datetime) -> List[Tuple[float, float]]:
+    """A scenario replaying `symbol`'s recorded bar-to-bar log returns over
+    [start, end] as the market shock (volatility multiplier 1)."""
+    closes = [
+        r["close"]
+        for r in db_query(
+            """
+            SELECT close::float8 AS close FROM price_bars
+            WHERE ticker = %(sym)s AND time BETWEEN %(start)s AND %(end)s
+            ORDER BY time
+            """,
+            {"sym": symbol.upper(), "start": start, "end": end},
+            readonly=True,
+        )
+    ]
+    return [(math.log(b / a), 1.0) for a, b in zip(closes, closes[1:]) if a > 0 and b > 0]
+
+
+class _TickerState:
+    __slots__ = ("rng", "profile", "close", "synced_time", "stressed")
+
+    def __init__(self, rng: random.Random, profile: dict):
+        self.rng = rng
+        self.profile = profile
+        self.close: Optional[float] = None
+        self.synced_time = None  # time of the last bar this state's close came from
+        self.stressed = False
+
+
+def _step_return(st: _TickerState, vol_mult: float) -> float:
+    p, rng = st.profile, st.rng
+    drift, vol = p["drift"], p["vol"]
+    if p["model"] == "regime":
+        if rng.random() < (p["p_exit"] if st.stressed else p["p_enter"]):
+            st.stressed = not st.stressed
+        if st.stressed:
+            drift, vol = p["stress_drift"], p["stress_vol"]
+    vol *= vol_mult
+    r = drift - 0.5 * vol * vol + vol * rng.gauss(0.0, 1.0)
+    if p["model"] == "jump" and rng.random() < p["jump_prob"]:
+        r += rng.gauss(p["jump_mean"], p["jump_vol"])
+    return r
+
+
+class Simulator:
+    """Price simulator with per-ticker state.
+
+    Each ticker draws from its own RNG seeded with (seed, symbol), so a run is
+    reproducible bar for bar whatever the set or order of tickers simulated.
+    With no seed the RNGs are seeded from the OS. Closes are resynced from
+    the latest stored bar whenever another writer (e.g. POST /simulate in
+    another process) has moved it. play() layers a scenario over the models,
+    consuming `speed` scenario steps per tick.
+    """
+
+    def __init__(self, seed: Optional[str] = None):
+        self.seed = seed
+        self._states: Dict[str, _TickerState] = {}
+        self._scenario: Optional[List[Tuple[float, float]]] = None
+        self._scenario_pos = 0
+        self._speed = 1
+        self._lock = threading.Lock()
+
+    def play(self, scenario, speed: int = 1):
+        """Start a scenario: a SCENARIOS name or a list of (return, vol multiplier) steps."""
+        steps = expand_scenario(SCENARIOS[scenario]) if isinstance(scenario, str) else list(scenario)
+        with self._lock:
+            self._scenario, self._scenario_pos, self._speed = steps, 0, max(1, int(speed))
+
+    @property
+    def scenario_remaining(self) -> int:
+        """Ticks until the active scenario ends (0 when none is playing)."""
+        if self._scenario is None:
+            return 0
+        return math.ceil((len(self._scenario) - self._scenario_pos) / self._speed)
+
+    def _sync(self, syms: Sequence[str]):
+        """Create missing states and resync closes from the latest stored bars, in one query."""
+        rows = db_query(
+            """
+            SELECT t.symbol, t.asset_type, b.time, b.close::float8 AS close
+            FROM unnest(%(syms)s::varchar[]) AS k(symbol)
+            JOIN tickers t ON t.symbol = k.symbol
+            LEFT JOIN LATERAL (
+              SELECT time, close FROM price_bars p WHERE p.ticker = t.symbol ORDER BY time DESC LIMIT 1
+            ) b ON true
+            """,
+            {"syms": list(syms)},
+        )
+        for r in rows:
+            st = self._states.get(r["symbol"])
+            if st is None:
+                rng = random.Random(f"{self.seed}:{r['symbol']}") if self.seed is not None else random.Random()
+                st = self._states[r["symbol"]] = _TickerState(rng, profile_for(r["symbol"], r["asset_type"]))
+            if r["time"] is not None and r["time"] != st.synced_time:
+                st.close, st.synced_time = r["close"], r["time"]
+            elif st.close is None:
+                st.close = 100.0
+
+    def next_bars(self, syms: Sequence[str]) -> List[dict]:
+        """Advance each known ticker in `syms` one tick; returns unsaved bars."""
+        with self._lock:
+            self._sync(syms)
+            shocks = [(0.0, 1.0)]
+            if self._scenario is not None:
+                shocks = self._scenario[self._scenario_pos:self._scenario_pos + self._speed]
+                self._scenario_pos += self._speed
+                if self._scenario_pos >= len(self._scenario):
+                    self._scenario = None
+            bars = []
+            for sym in syms:
+                st = self._states.get(sym)
+                if st is None:
+                    continue
+                # One sub-step per scenario step: the path gives the bar's high/low
+                o = px = hi = lo = st.close
+                for shock, vol_mult in shocks:
+                    r = _step_return(st, vol_mult) + st.profile["beta"] * shock
+                    px = max(0.01, px * math.exp(r))
+                    hi, lo = max(hi, px), min(lo, px)
+                wick = abs(math.log(px / o)) * 0.5 if o > 0 else 0.0
+                vol_mult = max(m for _, m in shocks)
+                bars.append({
+                    "ticker": sym,
+                    "open": round(o, 2),
+                    "high": round(hi * (1 + wick), 2),
+                    "low": round(max(0.01, lo * (1 - wick)), 2),
+                    "close": round(px, 2),
+                    "volume": int(st.profile["volume"] * vol_mult * (1 + st.rng.uniform(-0.2, 0.2))),
+                })
+                st.close = round(px, 2)
+            return bars
+
+    def tick(self, syms: Sequence[str]) -> List[dict]:
+        """Advance and store one bar per ticker in a single transaction, then
+        fan them out like any other bar (NOTIFY, bar store, snapshots)."""
+        bars = self.next_bars(syms)
+        if not bars:
+            return []
+        now = datetime.utcnow()
+        with get_conn_cursor(True) as (_, cur):
+            cur.execute(
+                """
+                INSERT INTO price_bars (ticker, time, open, high, low, close, volume, source)
+                SELECT k, %(ts)s, o, h, l, c, v, 'SIM'
+                FROM unnest(%(k)s::varchar[], %(o)s::numeric[], %(h)s::numeric[], %(l)s::numeric[],
+                            %(c)s::numeric[], %(v)s::bigint[]) AS b(k, o, h, l, c, v)
+                RETURNING ticker, time, open::float8 AS open, high::float8 AS high, low::float8 AS low,
+                          close::float8 AS close, COALESCE(volume, 0) AS volume, source
+                """,
+                {
+                    "ts": now,
+                    "k": [b["ticker"] for b in bars],
+                    "o": [b["open"] for b in bars],
+                    "h": [b["high"] for b in bars],
+                    "l": [b["low"] for b in bars],
+                    "c": [b["close"] for b in bars],
+                    "v": [b["volume"] for b in bars],
+                },
+            )
+            rows = [dict(r) for r in cur.fetchall()]
+            # Fan the bars out to every worker's caches (delivered on commit)
+            for row in rows:
+                publish_tick(cur, row)
+        with self._lock:
+            for row in rows:
+                st = self._states.get(row["ticker"])
+                if st is not None:
+                    st.synced_time = row["time"]
+        for row in rows:
+            bar_store.append(row["ticker"], row)
+            market_snapshots.on_bar(row)
+        return rows
+
+
+simulator = Simulator(os.getenv("SIM_SEED") or None)
+
+
+def simulate_all():
+    """One simulator tick across a modest set of symbols; run by the job runner."""
+    syms = [r["symbol"] for r in db_query("SELECT symbol FROM tickers ORDER BY symbol LIMIT 50")]
+    simulator.tick(syms)
@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from ..db import db_query
+from .bar_store import from_epoch_us, to_epoch_us
+
+MAX_SNAPSHOT_SYMBOLS = 200
+# Negative entries kept before expired ones are pruned
+_MAX_MISSING = 10000
+
+_US_PER_DAY = 86_400 * 1_000_000
+
+# Latest bar plus the previous UTC day's last close and the current day's volume,
+# for every requested symbol in one round trip.
+_SNAPSHOT_SQL = """
+SELECT l.ticker,
+       l.time,
+       l.open::float8 AS open,
+       l.high::float8 AS high,
+       l.low::float8 AS low,
+       l.close::float8 AS close,
+       COALESCE(l.volume, 0) AS volume,
+       p.close::float8 AS prev_close,
+       COALESCE(d.day_volume, 0)::bigint AS day_volume
+FROM unnest(%(syms)s::text[]) AS s(sym)
+CROSS JOIN LATERAL (
+  SELECT ticker, time, open, high, low, close, volume
+  FROM price_bars WHERE ticker = s.sym
+  ORDER BY time DESC
+  LIMIT 1
+) l
+LEFT JOIN LATERAL (
+  SELECT close FROM price_bars
+  WHERE ticker = s.sym AND time < date_trunc('day', l.time AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+  ORDER BY time DESC
+  LIMIT 1
+) p ON true
+LEFT JOIN LATERAL (
+  SELECT SUM(volume) AS day_volume FROM price_bars
+  WHERE ticker = s.sym AND time >= date_trunc('day', l.time AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+) d ON true
+"""
+
+
+class _Entry:
+    __slots__ = ("t", "open", "high", "low", "close", "volume", "prev_close", "day_volume", "loaded_at")
+
+    def __init__(self, r: dict):
+        self.t = to_epoch_us(r["time"])
+        self.open, self.high, self.low, self.close = r["open"], r["high"], r["low"], r["close"]
+        self.volume = int(r["volume"])
+        self.prev_close = r["prev_close"]
+        self.day_volume = int(r["day_volume"])
+        self.loaded_at = time.monotonic()
+
+
+class MarketSnapshots:
+    """Latest bar, day change and day volume per ticker, kept in memory.
+
+    Symbols are loaded in one batched query on first request and then rolled
+    forward by every tick this worker sees (simulator or LISTEN), so a
+    dashboard poll for dozens of symbols is normally served without touching
+    Postgres. Entries not refreshed for max_age seconds are reloaded, which
+    covers workers running without the tick listener.
+    """
+
+    def __init__(self, max_age: float = 30.0):
+        self.max_age = max_age
+        self._entries: Dict[str, _Entry] = {}
+        # Symbols the last load found no bars for, and when; rechecked after max_age
+        self._missing: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _stale(self, sym: str, now: float) -> bool:
+        e = self._entries.get(sym)
+        if e is not None:
+            return now - e.loaded_at > self.max_age
+        missed = self._missing.get(sym)
+        return missed is None or now - missed > self.max_age
+
+    def get(self, symbols: List[str]) -> List[dict]:
+        """Snapshots for `symbols` in the given order; unknown symbols are omitted."""
+        now = time.monotonic()
+        with self._lock:
+            stale = [s for s in symbols if self._stale(s, now)]
+        if stale:
+            rows = db_query(_SNAPSHOT_SQL, {"syms": stale}, readonly=True)
+            loaded_at = time.monotonic()
+            with self._lock:
+                for r in rows:
+                    self._entries[r["ticker"]] = _Entry(r)
+                found = {r["ticker"] for r in rows}
+                if len(self._missing) > _MAX_MISSING:
+                    self._missing = {s: t for s, t in self._missing.items() if loaded_at - t <= self.max_age}
+                for s in stale:
+                    if s not in found:
+                        self._entries.pop(s, None)
+                        self._missing[s] = loaded_at
+        out = []
+        with self._lock:
+            for s in symbols:
+                e = self._entries.get(s)
+                if e is None:
+                    continue
+                change = e.close - e.prev_close if e.prev_close is not None else None
+                out.append({
+                    "ticker": s,
+                    "time": from_epoch_us(e.t),
+                    "open": e.open,
+                    "high": e.high,
+                    "low": e.low,
+                    "close": e.close,
+                    "volume": e.volume,
+                    "prev_close": e.prev_close,
+                    "change": change,
+                    "change_pct": change / e.prev_close * 100 if change is not None and e.prev_close else None,
+                    "day_volume": e.day_volume,
+                })
+        return out
+
+    def on_bar(self, bar: dict):
+        """Roll a loaded ticker forward; tickers nobody asked for are ignored."""
+        sym = bar["ticker"]
+        t = bar["time"]
+        t = to_epoch_us(t) if isinstance(t, datetime) else int(t)
+        with self._lock:
+            e = self._entries.get(sym)
+            if e is None:
+                # A symbol cached as having no bars now has one; load it next time
+                self._missing.pop(sym, None)
+                return
+            if t <= e.t:
+                return  # duplicate (own NOTIFY echo) or out of order
+            vol = int(bar.get("volume") or 0)
+            if t // _US_PER_DAY != e.t // _US_PER_DAY:
+                e.prev_close = e.close
+                e.day_volume = 0
+            e.t = t
+            e.open, e.high, e.low, e.close = float(bar["open"]), float(bar["high"]), float(bar["low"]), float(bar["close"])
+            e.volume = vol
+            e.day_volume += vol
+            e.loaded_at = time.monotonic()
+
+    def clear(self, symbols: Optional[Iterable[str]] = None):
+        with self._lock:
+            if symbols is None:
+                self._entries.clear()
+                self._missing.clear()
+            else:
+                for s in symbols:
+                    self._entries.pop(s, None)
+                    self._missing.pop(s, None)
+
+
+market_snapshots = MarketSnapshots(float(os.getenv("SNAPSHOT_CACHE_MAX_AGE", "30")))
+
+
+def parse_symbols(raw: str) -> List[str]:
+    """Comma-separated symbols, upper-cased and de-duplicated in order."""
+    seen = []
+    for s in (raw or "").split(","):
+        s = s.strip().upper()
+        if s and s not in seen:
+            seen.append(s)
+    return seen
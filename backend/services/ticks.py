@@ -0,0 +1,175 @@
+import logging
+import os
+import select
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+import psycopg2
+
+from ..db import _normalize_dsn
+from ..response_cache import response_cache
+from .bar_store import bar_store, from_epoch_us, to_epoch_us
+from .risk import risk_engine
+from .snapshot import market_snapshots
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "price_ticks"
+# Comma-separated symbols whose stored history was rewritten in bulk
+REPRIME_CHANNEL = "bar_reprime"
+
+# Wire format: "SYM|epoch_us|open|high|low|close|volume|source" (well under NOTIFY's 8000-byte cap)
+
+
+def encode_tick(bar: dict) -> str:
+    t = bar["time"]
+    return "|".join([
+        bar["ticker"],
+        str(to_epoch_us(t) if isinstance(t, datetime) else int(t)),
+        repr(float(bar["open"])),
+        repr(float(bar["high"])),
+        repr(float(bar["low"])),
+        repr(float(bar["close"])),
+        str(int(bar.get("volume") or 0)),
+        bar.get("source") or "SIM",
+    ])
+
+
+def decode_tick(payload: str) -> dict:
+    sym, t, o, h, l, c, v, src = payload.split("|")
+    return {
+        "ticker": sym,
+        "time": from_epoch_us(int(t)),
+        "open": float(o),
+        "high": float(h),
+        "low": float(l),
+        "close": float(c),
+        "volume": int(v),
+        "source": src,
+    }
+
+
+def publish_tick(cur, bar: dict):
+    """Queue a tick notification on `cur`'s transaction; Postgres delivers it on commit."""
+    cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, encode_tick(bar)))
+
+
+def publish_reprime(cur, symbols: Iterable[str]):
+    """Queue a notification telling every worker to drop what it holds for
+    `symbols`, for bulk loads that wrote more than the newest bar (one tick
+    would leave gaps in the rings). Delivered on commit."""
+    syms = sorted(set(symbols))
+    for i in range(0, len(syms), 500):  # stays under NOTIFY's payload cap
+        cur.execute("SELECT pg_notify(%s, %s)", (REPRIME_CHANNEL, ",".join(syms[i:i + 500])))
+
+
+def reprime(symbols: Iterable[str]):
+    """Drop this process's bars and snapshots for `symbols`; the next read reloads them from the DB."""
+    symbols = [s for s in symbols if s]
+    for sym in symbols:
+        bar_store.clear(sym)
+    market_snapshots.clear(symbols)
+
+
+class TickListener:
+    """LISTENs for price ticks and applies them to this process's caches.
+
+    Each worker runs one, so a bar produced by whichever process holds the
+    simulator job reaches every worker's bar store and subscribers without
+    polling or an external broker. Other invalidation channels can ride on
+    the same connection via on().
+    """
+
+    def __init__(self, dsn: Optional[str] = None):
+        self.dsn = dsn
+        self._subscribers: List[Callable[[dict], None]] = []
+        # Other cross-process invalidation channels share this connection
+        self._channels: Dict[str, Callable[[str], None]] = {
+            CHANNEL: self._dispatch,
+            REPRIME_CHANNEL: lambda payload: reprime(payload.split(",")),
+        }
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, fn: Callable[[dict], None]):
+        self._subscribers.append(fn)
+
+    def unsubscribe(self, fn: Callable[[dict], None]):
+        if fn in self._subscribers:
+            self._subscribers.remove(fn)
+
+    def on(self, channel: str, fn: Callable[[str], None]):
+        """Route raw payloads on another NOTIFY channel to `fn` (call before start)."""
+        self._channels[channel] = fn
+
+    def _dispatch(self, payload: str):
+        try:
+            bar = decode_tick(payload)
+        except ValueError:
+            return
+        bar_store.append(bar["ticker"], bar)
+        for fn in list(self._subscribers):
+            try:
+                fn(bar)
+            except Exception:
+                pass
+
+    def _listen_once(self):
+        dsn = self.dsn or os.getenv("DATABASE_URL")
+        if not dsn:
+            raise RuntimeError("DATABASE_URL not set (postgres DSN)")
+        conn = psycopg2.connect(_normalize_dsn(dsn))
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                for ch in self._channels:
+                    cur.execute(f"LISTEN {ch}")
+            # Ticks may have been missed while disconnected; re-prime rings from the DB
+            bar_store.clear()
+            market_snapshots.clear()
+            # Invalidations may have been missed too
+            response_cache.clear()
+            risk_engine.clear()
+            while not self._stop.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    n = conn.notifies.pop(0)
+                    handler = self._channels.get(n.channel)
+                    if handler is None:
+                        continue
+                    try:
+                        handler(n.payload)
+                    except Exception:
+                        log.exception("handler for NOTIFY channel %s failed", n.channel)
+        finally:
+            conn.close()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self._listen_once()
+            except (psycopg2.Error, OSError, RuntimeError):
+                # Reconnect after a pause; missed ticks are covered by the DB fallback paths
+                self._stop.wait(5.0)
+            except Exception:
+                # Anything else is a bug, but it mustn't stop the listener for good
+                log.exception("tick listener failed")
+                self._stop.wait(5.0)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="tick-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+listener = TickListener()
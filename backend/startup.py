@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+# Process role -> (run background jobs incl. the price simulator, run the
+# NOTIFY listener that applies other processes' ticks and invalidations)
+ROLES = {
+    "web": (False, True),  # WSGI workers: serve requests, follow ticks
+    "worker": (True, False),  # `flask worker`: jobs only
+    "all": (True, True),  # `flask run`: single-process development
+    "cli": (False, False),  # other flask commands, tests
+}
+
+
+def _flask_command() -> Optional[str]:
+    """The subcommand when running under the flask CLI ("" for none), else None."""
+    argv0 = sys.argv[0] if sys.argv else ""
+    if os.path.basename(argv0) != "flask" and not argv0.endswith(os.path.join("flask", "__main__.py")):
+        return None
+    args, i = sys.argv[1:], 0
+    while i < len(args):
+        if args[i] in ("--app", "-A", "--env-file", "-e"):
+            i += 2
+        elif args[i].startswith("-"):
+            i += 1
+        else:
+            return args[i]
+    return ""
+
+
+def detect_role() -> str:
+    """APP_ROLE if set; otherwise inferred from how the process was started.
+    WSGI servers get "web", so jobs run only where asked for (`flask worker`,
+    `flask run` or APP_ROLE=worker|all)."""
+    role = os.getenv("APP_ROLE")
+    if role:
+        if role not in ROLES:
+            raise RuntimeError(f"APP_ROLE must be one of {', '.join(ROLES)}")
+        return role
+    if "pytest" in sys.modules:
+        return "cli"
+    cmd = _flask_command()
+    if cmd is None:
+        return "web"
+    return {"run": "all", "worker": "worker"}.get(cmd, "cli")
+
+
+class StartupProfile:
+    """Wall time per create_app component (imports included), so slow
+    startup can be traced to a blueprint or subsystem. STARTUP_PROFILE=1
+    prints it when the app is built; `flask startup-profile` shows it too."""
+
+    def __init__(self, role: str):
+        self.role = role
+        self.steps: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def step(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, (time.perf_counter() - t0) * 1000))
+
+    def add(self, name: str, ms: float):
+        self.steps.append((name, ms))
+
+    @property
+    def total_ms(self) -> float:
+        return sum(ms for _, ms in self.steps)
+
+    def report(self) -> str:
+        lines = [f"startup profile (role={self.role})"]
+        for name, ms in self.steps:
+            lines.append(f"  {name:28} {ms:9.1f} ms")
+        lines.append(f"  {'total':28} {self.total_ms:9.1f} ms")
+        return "\n".join(lines)
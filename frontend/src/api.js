@@ -10,4 +10,33 @@ api.interceptors.request.use((config) => {
   return config
 })
 
+// Binary bars from /ohlcv (layout documented in backend/api/market.py):
+// 16-byte header (magic "BAR1", u32 count, u32 columns, u32 reserved) then
+// little-endian float64 columns time_ms, open, high, low, close, volume.
+export const BARS_MIME = 'application/vnd.paper-trading.bars'
+const BAR_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume']
+
+export function decodeBars(buf) {
+  const view = new DataView(buf)
+  const magic = String.fromCharCode(...new Uint8Array(buf, 0, 4))
+  if (magic !== 'BAR1') throw new Error('not a bars payload')
+  const n = view.getUint32(4, true)
+  const cols = {}
+  BAR_COLUMNS.forEach((name, i) => {
+    const offset = 16 + i * n * 8
+    // Zero-copy view on little-endian hosts (all current browsers)
+    cols[name] = new Float64Array(buf, offset, n)
+  })
+  cols.length = n
+  return cols
+}
+
+export async function getBars(symbol, limit) {
+  const { data } = await api.get(`/api/market/tickers/${symbol}/ohlcv?limit=${limit}`, {
+    headers: { Accept: BARS_MIME },
+    responseType: 'arraybuffer',
+  })
+  return decodeBars(data)
+}
+
 export default api
@@ -16,6 +16,13 @@ export default function NewsFeed() {
 
   useEffect(() => { load() }, [])
 
+  // One request moves the read high-water mark past everything shown
+  const markAllRead = async () => {
+    const newest = rows.reduce((t, n) => (n.published_at > t ? n.published_at : t), '')
+    await api.post('/api/watchlist/news/mark-read', newest ? { through: newest } : { all: true })
+    load()
+  }
+
   return (
     <div>
       <h3>My News Feed</h3>
@@ -28,11 +35,12 @@ export default function NewsFeed() {
         </select>
         <input type="number" min={1} value={limit} onChange={e=>setLimit(Number(e.target.value))} style={{width:60}} />
         <button onClick={load} style={{flexShrink:0}}>Refresh</button>
+        <button onClick={markAllRead} style={{flexShrink:0}}>Mark all read</button>
       </div>
       <ul style={{margin:0, paddingLeft:18, fontSize:13}}>
         {rows.map(n => (
           <li key={`${n.id}-${n.ticker}`} style={{marginBottom:6}}>
-            <a href={n.url} target="_blank" style={{fontSize:13}}>{n.title}</a>
+            <a href={n.url} target="_blank" style={{fontSize:13, fontWeight: n.is_read ? 'normal' : 'bold'}}>{n.title}</a>
             {n.sentiment ? <span className="muted" style={{fontSize:11}}> [{n.sentiment}]</span> : ''}
             {n.published_at ? <span className="muted" style={{fontSize:11}}> — {n.published_at}</span> : ''}
           </li>
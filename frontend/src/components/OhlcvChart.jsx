@@ -1,5 +1,5 @@
 import React, { useEffect, useMemo, useState } from 'react'
-import api from '../api'
+import api, { getBars } from '../api'
 
 // Professional trading chart with live updates
 export default function OhlcvChart({ symbol, height = 220, width = 480, limit = 100, live = false, onNewPrice }) {
@@ -7,8 +7,15 @@ export default function OhlcvChart({ symbol, height = 220, width = 480, limit =
 
   useEffect(() => {
     let alive = true
-    api.get(`/api/market/tickers/${symbol}/ohlcv?limit=${limit}`)
-      .then(r => { if (alive) setRows(r.data || []) })
+    getBars(symbol, limit)
+      .then(bars => {
+        if (!alive) return
+        const next = new Array(bars.length)
+        for (let i = 0; i < bars.length; i++) {
+          next[i] = { time: bars.time[i], open: bars.open[i], high: bars.high[i], low: bars.low[i], close: bars.close[i], volume: bars.volume[i] }
+        }
+        setRows(next)
+      })
       .catch(() => { if (alive) setRows([]) })
     return () => { alive = false }
   }, [symbol, limit])
@@ -21,7 +28,8 @@ export default function OhlcvChart({ symbol, height = 220, width = 480, limit =
         setRows(prev => {
           const next = prev.slice()
           const last = next[next.length - 1]
-          if (!last || last.time !== bar.time) {
+          // History times are epoch ms, /latest's are ISO strings
+          if (!last || new Date(last.time).getTime() !== new Date(bar.time).getTime()) {
             next.push(bar)
             if (next.length > limit) next.shift()
           } else {
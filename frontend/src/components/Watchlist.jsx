@@ -5,6 +5,7 @@ export default function Watchlist() {
   const [items, setItems] = useState([])
   const [ticker, setTicker] = useState('AAPL')
   const [err, setErr] = useState('')
+  const [quotes, setQuotes] = useState({})
 
   const load = async () => {
     try {
@@ -15,6 +16,20 @@ export default function Watchlist() {
 
   useEffect(() => { load() }, [])
 
+  // One snapshot request for the whole watchlist instead of a /latest call per symbol
+  useEffect(() => {
+    let stop = false
+    const poll = async () => {
+      try {
+        const { data } = await api.get('/api/watchlist/snapshot')
+        if (!stop) setQuotes(Object.fromEntries(data.map(q => [q.ticker, q])))
+      } catch (e) { /* keep last quotes */ }
+    }
+    poll()
+    const id = setInterval(poll, 2000)
+    return () => { stop = true; clearInterval(id) }
+  }, [items])
+
   const add = async (e) => {
     e.preventDefault()
     setErr('')
@@ -42,6 +57,17 @@ export default function Watchlist() {
         {items.map(i => (
           <li key={i.ticker}>
             {i.ticker} <small>({i.added_at})</small>
+            {quotes[i.ticker] && (
+              <span style={{marginLeft:8}}>
+                {quotes[i.ticker].close.toFixed(2)}
+                {quotes[i.ticker].change_pct != null && (
+                  <span style={{marginLeft:4, color: quotes[i.ticker].change_pct >= 0 ? 'green' : 'red'}}>
+                    {quotes[i.ticker].change_pct >= 0 ? '+' : ''}{quotes[i.ticker].change_pct.toFixed(2)}%
+                  </span>
+                )}
+                <small style={{marginLeft:4}}>vol {quotes[i.ticker].day_volume.toLocaleString()}</small>
+              </span>
+            )}
             <button style={{marginLeft:8}} onClick={()=>remove(i.ticker)}>x</button>
           </li>
         ))}